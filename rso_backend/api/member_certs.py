@@ -0,0 +1,367 @@
+"""Формирование справок о членстве в РСО.
+
+Шаблоны справок и шрифты загружаются один раз на процесс: разобранная
+страница шаблона переиспользуется всеми справками, а ссылки reportlab,
+которые pdfrw оставляет в объектах шаблона, снимаются после каждой
+справки. Данные пользователей и их региональных штабов загружаются
+для всего списка одним запросом.
+"""
+import io
+import os
+from datetime import datetime
+from functools import lru_cache
+
+import pdfrw
+from django.conf import settings
+from pdfrw.buildxobj import pagexobj
+from pdfrw.objects import PdfArray, PdfDict
+from pdfrw.toreportlab import makerl
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api.utils import text_to_lines
+from users.models import RSOUser
+
+INTERNAL_CERT = 'internal_cert.pdf'
+EXTERNAL_CERT = 'external_cert.pdf'
+CERT_TYPES = {
+    INTERNAL_CERT: 'Внутренняя справка',
+    EXTERNAL_CERT: 'Для работодателя',
+}
+SAMPLES_DIR = os.path.join(str(settings.BASE_DIR), 'templates', 'samples')
+
+TIMES_HEAD_SIZE = 15
+TIMES_TEXT_SIZE = 14
+ARIAL_TEXT_SIZE = 9
+HEAD_Y = 800
+VERTICAL_DISP = 155
+VERTICAL_RECIPIENT_DISP = 10
+VERTICAL_DISP_REQ = 160
+HORIZONTAL_DISP = 11
+HORIZONTAL_DISP_RECIPIENT = 12
+REQUISITES_X = 140
+REQUISITES_Y = 729
+LETTER_NUMBER_X = 50
+LETTER_NUMBER_Y = 650
+NAME_X = 135
+NAME_Y = 529
+BIRTHDAY_X = 126
+BIRTHDAY_Y = 496
+CERT_DATE_X = 160
+CERT_DATE_Y = 432
+REG_CASE_NAME_X = 29
+REG_CASE_NAME_Y = 385
+REG_NUMBER_X = 140
+REG_NUMBER_Y = 360
+INN_X = 380
+INN_Y = 309
+SNILS_X = 380
+SNILS_Y = 291
+RECIPIENT_X = 33
+RECIPIENT_Y = 230
+RECIPIENT_INTERNAL_X = 33
+RECIPIENT_INTERNAL_Y = 282
+POSITION_PROC_PROP = 0.3
+POSITION_PROC_X = 25
+POSITION_PROC_LINE_Y = 110
+FIO = 3
+FI = 2
+SIGNATORY_X = 450
+SIGNATORY_Y = 85
+
+
+class CertificateError(Exception):
+    """Справку сформировать нельзя, текст - сообщение для пользователя."""
+
+
+@lru_cache(maxsize=None)
+def register_cert_fonts():
+    """Регистрирует шрифты справок один раз на процесс."""
+    pdfmetrics.registerFont(TTFont(
+        'Times_New_Roman', os.path.join(SAMPLES_DIR, 'fonts', 'times.ttf')
+    ))
+    pdfmetrics.registerFont(TTFont(
+        'Arial_Narrow',
+        os.path.join(SAMPLES_DIR, 'fonts', 'arialnarrow.ttf')
+    ))
+
+
+@lru_cache(maxsize=None)
+def get_cert_template(cert_template):
+    """Разобранная страница шаблона справки, одна на процесс."""
+    page = pdfrw.PdfReader(
+        os.path.join(SAMPLES_DIR, cert_template), decompress=False
+    ).pages[0]
+    return pagexobj(page)
+
+
+def _release_template(template_obj, rldoc):
+    """Удаляет из объектов шаблона ссылки pdfrw на документ reportlab.
+
+    pdfrw запоминает преобразованные объекты в derived_rl_obj каждого
+    объекта шаблона по ключу документа. Без очистки кэшированный шаблон
+    удерживал бы в памяти все сформированные документы.
+    """
+    seen = set()
+    stack = [template_obj]
+    while stack:
+        pdf_obj = stack.pop()
+        if id(pdf_obj) in seen:
+            continue
+        seen.add(id(pdf_obj))
+        derived = getattr(pdf_obj, 'derived_rl_obj', None)
+        if derived:
+            derived.pop(rldoc, None)
+        if isinstance(pdf_obj, PdfDict):
+            stack.extend(pdf_obj.values())
+        elif isinstance(pdf_obj, PdfArray):
+            stack.extend(pdf_obj)
+
+
+def get_certificate_users(user_ids):
+    """Пользователи с документами и региональными штабами одним запросом."""
+    return RSOUser.objects.filter(id__in=user_ids).select_related(
+        'documents',
+        'userregionalheadquarterposition__headquarter__commander',
+    )
+
+
+def get_certificate_options(data, issuer):
+    """Параметры справки из тела запроса.
+
+    Подписывающее лицо по умолчанию - выдающий справку пользователь.
+    """
+    if data.get('cert_start_date') is None:
+        raise CertificateError(
+            'Не указана дата начала действия сертификата.'
+        )
+    signatory = f'{issuer.last_name} {issuer.first_name}'
+    if issuer.patronymic_name is not None:
+        signatory = f'{signatory} {issuer.patronymic_name}'
+    return {
+        'recipient': data.get('recipient', 'по месту требования'),
+        'cert_start_date': data.get('cert_start_date'),
+        'cert_end_date': data.get('cert_end_date'),
+        'signatory': data.get('signatory', signatory),
+        'position_procuration': data.get(
+            'position_procuration', 'Руководитель регионального отделения'
+        ),
+    }
+
+
+def get_regional_headquarter(user):
+    """Региональный штаб пользователя из загруженных связей."""
+    try:
+        return user.userregionalheadquarterposition.headquarter
+    except RSOUser.userregionalheadquarterposition.RelatedObjectDoesNotExist:
+        raise CertificateError(
+            'Не удалось определить региональный штаб '
+            f'пользователя {user.username}.'
+        )
+
+
+def check_certificate_user(user):
+    """Проверяет, что для справки пользователя заполнены все данные."""
+    documents = getattr(user, 'documents', None)
+    if documents is None or documents.inn is None or documents.snils is None:
+        raise CertificateError(
+            f'Документы пользователя {user.username} не заполнены.'
+        )
+    regional_headquarter = get_regional_headquarter(user)
+    if (
+        (not user.last_name and not user.first_name
+         and not user.patronymic_name)
+        or not user.date_of_birth
+    ):
+        raise CertificateError(
+            f'Профиль пользователя {user.username} не заполнен.'
+        )
+    if not regional_headquarter.registry_date:
+        raise CertificateError(
+            f'Данные РШ {regional_headquarter} не заполнены.'
+        )
+
+
+def _draw_lines(c, text, proportion, x, y, line_step):
+    lines = text_to_lines(text=text, proportion=proportion)
+    line_break = HORIZONTAL_DISP
+    for line in lines:
+        c.drawString(x, y - line_break, line)
+        line_break += line_step
+
+
+def _draw_recipient(c, recipient, page_width, x, y):
+    string_width = c.stringWidth(recipient, 'Times_New_Roman', TIMES_TEXT_SIZE)
+    line_width = (page_width - VERTICAL_RECIPIENT_DISP)
+    start_line = line_width/2 - string_width/2
+    proportion = line_width / string_width
+    if proportion >= 1.0:
+        c.drawString(start_line, y, recipient)
+    else:
+        _draw_lines(c, recipient, proportion, x, y, HORIZONTAL_DISP_RECIPIENT)
+
+
+def render_certificate(user, options, cert_template=INTERNAL_CERT) -> bytes:
+    """PDF справки пользователя.
+
+    user должен быть загружен через get_certificate_users, options -
+    результат get_certificate_options. При незаполненных данных
+    выбрасывается CertificateError.
+    """
+    check_certificate_user(user)
+    documents = user.documents
+    regional_headquarter = get_regional_headquarter(user)
+    commander = regional_headquarter.commander
+    cert_start_date = datetime.strptime(options['cert_start_date'], '%Y-%m-%d')
+    cert_end_date = datetime.strptime(options['cert_end_date'], '%Y-%m-%d')
+
+    register_cert_fonts()
+    template_obj = get_cert_template(cert_template)
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4, bottomup=1)
+    try:
+        c.doForm(makerl(c, template_obj))
+        _draw_certificate(
+            c, user, documents, regional_headquarter, commander,
+            cert_start_date, cert_end_date, options, cert_template
+        )
+        c.showPage()
+        c.save()
+    finally:
+        _release_template(template_obj, c._doc)
+    return buf.getvalue()
+
+
+def _draw_certificate(c, user, documents, regional_headquarter, commander,
+                      cert_start_date, cert_end_date, options, cert_template):
+    # Название РШ в заголовке листа.
+    c.setFont('Times_New_Roman', TIMES_HEAD_SIZE)
+    page_width = c._pagesize[0]
+    string_width = c.stringWidth(
+        str(regional_headquarter), 'Times_New_Roman', TIMES_HEAD_SIZE
+    )
+    center_x = (page_width - string_width) / 2 + VERTICAL_DISP
+    c.drawCentredString(center_x, HEAD_Y, str(regional_headquarter))
+
+    # Юр. адрес и реквизиты РШ под заголовком, с переносом строк
+    # по ширине поля.
+    c.setFont('Arial_Narrow', ARIAL_TEXT_SIZE)
+    text = (
+        str(regional_headquarter.legal_address) + '.  '
+        + str(regional_headquarter.requisites)
+    )
+    string_width = c.stringWidth(text, 'Arial_Narrow', ARIAL_TEXT_SIZE)
+    line_width = (page_width - VERTICAL_DISP_REQ)
+    _draw_lines(
+        c, text, line_width / string_width, REQUISITES_X, REQUISITES_Y,
+        HORIZONTAL_DISP
+    )
+    c.drawString(
+        LETTER_NUMBER_X,
+        LETTER_NUMBER_Y,
+        'б/н от ' + str(datetime.now().strftime('%d.%m.%Y'))
+    )
+
+    # Данные пользователя и РШ в тексте справки.
+    c.setFont('Times_New_Roman', TIMES_TEXT_SIZE)
+    last_name = user.last_name
+    first_name = user.first_name
+    patronymic_name = user.patronymic_name
+    if last_name and first_name and patronymic_name:
+        c.drawString(
+            NAME_X, NAME_Y,
+            last_name + ' ' + first_name + ' ' + patronymic_name
+        )
+    if last_name and first_name and not patronymic_name:
+        c.drawString(NAME_X, NAME_Y, last_name + ' ' + first_name)
+    c.drawString(
+        BIRTHDAY_X,
+        BIRTHDAY_Y,
+        str(user.date_of_birth.strftime('%d.%m.%Y')) + ' г.'
+    )
+    c.drawString(
+        CERT_DATE_X,
+        CERT_DATE_Y,
+        (
+            'c '
+            + str(cert_start_date.strftime('%d.%m.%Y'))
+            + ' г. по '
+            + str(cert_end_date.strftime('%d.%m.%Y') + ' г.')
+        )
+    )
+    c.drawString(
+        REG_CASE_NAME_X, REG_CASE_NAME_Y, regional_headquarter.case_name
+    )
+    c.drawString(
+        REG_NUMBER_X,
+        REG_NUMBER_Y,
+        (
+            str(regional_headquarter.registry_number)
+            + ' от '
+            + regional_headquarter.registry_date.strftime('%d.%m.%Y')
+            + ' г.'
+        )
+    )
+    _draw_lines(
+        c, options['position_procuration'], POSITION_PROC_PROP,
+        POSITION_PROC_X, POSITION_PROC_LINE_Y, HORIZONTAL_DISP_RECIPIENT
+    )
+
+    recipient = options['recipient']
+    if cert_template == EXTERNAL_CERT:
+        c.drawString(INN_X, INN_Y, documents.inn)
+        c.drawString(SNILS_X, SNILS_Y, documents.snils)
+        _draw_recipient(c, recipient, page_width, RECIPIENT_X, RECIPIENT_Y)
+        signatory = options['signatory']
+        signatory_list = signatory.split()
+        if len(signatory_list) == FIO:
+            c.drawString(
+                SIGNATORY_X,
+                SIGNATORY_Y,
+                (
+                    signatory_list[0]
+                    + ' '
+                    + signatory_list[1][0]
+                    + '.' + signatory_list[2][0]
+                    + '.'
+                )
+            )
+        elif len(signatory_list) == FI:
+            c.drawString(
+                SIGNATORY_X,
+                SIGNATORY_Y,
+                signatory_list[0] + ' ' + signatory_list[1][0] + '.'
+            )
+        else:
+            c.drawString(SIGNATORY_X, SIGNATORY_Y, signatory)
+    if cert_template == INTERNAL_CERT:
+        _draw_recipient(
+            c, recipient, page_width, RECIPIENT_INTERNAL_X,
+            RECIPIENT_INTERNAL_Y
+        )
+        if commander is None:
+            return
+        if (
+            commander.first_name
+            and commander.last_name
+            and commander.patronymic_name
+        ):
+            c.drawString(
+                SIGNATORY_X,
+                SIGNATORY_Y,
+                str(commander.first_name)[0].upper()
+                + '.'
+                + str(commander.patronymic_name)[0].upper()
+                + '. '
+                + str(commander.last_name).capitalize()
+            )
+        elif commander.first_name and commander.last_name:
+            c.drawString(
+                SIGNATORY_X,
+                SIGNATORY_Y,
+                str(commander.first_name)[0].upper()
+                + '. '
+                + str(commander.last_name).capitalize()
+            )
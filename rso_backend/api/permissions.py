@@ -4,7 +4,9 @@ from rest_framework import permissions, status
 from rest_framework.permissions import BasePermission
 from rest_framework.response import Response
 
-from api.utils import (check_commander_or_not, check_roles_for_edit,
+from api.role_context import get_role_context
+from api.utils import (check_commander_in_units, check_commander_or_not,
+                       check_roles_for_edit,
                        check_trusted_for_centralhead,
                        check_trusted_for_detachments,
                        check_trusted_for_districthead,
@@ -13,6 +15,7 @@ from api.utils import (check_commander_or_not, check_roles_for_edit,
                        check_trusted_in_headquarters, check_trusted_user,
                        get_central_hq_commander_num,
                        get_detachment_commander_num,
+                       get_district_headquarter_id,
                        get_district_hq_commander_num,
                        get_regional_hq_commander_num, is_central_event_master,
                        is_commander_this_detachment,
@@ -33,7 +36,6 @@ from headquarters.models import (CentralHeadquarter, Detachment,
                                  UserLocalHeadquarterPosition,
                                  UserRegionalHeadquarterPosition)
 from users.models import AdditionalForeignDocs, RSOUser, UserForeignParentDocs
-from users.serializers import UserCommanderSerializer, UserTrustedSerializer
 
 
 class IsStuffOrCentralCommander(BasePermission):
@@ -142,15 +144,12 @@ class IsRegionalCommander(BasePermission):
         check_roles - проверяет http-методы пользователя или роли.
         """
 
-        check_model_instance = False
-        user_id = request.user.id
-        if isinstance(obj, RegionalHeadquarter) and (
-                user_id == obj.commander_id
-                or (
-                        user_id == obj.district_headquarter.commander_id
-                )
-        ):
-            check_model_instance = True
+        check_model_instance = isinstance(
+            obj, RegionalHeadquarter
+        ) and check_commander_in_units(request, [
+            (RegionalHeadquarter, obj.id),
+            (DistrictHeadquarter, obj.district_headquarter_id),
+        ])
         check_roles = any([
             is_safe_method(request),
             is_stuff_or_central_commander(request),
@@ -191,18 +190,13 @@ class IsLocalCommander(BasePermission):
         check_roles - проверяет http-методы пользователя или роли.
         """
 
-        check_model_instance = False
-        user_id = request.user.id
-        regional_head = obj.regional_headquarter
-        if isinstance(obj, LocalHeadquarter) and any(
-                user_id == commander.commander_id
-                for commander in [
-                    obj,
-                    regional_head,
-                    regional_head.district_headquarter
-                ]
-        ):
-            check_model_instance = True
+        check_model_instance = isinstance(
+            obj, LocalHeadquarter
+        ) and check_commander_in_units(request, [
+            (LocalHeadquarter, obj.id),
+            (RegionalHeadquarter, obj.regional_headquarter_id),
+            (DistrictHeadquarter, get_district_headquarter_id(request, obj)),
+        ])
         check_roles = any([
             is_safe_method(request),
             is_stuff_or_central_commander(request),
@@ -244,24 +238,18 @@ class IsEducationalCommander(BasePermission):
         check_roles - проверяет http-методы пользователя или роли.
         """
 
-        check_model_instance = False
-        check_local_head = False
-        user_id = request.user.id
-        regional_head = obj.regional_headquarter
-        if isinstance(obj, EducationalHeadquarter) and any(
-                user_id == commander.commander_id
-                for commander in [
-                    obj,
-                    regional_head,
-                    regional_head.district_headquarter
-                ]
-        ):
-            check_model_instance = True
-        if local_head := obj.local_headquarter:
-            if isinstance(obj, Detachment) and (
-                    user_id == local_head.commander_id
-            ):
-                check_local_head = True
+        check_model_instance = isinstance(
+            obj, EducationalHeadquarter
+        ) and check_commander_in_units(request, [
+            (EducationalHeadquarter, obj.id),
+            (RegionalHeadquarter, obj.regional_headquarter_id),
+            (DistrictHeadquarter, get_district_headquarter_id(request, obj)),
+        ])
+        check_local_head = isinstance(
+            obj, Detachment
+        ) and check_commander_in_units(request, [
+            (LocalHeadquarter, obj.local_headquarter_id),
+        ])
         check_roles = any([
             is_safe_method(request),
             is_stuff_or_central_commander(request),
@@ -286,34 +274,14 @@ class IsDetachmentCommander(BasePermission):
 
     @classmethod
     def check_instances(cls, request, obj=None):
-        check_model_instance = False
-        check_local_head = False
-        check_edu_head = False
-        user_id = request.user.id
-        regional_head = obj.regional_headquarter
-        if isinstance(obj, Detachment) and any(
-                user_id == commander.commander_id
-                for commander in [
-                    obj,
-                    regional_head,
-                    regional_head.district_headquarter
-                ]
-        ):
-            check_model_instance = True
-        if local_head := obj.local_headquarter:
-            if isinstance(obj, Detachment) and (
-                    user_id == local_head.commander_id
-            ):
-                check_local_head = True
-        if edu_head := obj.educational_headquarter:
-            if isinstance(obj, Detachment) and (
-                    user_id == edu_head.commander_id
-            ):
-                check_edu_head = True
-        return any([
-            check_model_instance,
-            check_local_head,
-            check_edu_head
+        if not isinstance(obj, Detachment):
+            return False
+        return check_commander_in_units(request, [
+            (Detachment, obj.id),
+            (RegionalHeadquarter, obj.regional_headquarter_id),
+            (DistrictHeadquarter, get_district_headquarter_id(request, obj)),
+            (LocalHeadquarter, obj.local_headquarter_id),
+            (EducationalHeadquarter, obj.educational_headquarter_id),
         ])
 
     def has_permission(self, request, view):
@@ -547,18 +515,21 @@ class IsRegionalCommanderForCert(BasePermission):
             commanders_regional_head_id = RegionalHeadquarter.objects.filter(
                 commander_id=request.user.id
             ).first().id
-            for id in ids:
-                if id == 0:
-                    return Response(
-                        {'detail': 'Поле "ids" не может содержать 0.'},
-                    )
-                users_regional_head_id = (
-                    UserRegionalHeadquarterPosition.objects.get(
-                        user_id=id
-                    ).headquarter_id
+            if 0 in ids:
+                return Response(
+                    {'detail': 'Поле "ids" не может содержать 0.'},
                 )
+            users_regional_head_ids = dict(
+                UserRegionalHeadquarterPosition.objects.filter(
+                    user_id__in=ids
+                ).values_list('user_id', 'headquarter_id')
+            )
+            for id in ids:
+                if id not in users_regional_head_ids:
+                    raise UserRegionalHeadquarterPosition.DoesNotExist
                 if (
-                    users_regional_head_id != commanders_regional_head_id
+                    users_regional_head_ids[id]
+                    != commanders_regional_head_id
                 ):
                     check_model_instance = False
                     self.message = (
@@ -717,70 +688,14 @@ class IsUserModelPositionCommander(permissions.BasePermission):
     """
 
     POSITIONS = {
-        UserCentralHeadquarterPosition: [
-            'centralheadquarter_commander',
-            'centralheadquarter_trusted'
-        ],
-        UserDistrictHeadquarterPosition: [
-            'districtheadquarter_commander',
-            'districtheadquarter_trusted'
-        ],
-        UserRegionalHeadquarterPosition: [
-            'regionalheadquarter_commander',
-            'regionalheadquarter_trusted'
-        ],
-        UserLocalHeadquarterPosition: [
-            'localheadquarter_commander',
-            'localheadquarter_trusted'
-        ],
-        UserEducationalHeadquarterPosition: [
-            'educationalheadquarter_commander',
-            'educationalheadquarter_trusted'
-        ],
-        UserDetachmentPosition: [
-            'detachment_commander',
-            'detachment_trusted'
-        ]
+        UserCentralHeadquarterPosition: CentralHeadquarter,
+        UserDistrictHeadquarterPosition: DistrictHeadquarter,
+        UserRegionalHeadquarterPosition: RegionalHeadquarter,
+        UserLocalHeadquarterPosition: LocalHeadquarter,
+        UserEducationalHeadquarterPosition: EducationalHeadquarter,
+        UserDetachmentPosition: Detachment,
     }
 
-    def prepare_data_commander(self, request):
-        """Метод создает словарь со штабами/отрядами, где юзер - командир.
-
-        Пример словаря prepared_data, возвращаемого этим методом:
-        {
-            'centralheadquarter_commander': 1,
-            'localheadquarter_commander': 2,
-            ...
-            'detachment_commander': 3
-        }
-        """
-
-        data = UserCommanderSerializer(request.user).data
-        prepared_data = {}
-        for key, value in data.items():
-            if value and type(value) is not int:
-                prepared_data[key] = value['id']
-            else:
-                prepared_data[key] = value
-        return prepared_data
-
-    def prepare_data_trusted(self, request):
-        """Метод создает словарь со штабами/отрядами, где юзер - доверенный.
-
-        Пример словаря prepared_data, возвращаемого этим методом:
-        {
-            'centralheadquarter_trusted': 1,
-            'localheadquarter_trusted': 2,
-        }
-        """
-
-        data = UserTrustedSerializer(request.user).data
-        prepared_data = {}
-        for key, value in data.items():
-            if value:
-                prepared_data[key] = value
-        return prepared_data
-
     def has_permission(self, request, view):
         if (
             request.method in ['PUT', 'PATCH', 'DELETE']
@@ -792,17 +707,14 @@ class IsUserModelPositionCommander(permissions.BasePermission):
         return False
 
     def has_object_permission(self, request, view, obj):
-        headquarter_id = obj.headquarter.id
-        prepared_data = (
-            self.prepare_data_commander(request)
-            | self.prepare_data_trusted(request)
-        )
-        for prepared_key, prepared_value in prepared_data.items():
-            for model_position, commander_or_trusted in self.POSITIONS.items():
-                if prepared_key in commander_or_trusted:
-                    if isinstance(obj, model_position):
-                        if headquarter_id == prepared_value:
-                            return True
+        headquarter_id = obj.headquarter_id
+        role_context = get_role_context(request)
+        for model_position, model_unit in self.POSITIONS.items():
+            if isinstance(obj, model_position):
+                return (
+                    role_context.is_commander(model_unit, headquarter_id)
+                    or role_context.is_trusted(model_position, headquarter_id)
+                )
         return False
 
 
@@ -812,11 +724,8 @@ class IsCommanderOrTrustedAnywhere(BasePermission):
     лицом хотя бы где-либо.
     """
     def has_object_permission(self, request, view, obj):
-        commander_data = UserCommanderSerializer(request.user).data
-        trusted_data = UserTrustedSerializer(request.user).data
-        if any(commander_data.values()) or any(trusted_data.values()):
-            return True
-        return False
+        role_context = get_role_context(request)
+        return bool(role_context.commanded or role_context.get_trusted_ids())
 
 
 class IsRegionalCommanderForCompetition(BasePermission):
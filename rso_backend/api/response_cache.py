@@ -0,0 +1,184 @@
+"""Кэш ответов API с инвалидацией по тегам моделей.
+
+Ключ ответа включает версии всех его тегов. Тег - это приложение
+('headquarters'), модель ('headquarters.detachment') или объект
+('headquarters.detachment:5'). Сигналы сохранения/удаления строки
+увеличивают версии ее тегов, поэтому закэшированные по старым версиям
+ответы больше не читаются и истекают по своему TTL.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+RESPONSE_KEY = 'response:{view}:{url}:{versions}'
+STALE_RESPONSE_KEY = 'response_stale:{view}:{url}'
+LOCK_KEY = 'response_lock:{view}:{url}'
+TAG_VERSION_KEY = 'response_tag:{tag}'
+METRICS_KEY = 'response_metrics:{view}:{event}'
+METRIC_EVENTS = ('hit', 'stale', 'miss', 'recompute')
+
+# Приложения, изменения моделей которых сбрасывают кэш ответов.
+CACHED_APPS = ('headquarters', 'events', 'users')
+# Служебные модели, которые не выводятся в ответах API.
+NOT_CACHED_MODELS = ('headquarters.unitancestor',)
+
+# Теги ответов: звенья выводят командира с аватаркой, число участников
+# и мероприятий; списки участников - пользователей и их должности.
+USER_TAGS = ('users.rsouser', 'users.usermedia')
+UNITS_TAGS = ('headquarters', 'events.event') + USER_TAGS
+MEMBERS_TAGS = ('headquarters',) + USER_TAGS
+EVENTS_TAGS = ('events', 'headquarters') + USER_TAGS
+USERS_TAGS = ('users', 'headquarters')
+
+
+def get_instance_tags(instance) -> tuple:
+    """Теги строки: приложение, модель и сам объект."""
+    opts = instance._meta
+    return (
+        opts.app_label,
+        opts.label_lower,
+        f'{opts.label_lower}:{instance.pk}',
+    )
+
+
+def get_tag_versions(tags) -> list:
+    """Версии тегов одним запросом к Redis.
+
+    Отсутствующие версии заводятся временем в наносекундах, чтобы после
+    вытеснения ключа версии не прочитать ответы по старой версии.
+    """
+    keys = [TAG_VERSION_KEY.format(tag=tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bump_tags(tags):
+    for tag in tags:
+        key = TAG_VERSION_KEY.format(tag=tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_tags(*tags):
+    """Сбрасывает ответы с тегами сразу и еще раз после коммита.
+
+    Повтор после коммита не дает параллельному запросу оставить
+    в кэше ответ, собранный по еще не закоммиченным данным.
+    """
+    tags = set(tags)
+    if not tags:
+        return
+    _bump_tags(tags)
+    transaction.on_commit(lambda: _bump_tags(tags))
+
+
+def record_metric(view, event):
+    """Увеличивает счетчик события кэша ответов: hit, stale, miss,
+    recompute."""
+    key = METRICS_KEY.format(view=view, event=event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_metrics(view) -> dict:
+    """Счетчики событий кэша ответов вьюсета, например
+    'RegionalViewSet.list'."""
+    keys = {
+        METRICS_KEY.format(view=view, event=event): event
+        for event in METRIC_EVENTS
+    }
+    values = cache.get_many(keys)
+    return {event: values.get(key, 0) for key, event in keys.items()}
+
+
+def wait_for_response(key):
+    """Ждет, пока ответ посчитает воркер, взявший блокировку."""
+    deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cache_response(timeout, tags, soft_timeout=None):
+    """Декоратор метода вьюсета, кэширующий данные успешного ответа.
+
+    tags - теги, от которых зависит ответ. В теги подставляются
+    kwargs запроса, например 'headquarters.detachment:{pk}'.
+    Права проверяются до вызова метода, поэтому, как и cache_page,
+    декоратор не отдает ответ тем, кому он недоступен.
+
+    timeout - жесткий TTL, soft_timeout - мягкий: после него ответ
+    пересчитывает один воркер, взявший блокировку в Redis, а остальные
+    до конца пересчета получают прежний ответ. Последний ответ также
+    отдается на время пересчета после сброса тегов, а если его нет -
+    остальные воркеры ждут результат, а не считают его одновременно.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            view = f'{type(self).__name__}.{method.__name__}'
+            response_tags = [tag.format(**kwargs) for tag in tags]
+            url = hashlib.md5(
+                request.build_absolute_uri().encode()
+            ).hexdigest()
+            key = RESPONSE_KEY.format(
+                view=view,
+                url=url,
+                versions='.'.join(
+                    map(str, get_tag_versions(response_tags))
+                )
+            )
+            stale_key = STALE_RESPONSE_KEY.format(view=view, url=url)
+            entry = cache.get(key)
+            if entry is not None and entry[1] > time.time():
+                record_metric(view, 'hit')
+                return Response(entry[0])
+
+            lock_key = LOCK_KEY.format(view=view, url=url)
+            if not cache.add(
+                lock_key, 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT
+            ):
+                entry = entry or cache.get(stale_key)
+                if entry is not None:
+                    record_metric(view, 'stale')
+                    return Response(entry[0])
+                entry = wait_for_response(key)
+                if entry is not None:
+                    record_metric(view, 'hit')
+                    return Response(entry[0])
+                record_metric(view, 'miss')
+                return method(self, request, *args, **kwargs)
+
+            record_metric(view, 'recompute')
+            try:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    entry = (
+                        response.data,
+                        time.time() + (soft_timeout or timeout)
+                    )
+                    cache.set_many(
+                        {key: entry, stale_key: entry}, timeout
+                    )
+            finally:
+                cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,76 @@
+"""Кэш ролей пользователя в Redis (кэш default).
+
+У каждого пользователя есть номер версии ролей, данные лежат под ключами
+с этой версией. Сигналы сохранения/удаления должностей и смены командира
+штаба увеличивают версию, поэтому старые записи больше не читаются
+и истекают по USER_ROLES_CACHE_TTL.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.role_context import load_commanded_ids
+
+ROLES_KEY = 'user_roles:{kind}:{user_id}'
+ROLES_VERSION_KEY = 'user_roles_version:{user_id}'
+
+
+def get_roles_version(user_id):
+    """Текущая версия ролей пользователя.
+
+    Начальная версия - время в наносекундах, чтобы после вытеснения
+    ключа версии из Redis не прочитать записи старой версии.
+    """
+    key = ROLES_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_cached_roles(user_id, kind, load):
+    """Данные ролей вида kind из кэша, при промахе - load()."""
+    version = get_roles_version(user_id)
+    key = ROLES_KEY.format(kind=kind, user_id=user_id)
+    data = cache.get(key, version=version)
+    if data is None:
+        data = load()
+        cache.set(
+            key, data, settings.USER_ROLES_CACHE_TTL, version=version
+        )
+    return data
+
+
+def _bump_roles_versions(user_ids):
+    for user_id in user_ids:
+        key = ROLES_VERSION_KEY.format(user_id=user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_user_roles(*user_ids):
+    """Сбрасывает кэш ролей пользователей, увеличивая их версию.
+
+    Версия увеличивается сразу и еще раз после коммита транзакции:
+    иначе параллельный запрос мог бы успеть закэшировать роли
+    по еще не закоммиченным данным.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    _bump_roles_versions(user_ids)
+    transaction.on_commit(lambda: _bump_roles_versions(user_ids))
+
+
+def get_commanded_unit_ids(user) -> dict:
+    """{имя модели звена: id звена, где пользователь командир}."""
+    if not user.is_authenticated:
+        return {}
+    return get_cached_roles(
+        user.id, 'commanded', lambda: load_commanded_ids(user.id)
+    )
@@ -0,0 +1,169 @@
+"""Роли пользователя в структурных единицах на время одного запроса.
+
+RoleContext загружает все звенья, где пользователь командир, и все его
+членства в штабах/отрядах двумя запросами и кэшируется на объекте запроса,
+поэтому пермишены и хелперы api.utils не ходят в базу повторно.
+"""
+from django.db.models import CharField, Value
+from django.utils.functional import cached_property
+
+from headquarters.models import (CentralHeadquarter, Detachment,
+                                 DistrictHeadquarter, EducationalHeadquarter,
+                                 LocalHeadquarter, RegionalHeadquarter,
+                                 UserCentralHeadquarterPosition,
+                                 UserDetachmentPosition,
+                                 UserDistrictHeadquarterPosition,
+                                 UserEducationalHeadquarterPosition,
+                                 UserLocalHeadquarterPosition,
+                                 UserRegionalHeadquarterPosition)
+
+COMMANDER_MODELS = (
+    CentralHeadquarter,
+    DistrictHeadquarter,
+    RegionalHeadquarter,
+    LocalHeadquarter,
+    EducationalHeadquarter,
+    Detachment,
+)
+
+POSITION_MODELS = (
+    UserCentralHeadquarterPosition,
+    UserDistrictHeadquarterPosition,
+    UserRegionalHeadquarterPosition,
+    UserLocalHeadquarterPosition,
+    UserEducationalHeadquarterPosition,
+    UserDetachmentPosition,
+)
+
+REQUEST_ATTRIBUTE = '_role_context'
+
+
+def _tagged(queryset, model, *fields):
+    """values_list с именем модели первой колонкой - для UNION."""
+    return queryset.annotate(
+        model_name=Value(model.__name__, output_field=CharField())
+    ).values_list('model_name', *fields).order_by()
+
+
+def load_commanded_ids(user_id) -> dict:
+    """{имя модели звена: id звена, где пользователь командир} одним запросом."""
+    querysets = [
+        _tagged(model.objects.filter(commander_id=user_id), model, 'id')
+        for model in COMMANDER_MODELS
+    ]
+    return dict(querysets[0].union(*querysets[1:], all=True))
+
+
+class Membership:
+    """Членство пользователя в штабе/отряде."""
+
+    __slots__ = ('headquarter_id', 'is_trusted', 'position_name')
+
+    def __init__(self, headquarter_id, is_trusted, position_name):
+        self.headquarter_id = headquarter_id
+        self.is_trusted = is_trusted
+        self.position_name = position_name
+
+
+class RoleContext:
+    """Роли пользователя: где он командир и где состоит/доверенный.
+
+    Данные загружаются лениво при первом обращении: один запрос
+    для командиров и один для членств.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.user_id = user.id if user.is_authenticated else None
+
+    @cached_property
+    def commanded(self) -> dict:
+        """{модель звена: id звена, где пользователь командир}."""
+        if self.user_id is None:
+            return {}
+        models = {model.__name__: model for model in COMMANDER_MODELS}
+        return {
+            models[model_name]: unit_id
+            for model_name, unit_id in load_commanded_ids(self.user_id).items()
+        }
+
+    @cached_property
+    def memberships(self) -> dict:
+        """{модель членства: Membership}."""
+        if self.user_id is None:
+            return {}
+        querysets = [
+            _tagged(
+                model.objects.filter(user_id=self.user_id), model,
+                'headquarter_id', 'is_trusted', 'position__name'
+            )
+            for model in POSITION_MODELS
+        ]
+        models = {model.__name__: model for model in POSITION_MODELS}
+        return {
+            models[model_name]: Membership(*values)
+            for model_name, *values in querysets[0].union(
+                *querysets[1:], all=True
+            )
+        }
+
+    def is_commander(self, model, unit_id=None) -> bool:
+        """Командир звена модели model (конкретного, если передан unit_id)."""
+        commanded_id = self.commanded.get(model)
+        if commanded_id is None:
+            return False
+        return unit_id is None or commanded_id == unit_id
+
+    def is_commander_of_any(self, models) -> bool:
+        return any(model in self.commanded for model in models)
+
+    def is_trusted(self, position_model, headquarter_id=None) -> bool:
+        """Доверенный в штабе/отряде (конкретном, если передан id)."""
+        membership = self.memberships.get(position_model)
+        if membership is None or not membership.is_trusted:
+            return False
+        return (
+            headquarter_id is None
+            or membership.headquarter_id == headquarter_id
+        )
+
+    def is_trusted_in_any(self, position_models) -> bool:
+        return any(self.is_trusted(model) for model in position_models)
+
+    def has_position(self, position_model, position_name) -> bool:
+        membership = self.memberships.get(position_model)
+        return (
+            membership is not None
+            and membership.position_name == position_name
+        )
+
+    def get_trusted_ids(self) -> dict:
+        """{модель членства: id штаба/отряда, где пользователь доверенный}."""
+        return {
+            model: membership.headquarter_id
+            for model, membership in self.memberships.items()
+            if membership.is_trusted
+        }
+
+    @property
+    def is_staff_or_central_commander(self) -> bool:
+        return self.user_id is not None and (
+            self.user.is_superuser
+            or self.user.is_staff
+            or self.is_commander(CentralHeadquarter)
+        )
+
+
+def get_role_context(request) -> RoleContext:
+    """RoleContext текущего запроса, создается при первом обращении.
+
+    Хранится на исходном HttpRequest, чтобы все обертки DRF Request
+    одного запроса использовали один контекст.
+    """
+    http_request = getattr(request, '_request', request)
+    context = getattr(http_request, REQUEST_ATTRIBUTE, None)
+    user_id = request.user.id if request.user.is_authenticated else None
+    if context is None or context.user_id != user_id:
+        context = RoleContext(request.user)
+        setattr(http_request, REQUEST_ATTRIBUTE, context)
+    return context
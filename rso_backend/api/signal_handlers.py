@@ -0,0 +1,45 @@
+from django.apps import apps
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from api.response_cache import (CACHED_APPS, NOT_CACHED_MODELS,
+                                get_instance_tags, invalidate_tags)
+
+
+def invalidate_cached_responses(sender, instance, raw=False, **kwargs):
+    """
+    Функция для сброса кэша ответов API, зависящих от сохраненной
+    или удаленной строки.
+    """
+
+    if not raw:
+        invalidate_tags(*get_instance_tags(instance))
+
+
+def invalidate_cached_responses_on_m2m(sender, instance, action, **kwargs):
+    """
+    Функция для сброса кэша ответов API при изменении связей
+    многие-ко-многим.
+    """
+
+    if action.startswith('post_'):
+        invalidate_tags(*get_instance_tags(instance))
+
+
+def connect_response_cache_signals():
+    """Подключает сброс кэша ответов к моделям CACHED_APPS.
+
+    Обработчики подключаются к конкретным моделям, а не ко всем сразу:
+    иначе Django не сможет удалять строки остальных моделей
+    одним запросом без отправки сигналов.
+    """
+    for app_label in CACHED_APPS:
+        for model in apps.get_app_config(app_label).get_models():
+            if model._meta.label_lower in NOT_CACHED_MODELS:
+                continue
+            post_save.connect(invalidate_cached_responses, sender=model)
+            post_delete.connect(invalidate_cached_responses, sender=model)
+            for field in model._meta.local_many_to_many:
+                m2m_changed.connect(
+                    invalidate_cached_responses_on_m2m,
+                    sender=field.remote_field.through
+                )
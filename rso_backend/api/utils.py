@@ -21,9 +21,11 @@ from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 
+from api.role_cache import get_commanded_unit_ids
+from api.role_context import get_role_context
 from competitions.models import CompetitionParticipants
-from headquarters.models import (CentralHeadquarter, Detachment,
-                                 DistrictHeadquarter, RegionalHeadquarter,
+from headquarters.models import (Detachment, DistrictHeadquarter,
+                                 RegionalHeadquarter,
                                  UserCentralHeadquarterPosition,
                                  UserDetachmentPosition,
                                  UserDistrictHeadquarterPosition,
@@ -102,40 +104,17 @@ def is_stuff_or_central_commander(request):
     Если роль совпала с ролью админа или командира ЦШ, возвращает True.
     """
 
-    check_central_commander = False
-    try:
-        commander_id = CentralHeadquarter.objects.get(
-            commander_id=request.user.id
-        ).commander_id
-        if request.user.id == commander_id:
-            check_central_commander = True
-    except (CentralHeadquarter.DoesNotExist, AttributeError):
-        check_central_commander = False
-    return (request.user.is_authenticated
-            and any([
-                check_central_commander,
-                request.user.is_superuser,
-                request.user.is_staff
-            ]))
+    return get_role_context(request).is_staff_or_central_commander
 
 
 def check_commander_or_not(request, headquarters):
     """Проверка является ли юзер командиром.
 
-    headquarters - список моделей, в которых проверяется роль пользователя.
+    headquarters - список моделей, в которых проверяется роль пользователя.
     request - запрос к эндпоинту
     """
-    result = False
-    for headquarter in headquarters:
-        try:
-            if headquarter.objects.get(
-                    commander_id=request.user.id
-            ) is not None:
-                result = True
-                break
-        except (headquarter.DoesNotExist, AttributeError):
-            pass
-    return result
+
+    return get_role_context(request).is_commander_of_any(headquarters)
 
 
 def check_role_get(request, model, position_in_quarter):
@@ -147,37 +126,16 @@ def check_role_get(request, model, position_in_quarter):
     position_in_quarter - требуемая должность для получения True.
     """
 
-    try:
-        user_headquarter_object = model.objects.get(user_id=request.user.id)
-        position_name = (
-            user_headquarter_object.position.name
-            if user_headquarter_object.position else None
-        )
-    except (model.DoesNotExist, AttributeError):
-        return False
-    return (
-            request.user.is_authenticated and position_name == position_in_quarter
-    )
+    return get_role_context(request).has_position(model, position_in_quarter)
 
 
-def search_trusted_in_list(user_id, tables_list):
+def search_trusted_in_list(request, tables_list):
     """Поиск первого доверенного пользователя в списке таблиц.
 
     tables_list - список таблиц, в котором производится поиск.
     """
 
-    index = 0
-    number_of_tables = len(tables_list)
-    while index < number_of_tables:
-        try:
-            if tables_list[index].objects.get(
-                    user_id=user_id
-            ).is_trusted:
-                return True
-            index += 1
-        except (tables_list[index].DoesNotExist, AttributeError):
-            index += 1
-    return False
+    return get_role_context(request).is_trusted_in_any(tables_list)
 
 
 def check_trusted_user(request, model, obj):
@@ -189,16 +147,57 @@ def check_trusted_user(request, model, obj):
     в той структурной единице, к которой пользователь сделал запрос.
     """
 
-    try:
-        member = model.objects.filter(
-            user_id=request.user.id,
-            headquarter_id=obj.id
-        ).first()
-        is_trusted = member.is_trusted
-    except AttributeError:
-        return False
-    return (
-            request.user.is_authenticated and is_trusted
+    return get_role_context(request).is_trusted(model, obj.id)
+
+
+def check_trusted_in_units(request, units):
+    """Проверка доверенности в одной из структурных единиц.
+
+    units - список пар (модель 'Члены штаба/отряда', id штаба/отряда).
+    Пары с id=None пропускаются.
+    """
+
+    role_context = get_role_context(request)
+    return any(
+        role_context.is_trusted(model, headquarter_id)
+        for model, headquarter_id in units
+        if headquarter_id is not None
+    )
+
+
+def get_district_headquarter_id(request, obj):
+    """id окружного штаба, в который входит obj.
+
+    Региональный штаб подгружается, только если у пользователя есть
+    роль в каком-либо окружном штабе, иначе возвращается None.
+    """
+
+    role_context = get_role_context(request)
+    if not (
+        role_context.is_commander(DistrictHeadquarter)
+        or role_context.is_trusted(UserDistrictHeadquarterPosition)
+    ):
+        return None
+    if isinstance(obj, RegionalHeadquarter):
+        return obj.district_headquarter_id
+    regional_headquarter = obj.regional_headquarter
+    if regional_headquarter is None:
+        return None
+    return regional_headquarter.district_headquarter_id
+
+
+def check_commander_in_units(request, units):
+    """Проверка, является ли пользователь командиром одной из единиц.
+
+    units - список пар (модель штаба/отряда, id штаба/отряда).
+    Пары с id=None пропускаются.
+    """
+
+    role_context = get_role_context(request)
+    return any(
+        role_context.is_commander(model, unit_id)
+        for model, unit_id in units
+        if unit_id is not None
     )
 
 
@@ -219,57 +218,18 @@ def check_trusted_for_detachments(request, obj=None):
         UserRegionalHeadquarterPosition,
         UserDistrictHeadquarterPosition
     ]
-    user_id = request.user.id
-    if obj is not None:
-        try:
-            detachment_trusted = UserDetachmentPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDetachmentPosition.DoesNotExist, AttributeError):
-            detachment_trusted = False
-        try:
-            headquarter_id = obj.educational_headquarter.id
-            edu_trusted = UserEducationalHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (
-                UserEducationalHeadquarterPosition.DoesNotExist, AttributeError
-        ):
-            edu_trusted = False
-        try:
-            headquarter_id = obj.local_headquarter.id
-            local_trusted = UserLocalHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (UserLocalHeadquarterPosition.DoesNotExist, AttributeError):
-            local_trusted = False
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                headquarter_id=obj.regional_headquarter.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            regional_trusted = False
-        try:
-            headquarter_id = obj.regional_headquarter.district_headquarter.id
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            district_trusted = False
-        return any([
-            detachment_trusted,
-            edu_trusted,
-            local_trusted,
-            regional_trusted,
-            district_trusted
-        ])
-    else:
-        return search_trusted_in_list(user_id, tables_for_check)
+    if obj is None:
+        return search_trusted_in_list(request, tables_for_check)
+    return check_trusted_in_units(request, [
+        (UserDetachmentPosition, obj.id),
+        (UserEducationalHeadquarterPosition, obj.educational_headquarter_id),
+        (UserLocalHeadquarterPosition, obj.local_headquarter_id),
+        (UserRegionalHeadquarterPosition, obj.regional_headquarter_id),
+        (
+            UserDistrictHeadquarterPosition,
+            get_district_headquarter_id(request, obj)
+        ),
+    ])
 
 
 def check_trusted_for_eduhead(request, obj=None):
@@ -288,52 +248,17 @@ def check_trusted_for_eduhead(request, obj=None):
         UserRegionalHeadquarterPosition,
         UserDistrictHeadquarterPosition
     ]
-    user_id = request.user.id
-    if obj is not None:
-        try:
-            edu_trusted = UserEducationalHeadquarterPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (
-                UserEducationalHeadquarterPosition.DoesNotExist, AttributeError
-        ):
-            edu_trusted = False
-        try:
-            headquarter_id = obj.local_headquarter.id
-            local_trusted = UserLocalHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (UserLocalHeadquarterPosition.DoesNotExist, AttributeError):
-            local_trusted = False
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                headquarter_id=obj.regional_headquarter.id,
-                user_id=user_id
-            ).is_trusted
-        except (
-                UserRegionalHeadquarterPosition.DoesNotExist, AttributeError
-        ):
-            regional_trusted = False
-        try:
-            head_id = obj.regional_headquarter.district_headquarter.id
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=head_id,
-                user_id=user_id
-            ).is_trusted
-        except (
-                UserDistrictHeadquarterPosition.DoesNotExist, AttributeError
-        ):
-            district_trusted = False
-        return any([
-            edu_trusted,
-            local_trusted,
-            regional_trusted,
-            district_trusted
-        ])
-    else:
-        return search_trusted_in_list(user_id, tables_for_check)
+    if obj is None:
+        return search_trusted_in_list(request, tables_for_check)
+    return check_trusted_in_units(request, [
+        (UserEducationalHeadquarterPosition, obj.id),
+        (UserLocalHeadquarterPosition, obj.local_headquarter_id),
+        (UserRegionalHeadquarterPosition, obj.regional_headquarter_id),
+        (
+            UserDistrictHeadquarterPosition,
+            get_district_headquarter_id(request, obj)
+        ),
+    ])
 
 
 def check_trusted_for_localhead(request, obj=None):
@@ -351,37 +276,16 @@ def check_trusted_for_localhead(request, obj=None):
         UserRegionalHeadquarterPosition,
         UserDistrictHeadquarterPosition
     ]
-    user_id = request.user.id
-    if obj is not None:
-        try:
-            local_trusted = UserLocalHeadquarterPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserLocalHeadquarterPosition.DoesNotExist, AttributeError):
-            local_trusted = False
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                headquarter_id=obj.regional_headquarter.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            regional_trusted = False
-        try:
-            headquarter_id = obj.regional_headquarter.district_headquarter.id
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=headquarter_id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            district_trusted = False
-        return any([
-            local_trusted,
-            regional_trusted,
-            district_trusted
-        ])
-    else:
-        return search_trusted_in_list(user_id, tables_for_check)
+    if obj is None:
+        return search_trusted_in_list(request, tables_for_check)
+    return check_trusted_in_units(request, [
+        (UserLocalHeadquarterPosition, obj.id),
+        (UserRegionalHeadquarterPosition, obj.regional_headquarter_id),
+        (
+            UserDistrictHeadquarterPosition,
+            get_district_headquarter_id(request, obj)
+        ),
+    ])
 
 
 def check_trusted_for_regionalhead(request, obj=None):
@@ -394,38 +298,14 @@ def check_trusted_for_regionalhead(request, obj=None):
     в Окружном штабе и если существует, то возвращает статус доверенности.
     """
 
-    user_id = request.user.id
-    if obj is not None:
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            regional_trusted = False
-        try:
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=obj.district_headquarter.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            district_trusted = False
-    else:
-        try:
-            regional_trusted = UserRegionalHeadquarterPosition.objects.get(
-                user_id=user_id
-            ).is_trusted
-        except (UserRegionalHeadquarterPosition.DoesNotExist, AttributeError):
-            regional_trusted = False
-        try:
-            district_trusted = UserDistrictHeadquarterPosition.objects.get(
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            district_trusted = False
-    return any([
-        regional_trusted,
-        district_trusted
+    if obj is None:
+        return search_trusted_in_list(request, [
+            UserRegionalHeadquarterPosition,
+            UserDistrictHeadquarterPosition
+        ])
+    return check_trusted_in_units(request, [
+        (UserRegionalHeadquarterPosition, obj.id),
+        (UserDistrictHeadquarterPosition, obj.district_headquarter_id),
     ])
 
 
@@ -438,22 +318,9 @@ def check_trusted_for_districthead(request, obj=None):
     в Окружном штабе и если существует, то возвращает статус доверенности.
     """
 
-    user_id = request.user.id
-    if obj is not None:
-        try:
-            return UserDistrictHeadquarterPosition.objects.get(
-                headquarter_id=obj.id,
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            return False
-    else:
-        try:
-            return UserDistrictHeadquarterPosition.objects.get(
-                user_id=user_id
-            ).is_trusted
-        except (UserDistrictHeadquarterPosition.DoesNotExist, AttributeError):
-            return False
+    return get_role_context(request).is_trusted(
+        UserDistrictHeadquarterPosition, obj.id if obj is not None else None
+    )
 
 
 def check_trusted_for_centralhead(request):
@@ -464,16 +331,7 @@ def check_trusted_for_centralhead(request):
     в Центральном штабе и если существует, то возвращает статус доверенности.
     """
 
-    request_user_id = request.user.id
-    try:
-        return UserCentralHeadquarterPosition.objects.get(
-            user_id=request_user_id
-        ).is_trusted
-    except (
-            UserCentralHeadquarterPosition.DoesNotExist,
-            AttributeError
-    ):
-        return False
+    return get_role_context(request).is_trusted(UserCentralHeadquarterPosition)
 
 
 def check_roles_for_edit(request, roles_models: dict):
@@ -635,61 +493,25 @@ def is_regional_commander(user):
 def get_detachment_commander_num(user) -> int | None:
     """Получение id отряда, в котором юзер командир."""
 
-    try:
-        detachment_commander_num = Detachment.objects.get(
-            commander=user
-        ).id
-    except (
-            Detachment.DoesNotExist, AttributeError, ValueError,
-            Detachment.MultipleObjectsReturned
-    ):
-        return None
-    return detachment_commander_num
+    return get_commanded_unit_ids(user).get('Detachment')
 
 
 def get_regional_hq_commander_num(user) -> int | None:
     """Получение id регионального штаба, в котором юзер командир."""
 
-    try:
-        reghq_commander_num = RegionalHeadquarter.objects.get(
-            commander=user
-        ).id
-    except (
-            RegionalHeadquarter.DoesNotExist, AttributeError, ValueError,
-            RegionalHeadquarter.MultipleObjectsReturned
-    ):
-        return None
-    return reghq_commander_num
+    return get_commanded_unit_ids(user).get('RegionalHeadquarter')
 
 
 def get_district_hq_commander_num(user) -> int | None:
     """Получение id Окружного штаба, в котором юзер командир."""
 
-    try:
-        district_headquarter_commander_num = DistrictHeadquarter.objects.get(
-            commander=user
-        ).id
-    except (
-            DistrictHeadquarter.DoesNotExist, AttributeError, ValueError,
-            DistrictHeadquarter.MultipleObjectsReturned
-    ):
-        return None
-    return district_headquarter_commander_num
+    return get_commanded_unit_ids(user).get('DistrictHeadquarter')
 
 
 def get_central_hq_commander_num(user) -> int | None:
     """Получение id Центрального штаба, в котором юзер командир."""
 
-    try:
-        central_headquarter_commander_num = CentralHeadquarter.objects.get(
-            commander=user
-        ).id
-    except (
-            CentralHeadquarter.DoesNotExist, AttributeError, ValueError,
-            CentralHeadquarter.MultipleObjectsReturned
-    ):
-        return None
-    return central_headquarter_commander_num
+    return get_commanded_unit_ids(user).get('CentralHeadquarter')
 
 
 def is_commander_this_detachment(user, detachment):
@@ -5,3 +5,7 @@ class CompetitionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'competitions'
     verbose_name = 'Конкурсы'
+
+    def ready(self):
+        from competitions.signal_handlers import connect_change_log_signals
+        connect_change_log_signals()
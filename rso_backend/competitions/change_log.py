@@ -0,0 +1,166 @@
+"""Журнал изменений показателей конкурса.
+
+Для каждого показателя и конкурса в Redis хранится множество id отрядов,
+чьи отчеты или участия изменились с последнего пересчета. Множества
+заполняют обработчики сигналов (competitions.signal_handlers), а задачи
+расчета мест забирают их целиком: пересчитывают места, только если
+что-то изменилось, и очки - только измененных отчетов.
+"""
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django_redis import get_redis_connection
+
+from competitions.models import (Q7, Q8, Q9, Q10, Q11, Q12, Q7Report,
+                                 Q8Report, Q9Report, Q10Report, Q11Report,
+                                 Q12Report, Q16Report, Q20Report)
+
+CHANGES_KEY = 'competition_changes:{competition_id}:{indicator}'
+
+# Модели отчетов и участий, изменения которых попадают в журнал.
+REPORT_MODELS = {
+    'q7': Q7Report,
+    'q8': Q8Report,
+    'q9': Q9Report,
+    'q10': Q10Report,
+    'q11': Q11Report,
+    'q12': Q12Report,
+    'q16': Q16Report,
+    'q20': Q20Report,
+}
+PARTICIPATION_MODELS = {
+    'q7': Q7,
+    'q8': Q8,
+    'q9': Q9,
+    'q10': Q10,
+    'q11': Q11,
+    'q12': Q12,
+}
+CHANGE_LOG_INDICATORS = tuple(REPORT_MODELS)
+
+
+def get_changes_key(indicator, competition_id):
+    """Полный ключ Redis с префиксом и версией кэша default."""
+    return cache.make_key(CHANGES_KEY.format(
+        competition_id=competition_id, indicator=indicator
+    ))
+
+
+def _add_changes(indicators, competition_id, detachment_ids):
+    redis = get_redis_connection('default')
+    with redis.pipeline() as pipe:
+        for indicator in indicators:
+            pipe.sadd(
+                get_changes_key(indicator, competition_id), *detachment_ids
+            )
+        pipe.execute()
+
+
+def log_changes(indicators, competition_id, *detachment_ids):
+    """Отмечает отряды измененными по показателям.
+
+    Запись делается сразу и еще раз после коммита: иначе задача
+    расчета могла бы забрать журнал раньше, чем изменения станут
+    видны в базе.
+    """
+    detachment_ids = {
+        detachment_id for detachment_id in detachment_ids
+        if detachment_id is not None
+    }
+    if not detachment_ids or competition_id is None:
+        return
+    _add_changes(indicators, competition_id, detachment_ids)
+    transaction.on_commit(
+        lambda: _add_changes(indicators, competition_id, detachment_ids)
+    )
+
+
+def has_changes(indicator, competition_id) -> bool:
+    redis = get_redis_connection('default')
+    return bool(redis.scard(get_changes_key(indicator, competition_id)))
+
+
+@contextmanager
+def take_changes(indicator, competition_id):
+    """Забирает журнал показателя: set id измененных отрядов.
+
+    Если расчет завершился ошибкой, отряды возвращаются в журнал.
+    """
+    redis = get_redis_connection('default')
+    key = get_changes_key(indicator, competition_id)
+    with redis.pipeline() as pipe:
+        pipe.smembers(key)
+        pipe.delete(key)
+        members, _ = pipe.execute()
+    detachment_ids = {int(member) for member in members}
+    try:
+        yield detachment_ids
+    except Exception:
+        if detachment_ids:
+            _add_changes((indicator,), competition_id, detachment_ids)
+        raise
+
+
+def log_participants_change(participant):
+    """Состав участников влияет на места по всем показателям."""
+    log_changes(
+        CHANGE_LOG_INDICATORS, participant.competition_id,
+        participant.junior_detachment_id, participant.detachment_id
+    )
+
+
+def log_report_change(indicator, report):
+    log_changes((indicator,), report.competition_id, report.detachment_id)
+
+
+def log_participation_change(indicator, participation):
+    report = REPORT_MODELS[indicator].objects.filter(
+        id=participation.detachment_report_id
+    ).values('competition_id', 'detachment_id').first()
+    if report is not None:
+        log_changes(
+            (indicator,), report['competition_id'], report['detachment_id']
+        )
+
+
+def rescore_participation_reports(indicator, competition_id,
+                                  detachment_ids=None):
+    """Пересчитывает очки отчетов Q7-Q12 конкурса.
+
+    Считаются только отчеты отрядов detachment_ids (все, если None).
+    """
+    reports = REPORT_MODELS[indicator].objects.filter(
+        competition_id=competition_id
+    )
+    if detachment_ids is not None:
+        reports = reports.filter(detachment_id__in=detachment_ids)
+    return rescore_reports(indicator, reports)
+
+
+def rescore_reports(indicator, reports):
+    """Пересчитывает очки отчетов Q7-Q12 по верифицированным участиям.
+
+    Q7-Q8 - сумма участников, Q9-Q12 - сумма (4 - призовое место).
+    Очки всех отчетов queryset reports считаются одним запросом
+    и пишутся bulk_update. Возвращает число измененных отчетов.
+    """
+    verified = PARTICIPATION_MODELS[indicator].objects.filter(
+        detachment_report__in=reports, is_verified=True
+    ).values('detachment_report_id')
+    if indicator in ('q7', 'q8'):
+        verified = verified.annotate(score=Sum('number_of_participants'))
+    else:
+        verified = verified.annotate(
+            score=4 * Count('id') - Sum('prize_place')
+        )
+    scores = dict(verified.values_list('detachment_report_id', 'score'))
+    to_update = []
+    for report in reports.only('id', 'score'):
+        score = scores.get(report.id, 0)
+        if report.score != score:
+            report.score = score
+            to_update.append(report)
+    REPORT_MODELS[indicator].objects.bulk_update(to_update, ['score'])
+    return len(to_update)
@@ -87,6 +87,8 @@ DETACHMENT_REPORTS_MODELS = {
 }
 
 COUNT_PLACES_DEADLINE = date(2024, 10, 15) + timedelta(days=1)
+# Попытки тестов Q3/Q4 учитываются, если начаты до этой даты.
+Q3_Q4_ATTEMPTS_DEADLINE = date(2024, 5, 16)
 
 DEADLINE_RESPONSE_TEMPLATE = 'Прием ответов по показателю окончен {deadline}.'
 
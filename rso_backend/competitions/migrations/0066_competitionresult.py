@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('headquarters', '0036_regionalheadquarteremail'),
+        ('competitions', '0065_alter_september15participant_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompetitionResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Порядковый номер строки')),
+                ('region_name', models.CharField(blank=True, max_length=250, verbose_name='Регион')),
+                ('detachment_name', models.CharField(max_length=250, verbose_name='Отряд')),
+                ('status', models.CharField(max_length=50, verbose_name='Статус отряда')),
+                ('nomination', models.CharField(max_length=50, verbose_name='Номинация')),
+                ('area_name', models.CharField(blank=True, max_length=250, verbose_name='Направление')),
+                ('participants_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Количество участников на 15 сентября')),
+                ('members_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Количество оплаченных чл. взносов на 15 сентября')),
+                ('overall_place', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Итоговое место')),
+                ('places_sum', models.FloatField(blank=True, null=True, verbose_name='Сумма мест по всем показателям')),
+                ('places', models.JSONField(default=list, verbose_name='Места по показателям')),
+                ('competition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='competitions.competitions', verbose_name='Конкурс')),
+                ('detachment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='competition_results', to='headquarters.detachment', verbose_name='Отряд')),
+                ('partner_detachment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='competition_partner_results', to='headquarters.detachment', verbose_name='Отряд-партнер по тандему')),
+            ],
+            options={
+                'verbose_name': 'Результат конкурса (срез)',
+                'verbose_name_plural': 'Результаты конкурса (срез)',
+                'ordering': ('position',),
+                'indexes': [models.Index(fields=['competition', 'nomination', 'position'], name='competition_result_nom_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='competitionresult',
+            constraint=models.UniqueConstraint(fields=('competition', 'position'), name='unique_competition_result_position'),
+        ),
+    ]
@@ -1953,3 +1953,89 @@ class RankingCopy(models.Model):
 
     def __str__(self):
         return f"Отряд: {self.detachment.name}"
+
+
+class CompetitionResult(models.Model):
+    """Срез итоговых результатов конкурса для отчетов.
+
+    Пересобирается целиком после пересчета мест, одна строка - один
+    отряд в порядке выгрузки (дебют, затем пары тандема).
+    """
+    competition = models.ForeignKey(
+        'Competitions',
+        on_delete=models.CASCADE,
+        related_name='results',
+        verbose_name='Конкурс'
+    )
+    position = models.PositiveIntegerField(
+        verbose_name='Порядковый номер строки'
+    )
+    detachment = models.ForeignKey(
+        'headquarters.Detachment',
+        on_delete=models.CASCADE,
+        related_name='competition_results',
+        verbose_name='Отряд'
+    )
+    partner_detachment = models.ForeignKey(
+        'headquarters.Detachment',
+        on_delete=models.CASCADE,
+        related_name='competition_partner_results',
+        verbose_name='Отряд-партнер по тандему',
+        blank=True,
+        null=True
+    )
+    region_name = models.CharField(
+        verbose_name='Регион', max_length=250, blank=True
+    )
+    detachment_name = models.CharField(
+        verbose_name='Отряд', max_length=250
+    )
+    status = models.CharField(verbose_name='Статус отряда', max_length=50)
+    nomination = models.CharField(verbose_name='Номинация', max_length=50)
+    area_name = models.CharField(
+        verbose_name='Направление', max_length=250, blank=True
+    )
+    participants_count = models.PositiveIntegerField(
+        verbose_name='Количество участников на 15 сентября',
+        blank=True,
+        null=True
+    )
+    members_count = models.PositiveIntegerField(
+        verbose_name='Количество оплаченных чл. взносов на 15 сентября',
+        blank=True,
+        null=True
+    )
+    overall_place = models.PositiveSmallIntegerField(
+        verbose_name='Итоговое место',
+        blank=True,
+        null=True
+    )
+    places_sum = models.FloatField(
+        verbose_name='Сумма мест по всем показателям',
+        blank=True,
+        null=True
+    )
+    places = models.JSONField(
+        verbose_name='Места по показателям',
+        default=list
+    )
+
+    class Meta:
+        verbose_name = 'Результат конкурса (срез)'
+        verbose_name_plural = 'Результаты конкурса (срез)'
+        ordering = ('position',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('competition', 'position'),
+                name='unique_competition_result_position'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('competition', 'nomination', 'position'),
+                name='competition_result_nom_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.detachment_name}: {self.overall_place}'
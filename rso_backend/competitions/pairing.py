@@ -0,0 +1,65 @@
+"""Индекс пар участников конкурса для расчета мест по показателям.
+
+Участники конкурса и отчеты по показателю читаются по одному разу,
+после чего партнер по тандему и отчеты обеих сторон находятся в памяти
+без запросов на каждый отчет.
+"""
+from competitions.models import CompetitionParticipants
+
+
+class TandemPairs:
+    """Старт-участники и тандемы (младший отряд - старший отряд)."""
+
+    def __init__(self, competition_id, confirmed_only=True):
+        self.competition_id = competition_id
+        participants = CompetitionParticipants.objects.filter(
+            competition_id=competition_id
+        )
+        if confirmed_only:
+            participants = participants.filter(confirmed=True)
+        self.start_ids = []
+        self.tandems = []
+        self.senior_by_junior = {}
+        self.junior_by_senior = {}
+        for junior_id, senior_id in participants.values_list(
+            'junior_detachment_id', 'detachment_id'
+        ).order_by('id'):
+            if senior_id is None:
+                self.start_ids.append(junior_id)
+                continue
+            self.tandems.append((junior_id, senior_id))
+            self.senior_by_junior.setdefault(junior_id, senior_id)
+            self.junior_by_senior.setdefault(senior_id, junior_id)
+        self._start_set = set(self.start_ids)
+
+    def __bool__(self):
+        return bool(self.start_ids or self.tandems)
+
+    def is_junior(self, detachment_id) -> bool:
+        """Отряд участвует в конкурсе как старт или младший в тандеме."""
+        return (
+            detachment_id in self.senior_by_junior
+            or detachment_id in self._start_set
+        )
+
+    def load_reports(self, model_report, queryset=None) -> dict:
+        """{id отряда: отчет} по показателю конкурса одним запросом.
+
+        Если у отряда несколько отчетов, берется первый по id.
+        """
+        if queryset is None:
+            queryset = model_report.objects.all()
+        reports = {}
+        for report in queryset.filter(
+            competition_id=self.competition_id
+        ).order_by('-id'):
+            reports[report.detachment_id] = report
+        return reports
+
+    def tandem_reports(self, reports) -> list:
+        """[(младший отряд, старший отряд, отчет младшего, отчет старшего)]."""
+        return [
+            (junior_id, senior_id, reports.get(junior_id),
+             reports.get(senior_id))
+            for junior_id, senior_id in self.tandems
+        ]
@@ -0,0 +1,140 @@
+"""Служебные данные конвейера пересчета рейтингов конкурса.
+
+Конвейер (competitions.tasks.calculate_rankings_pipeline_task)
+параллельно считает места по показателям, после чего - общий зачет
+и резервную копию мест. Здесь хранятся отпечатки входных данных
+показателей, чтобы не пересчитывать неизменившиеся, и длительности
+этапов последнего запуска.
+"""
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+
+from competitions.change_log import CHANGE_LOG_INDICATORS, has_changes
+from competitions.models import (CommanderCommissionerSchoolBlock,
+                                 CompetitionParticipants,
+                                 CreativeFestivalBlock, DemonstrationBlock,
+                                 PatrioticActionBlock,
+                                 ProfessionalCompetitionBlock, Q1Report,
+                                 Q5DetachmentReport, Q5EducatedParticipant,
+                                 Q6DetachmentReport, Q14DetachmentReport,
+                                 Q14LaborProject, Q15DetachmentReport,
+                                 Q15GrantWinner, Q17DetachmentReport,
+                                 Q17EventLink, Q18DetachmentReport,
+                                 SafetyWorkWeekBlock, September15Participant,
+                                 SpartakiadBlock, WorkingSemesterOpeningBlock)
+from headquarters.models import UserDetachmentPosition
+from questions.models import Attempt
+
+INPUTS_KEY = 'competition_pipeline:inputs:{competition_id}:{indicator}'
+RUN_KEY = 'competition_pipeline:last_run'
+STAGE_KEY = 'competition_pipeline:{run_id}:{stage}'
+STAGE_TIMINGS_TTL = 60 * 60 * 24 * 7
+
+OVERALL_STAGE = 'overall'
+COPY_STAGE = 'copy'
+INDICATORS_STAGE = 'indicators'
+
+# Таблицы, от которых зависят места по показателю. Участники конкурса
+# входят во все показатели. Изменения показателей из журнала изменений
+# (competitions.change_log) определяются по журналу, а не по отпечатку.
+INDICATOR_INPUTS = {
+    'q1': (September15Participant, Q1Report),
+    'q3_q4': (Attempt, UserDetachmentPosition),
+    'q5': (Q5DetachmentReport, Q5EducatedParticipant),
+    'q6': (
+        Q6DetachmentReport, September15Participant, DemonstrationBlock,
+        PatrioticActionBlock, SafetyWorkWeekBlock,
+        CommanderCommissionerSchoolBlock, WorkingSemesterOpeningBlock,
+        CreativeFestivalBlock, ProfessionalCompetitionBlock,
+        SpartakiadBlock
+    ),
+    'q14': (Q14DetachmentReport, Q14LaborProject),
+    'q15': (Q15DetachmentReport, Q15GrantWinner),
+    'q17': (Q17DetachmentReport, Q17EventLink),
+    'q18': (Q18DetachmentReport, September15Participant),
+}
+
+
+def get_inputs_fingerprint(indicator) -> str:
+    """md5 всех строк входных таблиц показателя.
+
+    Строки читаются потоком в порядке pk, поэтому отпечаток меняется
+    при любом создании, изменении или удалении строки.
+    """
+    digest = hashlib.md5()
+    for model in (CompetitionParticipants, *INDICATOR_INPUTS[indicator]):
+        fields = [field.attname for field in model._meta.concrete_fields]
+        digest.update(model._meta.label_lower.encode())
+        for row in model.objects.order_by('pk').values_list(
+            *fields
+        ).iterator():
+            digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+
+def inputs_changed(indicator, competition_id) -> bool:
+    """Входные данные показателя изменились с последнего пересчета."""
+    if indicator in CHANGE_LOG_INDICATORS:
+        return has_changes(indicator, competition_id)
+    saved = cache.get(INPUTS_KEY.format(
+        competition_id=competition_id, indicator=indicator
+    ))
+    return saved != get_inputs_fingerprint(indicator)
+
+
+def save_inputs_fingerprint(indicator, competition_id):
+    """Запоминает отпечаток входных данных после пересчета показателя.
+
+    Отпечаток снимается после расчета, т.к. часть расчетов сама
+    записывает очки в отчеты показателя.
+    """
+    if indicator in CHANGE_LOG_INDICATORS:
+        return
+    cache.set(
+        INPUTS_KEY.format(
+            competition_id=competition_id, indicator=indicator
+        ),
+        get_inputs_fingerprint(indicator),
+        timeout=None
+    )
+
+
+def start_pipeline_run(competition_id, indicators) -> str:
+    """Регистрирует запуск конвейера и возвращает его id."""
+    run_id = uuid.uuid4().hex
+    cache.set(RUN_KEY, {
+        'run_id': run_id,
+        'competition_id': competition_id,
+        'started_at': time.time(),
+        'stages': [
+            *indicators, INDICATORS_STAGE, OVERALL_STAGE, COPY_STAGE
+        ],
+    }, timeout=None)
+    return run_id
+
+
+def record_stage_timing(run_id, stage, seconds):
+    cache.set(
+        STAGE_KEY.format(run_id=run_id, stage=stage),
+        round(seconds, 3),
+        timeout=STAGE_TIMINGS_TTL
+    )
+
+
+def get_last_run_timings() -> dict:
+    """Длительности этапов последнего запуска в секундах.
+
+    Для еще не завершенных этапов значение - None.
+    """
+    run = cache.get(RUN_KEY)
+    if run is None:
+        return {}
+    keys = {
+        STAGE_KEY.format(run_id=run['run_id'], stage=stage): stage
+        for stage in run['stages']
+    }
+    values = cache.get_many(keys)
+    return {stage: values.get(key) for key, stage in keys.items()}
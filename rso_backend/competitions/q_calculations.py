@@ -6,10 +6,13 @@ from typing import List
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from django.db.models import Max
+from django.utils import timezone
 
 from api.constants import Q6_BLOCK_MODELS
-from competitions.constants import COUNT_PLACES_DEADLINE, SOLO_RANKING_MODELS, TANDEM_RANKING_MODELS
+from competitions.constants import (COUNT_PLACES_DEADLINE, Q3_Q4_ATTEMPTS_DEADLINE,
+                                   SOLO_RANKING_MODELS, TANDEM_RANKING_MODELS)
 from competitions.models import (CompetitionParticipants, July15Participant, OverallRanking,
                                  OverallTandemRanking, Q1Ranking, Q1Report,
                                  Q2DetachmentReport, Q2Ranking,
@@ -33,158 +36,77 @@ from competitions.models import (CompetitionParticipants, July15Participant, Ove
                                  WorkingSemesterOpeningBlock, CreativeFestivalBlock,
                                  ProfessionalCompetitionBlock, SpartakiadBlock, Q13DetachmentReport, Q13TandemRanking,
                                  Q13Ranking)
+from competitions.pairing import TandemPairs
+from competitions.ranking_matrix import load_places, rank_entries
+from competitions.ranking_publication import publish_rankings
+from competitions.results_snapshot import (SOLO_KEY_FIELDS, TANDEM_KEY_FIELDS,
+                                           get_overall_places)
 from competitions.utils import (assign_ranks, find_second_element_by_first,
                                 get_place_q2, is_main_detachment,
                                 tandem_or_start, round_math)
 from headquarters.models import Detachment, UserDetachmentPosition
-from questions.models import Attempt
+from questions.models import Attempt, UserBestAttempt
 
 logger = logging.getLogger('tasks')
 
 
 def calculate_overall_rankings(solo_ranking_models, tandem_ranking_models, competition_id):
-    logger.info('Удаляем записи из OverallTandemRanking, OverallRanking')
-    print('Deleting existing entries from OverallTandemRanking and OverallRanking')
-    OverallTandemRanking.objects.all().delete()
-    OverallRanking.objects.all().delete()
+    """Считает итоговые места соло и тандемов по сумме мест всех показателей.
 
-    print(f'Fetching solo and tandem entries for competition {competition_id}')
-    solo_entries = CompetitionParticipants.objects.filter(
-        competition_id=competition_id,
-        junior_detachment__isnull=False,
-        detachment__isnull=True,
-        confirmed=True
-    )
-    tandem_entries = CompetitionParticipants.objects.filter(
-        competition_id=competition_id,
-        junior_detachment__isnull=False,
-        detachment__isnull=False,
-        confirmed=True
-    )
-
-    print(f'Found {solo_entries.count()} solo entries and {tandem_entries.count()} tandem entries')
-
-    solo_worst_places = {}
-    tandem_worst_places = {}
-
-    print('Calculating worst places for solo ranking models...')
-    for model in solo_ranking_models:
-        worst_entry = model.objects.filter(competition_id=competition_id).order_by('-place').first()
-        worst_place = worst_entry.place + 1 if worst_entry else 1
-        solo_worst_places[model] = worst_place
-        print(f'Worst place for model {model.__name__}: {worst_place}')
-
-    print('Calculating worst places for tandem ranking models...')
-    for model in tandem_ranking_models:
-        worst_entry = model.objects.filter(competition_id=competition_id).order_by('-place').first()
-        worst_place = worst_entry.place + 1 if worst_entry else 1
-        tandem_worst_places[model] = worst_place
-        print(f'Worst place for model {model.__name__}: {worst_place}')
-
-    solo_rankings = []
-    tandem_rankings = []
-
-    print('Calculating solo entry places...')
-    for solo_entry in solo_entries:
-        solo_entry_place = 0
-        detachment = solo_entry.junior_detachment
-        print(f'Processing solo entry for detachment {detachment.id}')
-
-        for model in solo_ranking_models:
-            try:
-                ranking = model.objects.get(
-                    competition_id=competition_id, detachment=detachment
-                )
-                solo_entry_place += ranking.place
-                print(f'Found ranking in {model.__name__} for detachment {detachment.id}: {ranking.place}')
-            except model.DoesNotExist:
-                solo_entry_place += solo_worst_places[model]
-                print(
-                    f'No ranking found in {model.__name__} for detachment {detachment.id}. Using worst place: {solo_worst_places[model]}')
-
-        solo_rankings.append({'detachment': detachment, 'place': solo_entry_place})
-        print(f'Solo entry place for detachment {detachment.id}: {solo_entry_place}')
-
-    print('Calculating tandem entry places...')
-    for tandem_entry in tandem_entries:
-        tandem_entry_place = 0
-        detachment = tandem_entry.detachment
-        junior_detachment = tandem_entry.junior_detachment
-        print(f'Processing tandem entry for detachment {detachment.id} and junior detachment {junior_detachment.id}')
-
-        for model in tandem_ranking_models:
-            try:
-                ranking = model.objects.get(
-                    competition_id=competition_id,
-                    detachment=detachment,
-                    junior_detachment=junior_detachment
-                )
-                tandem_entry_place += ranking.place
-                print(
-                    f'Found ranking in {model.__name__} for tandem {detachment.id}-{junior_detachment.id}: {ranking.place}')
-            except model.DoesNotExist:
-                tandem_entry_place += tandem_worst_places[model]
-                print(
-                    f'No ranking found in {model.__name__} for tandem {detachment.id}-{junior_detachment.id}. Using worst place: {tandem_worst_places[model]}')
-
-        tandem_rankings.append(
-            {
-                'detachment': detachment,
-                'junior_detachment': junior_detachment,
-                'place': tandem_entry_place
-            }
-        )
-        print(
-            f'Tandem entry place for detachment {detachment.id} and junior detachment {junior_detachment.id}: {tandem_entry_place}')
-
-    # Sorting and calculating overall rankings for solo entries
-    print('Sorting solo rankings...')
-    solo_rankings.sort(key=lambda x: x['place'])
-    current_place = 1
-    last_place = 0
-    previous_places_sum = None
-
-    print('Assigning places for solo rankings...')
-    for solo_ranking_entry in solo_rankings:
-        if solo_ranking_entry['place'] != previous_places_sum:
-            current_place = last_place + 1
-
-        OverallRanking.objects.create(
+    Таблицы мест читаются по одному запросу на модель, итоговые места
+    публикуются publish_rankings в общей транзакции.
+    """
+    solo_keys = list(dict.fromkeys(
+        CompetitionParticipants.objects.filter(
             competition_id=competition_id,
-            detachment=solo_ranking_entry['detachment'],
-            places_sum=solo_ranking_entry['place'],
-            place=current_place
-        )
-        print(
-            f'Assigned place {current_place} for detachment {solo_ranking_entry["detachment"].id} with place sum {solo_ranking_entry["place"]}')
-
-        last_place = current_place
-        previous_places_sum = solo_ranking_entry['place']
-
-    # Sorting and calculating overall rankings for tandem entries
-    print('Sorting tandem rankings...')
-    tandem_rankings.sort(key=lambda x: x['place'])
-    current_place = 1
-    last_place = 0
-    previous_places_sum = None
-
-    print('Assigning places for tandem rankings...')
-    for tandem_ranking_entry in tandem_rankings:
-        if tandem_ranking_entry['place'] != previous_places_sum:
-            current_place = last_place + 1
-
-        OverallTandemRanking.objects.create(
+            junior_detachment__isnull=False,
+            detachment__isnull=True,
+            confirmed=True
+        ).values_list('junior_detachment_id', flat=True)
+    ))
+    tandem_keys = list(dict.fromkeys(
+        CompetitionParticipants.objects.filter(
             competition_id=competition_id,
-            detachment=tandem_ranking_entry['detachment'],
-            junior_detachment=tandem_ranking_entry['junior_detachment'],
-            places_sum=tandem_ranking_entry['place'],
-            place=current_place
-        )
-        print(
-            f'Assigned place {current_place} for tandem {tandem_ranking_entry["detachment"].id}-{tandem_ranking_entry["junior_detachment"].id} with place sum {tandem_ranking_entry["place"]}')
+            junior_detachment__isnull=False,
+            detachment__isnull=False,
+            confirmed=True
+        ).values_list('detachment_id', 'junior_detachment_id')
+    ))
+    logger.info(
+        f'Общий зачет конкурса {competition_id}: '
+        f'{len(solo_keys)} соло, {len(tandem_keys)} тандемов'
+    )
 
-        last_place = current_place
-        previous_places_sum = tandem_ranking_entry['place']
+    solo_rankings = rank_entries(
+        solo_ranking_models, competition_id, solo_keys, ('detachment_id',)
+    )
+    tandem_rankings = rank_entries(
+        tandem_ranking_models, competition_id, tandem_keys,
+        ('detachment_id', 'junior_detachment_id')
+    )
+
+    with transaction.atomic():
+        publish_rankings(OverallRanking, competition_id, [
+            OverallRanking(
+                competition_id=competition_id,
+                detachment_id=detachment_id,
+                places_sum=places_sum,
+                place=place
+            )
+            for detachment_id, places_sum, place in solo_rankings
+        ], SOLO_KEY_FIELDS)
+        publish_rankings(OverallTandemRanking, competition_id, [
+            OverallTandemRanking(
+                competition_id=competition_id,
+                detachment_id=detachment_id,
+                junior_detachment_id=junior_detachment_id,
+                places_sum=places_sum,
+                place=place
+            )
+            for (detachment_id, junior_detachment_id), places_sum, place
+            in tandem_rankings
+        ], TANDEM_KEY_FIELDS)
+    logger.info('Итоговые места соло и тандемов записаны')
 
 
 def calculate_q13_places():
@@ -706,60 +628,58 @@ def calculate_q18_place(competition_id):
 
 def calculate_q6_place(competition_id):
     today = date.today()
-    cutoff_date = date(2024, 6, 15)
 
     logger.info(f'Сегодняшняя дата: {today}')
 
-    verified_entries = Q6DetachmentReport.objects.filter(competition_id=competition_id)
+    pairs = TandemPairs(competition_id, confirmed_only=False)
+    reports = pairs.load_reports(
+        Q6DetachmentReport,
+        Q6DetachmentReport.objects.select_related(
+            'detachment', *Q6_BLOCK_MODELS
+        )
+    )
+    members_numbers = get_members_numbers({
+        *reports,
+        *(detachment_id for pair in pairs.tandems for detachment_id in pair)
+    })
     logger.info(
-        f'Получили отчеты: {verified_entries.count()}'
+        f'Получили отчеты: {len(reports)}'
     )
 
     solo_entries = []
     tandem_entries = []
 
-    for entry in verified_entries:
-        participants_entry = CompetitionParticipants.objects.filter(
-            junior_detachment=entry.detachment
-        ).first()
+    for entry in list(reports.values()):
+        senior_id = pairs.senior_by_junior.get(entry.detachment_id)
+        is_junior = pairs.is_junior(entry.detachment_id)
         partner_entry = None
-        if participants_entry and not participants_entry.detachment:
+        if is_junior and senior_id is None:
             category = solo_entries
             logger.info(f'Отчет {entry} - соло участник')
-        elif participants_entry:
+        elif is_junior:
             logger.info(f'Отчет {entry} - тандем участник')
             category = tandem_entries
-            if participants_entry:
-                partner_entry = Q6DetachmentReport.objects.filter(
-                    detachment=participants_entry.detachment,
-                    competition_id=competition_id,
-                ).first()
-                if partner_entry:
-                    logger.info(
-                        f'Для отчета {entry} найден '
-                        f'партнерский отчет: {partner_entry}'
-                    )
-                else:
-                    partner_entry = Q6DetachmentReport(
-                        competition_id=settings.COMPETITION_ID,
-                        detachment=participants_entry.detachment,
-
-                    )
-                    logger.info(
-                        f'Для отчета {entry} НЕ найден '
-                        f'партнерский отчет. Создали дефолтный: {partner_entry}'
-                    )
-        elif not participants_entry:
-            participants_entry = CompetitionParticipants.objects.filter(
-                detachment=entry.detachment
-            ).first()
+            partner_entry = reports.get(senior_id)
+            if partner_entry:
+                logger.info(
+                    f'Для отчета {entry} найден '
+                    f'партнерский отчет: {partner_entry}'
+                )
+            else:
+                partner_entry = Q6DetachmentReport(
+                    competition_id=settings.COMPETITION_ID,
+                    detachment_id=senior_id,
+                )
+                logger.info(
+                    f'Для отчета {entry} НЕ найден '
+                    f'партнерский отчет. Создали дефолтный.'
+                )
+        else:
+            junior_id = pairs.junior_by_senior.get(entry.detachment_id)
             partner_entry = entry
-            if participants_entry:
+            if junior_id is not None:
                 category = tandem_entries
-                entry = Q6DetachmentReport.objects.filter(
-                    detachment=participants_entry.junior_detachment,
-                    competition_id=competition_id,
-                ).first()
+                entry = reports.get(junior_id)
                 if entry:
                     logger.info(
                         f'Для отчета {partner_entry} найден '
@@ -768,15 +688,16 @@ def calculate_q6_place(competition_id):
                 else:
                     partner_entry = Q6DetachmentReport(
                         competition_id=settings.COMPETITION_ID,
-                        detachment=participants_entry.junior_detachment
+                        detachment_id=junior_id
                     )
                     logger.info(
                         f'Для отчета {entry} НЕ найден '
-                        f'партнерский отчет. Создали дефолтный: {partner_entry}'
+                        f'партнерский отчет. Создали дефолтный.'
                     )
 
-
-        calculate_april_detachment_members(entry, partner_entry)
+        calculate_april_detachment_members(
+            entry, partner_entry, members_numbers
+        )
 
         working_semester_opening_participants = 0
         patriotic_action_participants = 0
@@ -951,7 +872,7 @@ def calculate_q6_place(competition_id):
                 if tuple_to_append not in category:
                     category.append(tuple_to_append)
         elif entry and not partner_entry and category == solo_entries:
-            new_entry = Q6DetachmentReport.objects.filter(detachment=entry.detachment).first()
+            new_entry = reports.get(entry.detachment_id)
             if new_entry:
                 logger.info(f'нашли new_entry {new_entry}')
                 entry = new_entry
@@ -1021,7 +942,7 @@ def calculate_q6_place(competition_id):
             else:
                 logger.info(f'Для {entry.detachment} не найден верифицированный блок, пропускаем')
         elif partner_entry and not entry and category == solo_entries:
-            new_entry = Q6DetachmentReport.objects.filter(detachment=partner_entry.detachment).first()
+            new_entry = reports.get(partner_entry.detachment_id)
             if new_entry:
                 logger.info(f'нашли new_entry {new_entry}')
                 partner_entry = new_entry
@@ -1091,11 +1012,9 @@ def calculate_q6_place(competition_id):
                 logger.info(f'Для {partner_entry.detachment} не найден верифицированный блок, пропускаем')
 
     if solo_entries:
-        logger.info(
-            'Есть записи для соло-участников. Удаляем записи из таблицы Q6 Ranking'
-        )
-        Q6Ranking.objects.all().delete()
+        logger.info('Есть записи для соло-участников. Обновляем Q6 Ranking')
         solo_entries.sort(key=lambda entry: entry[1], reverse=True)
+        rankings = []
         last_place = 0
         place = 0
         previous_score = None
@@ -1109,21 +1028,22 @@ def calculate_q6_place(competition_id):
             logger.info(
                 f'Отчет {entry[0].detachment} занимает {updated_place} место'
             )
-            Q6Ranking.objects.create(
-                detachment=entry[0].detachment,
+            rankings.append(Q6Ranking(
+                detachment_id=entry[0].detachment_id,
                 place=updated_place,
                 competition_id=competition_id
-            )
+            ))
             last_place = place
             previous_score = entry[1]
+        publish_rankings(Q6Ranking, competition_id, rankings, SOLO_KEY_FIELDS)
 
     if tandem_entries:
         logger.info(
-            'Есть записи для тандем-участников. Удаляем записи из таблицы Q6 TandemRanking'
+            'Есть записи для тандем-участников. Обновляем Q6 TandemRanking'
         )
-        Q6TandemRanking.objects.all().delete()
         logger.info(f'Tandem Entries: {tandem_entries}')
         tandem_entries.sort(key=lambda entry: entry[2], reverse=True)
+        rankings = []
         last_place = 0
         place = 0
         previous_score = None
@@ -1142,14 +1062,17 @@ def calculate_q6_place(competition_id):
             logger.info(
                 f'Отчет {entry[0]} и {entry[1]} занимает {updated_place} место'
             )
-            Q6TandemRanking.objects.create(
-                junior_detachment=entry[0].detachment,
-                detachment=entry[1].detachment,
+            rankings.append(Q6TandemRanking(
+                junior_detachment_id=entry[0].detachment_id,
+                detachment_id=entry[1].detachment_id,
                 place=updated_place,
                 competition_id=competition_id
-            )
+            ))
             last_place = place
             previous_score = entry[2]
+        publish_rankings(
+            Q6TandemRanking, competition_id, rankings, TANDEM_KEY_FIELDS
+        )
 
 
 def calculate_q6_boolean_scores(entry: Q6DetachmentReport) -> int:
@@ -1256,25 +1179,41 @@ def calculate_june_detachment_members(entry, partner_entry=None):
         partner_entry.save()
 
 
-def calculate_april_detachment_members(entry, partner_entry=None):
-    if entry:
-        members_inst = September15Participant.objects.filter(detachment=entry.detachment).last()
-        if not members_inst:
-            return
-        members_number = members_inst.members_number
-        if members_number < 1:
-            members_number = 1
-        entry.april_1_detachment_members = members_number
-        entry.save()
-    if partner_entry:
-        members_inst = September15Participant.objects.filter(detachment=partner_entry.detachment).last()
-        if not members_inst:
+def get_members_numbers(detachment_ids) -> dict:
+    """{id отряда: members_number последней записи September15Participant}
+    одним запросом."""
+    members_numbers = {}
+    for detachment_id, members_number in September15Participant.objects.filter(
+        detachment_id__in=list(detachment_ids)
+    ).order_by('id').values_list('detachment_id', 'members_number'):
+        members_numbers[detachment_id] = members_number
+    return members_numbers
+
+
+def calculate_april_detachment_members(
+        entry, partner_entry=None, members_numbers=None
+):
+    """Число членов отряда на 1 апреля для отчетов Q6.
+
+    members_numbers - заранее загруженный результат get_members_numbers,
+    без него число читается запросом для каждого отчета.
+    """
+    for report in (entry, partner_entry):
+        if not report:
+            continue
+        if members_numbers is None:
+            members_inst = September15Participant.objects.filter(
+                detachment=report.detachment
+            ).last()
+            members_number = members_inst and members_inst.members_number
+        else:
+            members_number = members_numbers.get(report.detachment_id)
+        if members_number is None:
             return
-        members_number = members_inst.members_number
         if members_number < 1:
             members_number = 1
-        partner_entry.april_1_detachment_members = members_number
-        partner_entry.save()
+        report.april_1_detachment_members = members_number
+        report.save()
 
 
 def calculate_sep_detachment_members(entry, partner_entry=None):
@@ -1297,12 +1236,14 @@ def calculate_sep_detachment_members(entry, partner_entry=None):
         partner_entry.june_15_detachment_members = members_number
         partner_entry.save()
 
-def calculate_score_q16(competition_id):
+def calculate_score_q16(competition_id, detachment_ids=None):
     """
     Таска для расчета очков Q16.
 
     Для celery-beat, считает вплоть до 15 октября 2024 года.
     :param competition_id: id конкурса
+    :param detachment_ids: id отрядов, отчеты которых нужно пересчитать,
+                           None - все отчеты
     """
     today = date.today()
     cutoff_date = date(2024, 10, 15)
@@ -1314,12 +1255,15 @@ def calculate_score_q16(competition_id):
         competition_id=competition_id,
         is_verified=True
     )
+    if detachment_ids is not None:
+        reports = reports.filter(detachment_id__in=detachment_ids)
 
+    to_update = []
     for report in reports:
         logger.info(f'Расчет очков для отчета {report}')
         members_inst = September15Participant.objects.filter(detachment=report.detachment).last()
         if not members_inst:
-            return
+            break
         members_number = members_inst.members_number
         if members_number < 1:
             members_number = 1
@@ -1352,7 +1296,12 @@ def calculate_score_q16(competition_id):
 
         report.score = score
         logger.info(f'Очки {score} для отчета {report}')
-        report.save()
+        to_update.append(report)
+    # bulk_update не отправляет post_save, поэтому пересчет очков
+    # не попадает в журнал изменений показателя
+    Q16Report.objects.bulk_update(
+        to_update, ['score', 'june_15_detachment_members']
+    )
 
 
 def calculate_place(
@@ -1370,28 +1319,14 @@ def calculate_place(
     :param reverse: True - чем больше очков, чем выше место в рейтинге,
                     False - чем меньше очков, тем выше место.
     """
-    participants = CompetitionParticipants.objects.filter(
-        # первый запрос к бд
-        competition_id=competition_id,
-        confirmed=True
-    ).select_related('junior_detachment', 'detachment')
-
-    if not participants:
+    pairs = TandemPairs(competition_id)  # первый запрос к бд
+    if not pairs:
         return
-
-    start_ids = list(participants.filter(detachment__isnull=True)
-                     .values_list('junior_detachment__id', flat=True))
-
-    tandem_ids = list(participants.filter(detachment__isnull=False)
-                      .values_list('junior_detachment__id', 'detachment__id'))
-
-    reports_start = model_report.objects.filter(  # второй запрос к бд
-        competition_id=competition_id,
-        detachment_id__in=start_ids
-    )
+    reports = pairs.load_reports(model_report)  # второй запрос к бд
 
     sorted_by_score_start_reports = sorted(
-        reports_start, key=lambda x: x.score, reverse=reverse
+        (reports[id] for id in pairs.start_ids if id in reports),
+        key=lambda x: x.score, reverse=reverse
     )
 
     to_create_entries = []
@@ -1406,99 +1341,62 @@ def calculate_place(
         if place == 0:
             continue
         to_create_entries.append(
-            model_ranking(competition=report.competition,
-                          detachment=report.detachment,
+            model_ranking(competition_id=competition_id,
+                          detachment_id=report.detachment_id,
                           place=place)
         )
 
-    model_ranking.objects.filter(
-        competition_id=competition_id).delete()  # третий запрос к бд
-    model_ranking.objects.bulk_create(
-        to_create_entries)  # четвертый запрос к бд
-
-    reports = model_report.objects.filter(  # пятый запрос к бд
-        competition_id=competition_id
-    ).select_related('detachment').all()
-
-    tandem_reports = [
-        [reports.filter(detachment_id=id).first() for id in ids]
-        for ids in tandem_ids
-    ]
+    publish_rankings(
+        model_ranking, competition_id, to_create_entries, SOLO_KEY_FIELDS
+    )  # чтение текущих мест и запись изменений
 
     # сортируем по сумме очков обоих отрядов
     # если у одного отряда нет отчета, то к очкам добавляем ноль или максимум
     # в зависимости от reverse, т.к. в разных показателях,
     # чем больше очков или чем меньше очков, тем выше место
-    max_score = len(tandem_ids)
+    max_score = len(pairs.tandems)
+    missing_score = 0 if reverse else max_score
+
+    def get_tandem_score(tandem):
+        junior_report, report = tandem[2:]
+        if junior_report is None and report is None:
+            return missing_score
+        if junior_report is None or report is None:
+            return (junior_report or report).score + missing_score
+        return junior_report.score + report.score
+
     sorted_by_score_tandem_reports = sorted(
-        tandem_reports,
-        key=lambda x: ((x[0].score + x[1].score) if (x[0] and x[1])
-                       else (x[0].score + (
-                           0 if reverse else max_score
-                        ) if x[0] is not None
-                             else (x[1].score + (
-                                 0 if reverse else max_score
-                             ) if x[1] is not None
-                                   else (0 if reverse else max_score)))),
-        reverse=reverse
+        pairs.tandem_reports(reports), key=get_tandem_score, reverse=reverse
     )
     to_create_entries = []
     place = 0
     score = 0
-    for report in sorted_by_score_tandem_reports:
-        if report[0] is None and report[1] is None:
+    for junior_id, detachment_id, junior_report, report in (
+        sorted_by_score_tandem_reports
+    ):
+        if junior_report is None and report is None:
             continue
-
-        if report[0] is not None and report[1] is not None:
-            if report[0].score + report[1].score != score:
-                place += 1
-                score = report[0].score + report[1].score
-            # если отчеты в рейтинге есть, но пустые, без элементов (удалили),
-            # либо не верифицированы все, чтобы не попадали в рейтинг
-            if place == 0:
-                continue
-            to_create_entries.append(
-                model_tandem_ranking(competition=report[0].competition,
-                                     junior_detachment=report[0].detachment,
-                                     detachment=report[1].detachment,
-                                     place=place)
-            )
-
-        elif report[0] is not None:
-            if report[0].score + max_score != score:
-                place += 1
-                score = report[0].score + max_score
-            if place == 0:
-                continue
-            detachment = participants.get(
-                junior_detachment=report[0].detachment,
-            ).detachment
-            to_create_entries.append(
-                model_tandem_ranking(competition=report[0].competition,
-                                     junior_detachment=report[0].detachment,
-                                     detachment=detachment,
-                                     place=place)
-            )
-
-        elif report[1] is not None:
-            if report[1].score + max_score != score:
-                place += 1
-                score = report[1].score + max_score
-            if place == 0:
-                continue
-            junior_detachment = participants.get(
-                detachment=report[1].detachment,
-            ).junior_detachment
-            to_create_entries.append(
-                model_tandem_ranking(competition=report[1].competition,
-                                     junior_detachment=junior_detachment,
-                                     detachment=report[1].detachment,
-                                     place=place)
-            )
-    model_tandem_ranking.objects.filter(
-        competition_id=competition_id).delete()  # шестой запрос к бд
-    model_tandem_ranking.objects.bulk_create(
-        to_create_entries)  # седьмой запрос к бд
+        if junior_report is not None and report is not None:
+            tandem_score = junior_report.score + report.score
+        else:
+            tandem_score = (junior_report or report).score + max_score
+        if tandem_score != score:
+            place += 1
+            score = tandem_score
+        # если отчеты в рейтинге есть, но пустые, без элементов (удалили),
+        # либо не верифицированы все, чтобы не попадали в рейтинг
+        if place == 0:
+            continue
+        to_create_entries.append(
+            model_tandem_ranking(competition_id=competition_id,
+                                 junior_detachment_id=junior_id,
+                                 detachment_id=detachment_id,
+                                 place=place)
+        )
+    publish_rankings(
+        model_tandem_ranking, competition_id, to_create_entries,
+        TANDEM_KEY_FIELDS
+    )
 
 
 def calculate_q1_score(competition_id):
@@ -1575,79 +1473,92 @@ def calculate_q1_score(competition_id):
 
 
 def calculate_q3_q4_place(competition_id: int):
-    logger.info(
-        'Удаляем все записи из '
-        'Q3Ranking, Q3TandemRanking, '
-    )
-    logger.info(
-        'Удаляем все записи из '
-        'Q4Ranking, Q4TandemRanking, '
-    )
-    Q3TandemRanking.objects.all().delete()
-    Q3Ranking.objects.all().delete()
-    Q4Ranking.objects.all().delete()
-    Q4TandemRanking.objects.all().delete()
+    """Места по 3 и 4 показателям для всех участников конкурса.
+
+    Лучшие попытки всех участников отрядов считаются одним
+    сгруппированным запросом (get_q3_q4_places), места
+    публикуются publish_rankings в одной транзакции.
+    """
     logger.info('Считаем места по 3 показателю')
-    solo_entries = CompetitionParticipants.objects.filter(
-        competition_id=competition_id,
-        junior_detachment__isnull=False,
-        confirmed=True,
-        detachment__isnull=True
-    )
-    logger.info('SOLO ENTRIES:')
-    logger.info(solo_entries)
-    tandem_entries = CompetitionParticipants.objects.filter(
+    entries = list(CompetitionParticipants.objects.filter(
         competition_id=competition_id,
         junior_detachment__isnull=False,
         confirmed=True,
-        detachment__isnull=False
-    )
-    logger.info('TANDEM ENTRIES:')
-    logger.info(tandem_entries)
-    for entry in solo_entries:
-        q3_place = get_q3_q4_place(entry.junior_detachment, 'university')
-        q4_place = get_q3_q4_place(entry.junior_detachment, 'safety')
-        if q3_place:
-            logger.info(f'Для СОЛО {entry} посчитали Q3 место - {q3_place}')
-            Q3Ranking.objects.create(
-                competition_id=competition_id,
-                detachment=entry.junior_detachment,
-                place=q3_place,
-            )
-        if q4_place:
-            logger.info(f'Для {entry} посчитали Q4 место - {q4_place}')
-            Q4Ranking.objects.create(
-                competition_id=competition_id,
-                detachment=entry.junior_detachment,
-                place=q4_place,
+    ).select_related('junior_detachment', 'detachment'))
+    detachments = {}
+    for entry in entries:
+        detachments[entry.junior_detachment_id] = entry.junior_detachment
+        if entry.detachment_id:
+            detachments[entry.detachment_id] = entry.detachment
+    places = get_q3_q4_places(detachments.values())
+
+    q3_rankings, q4_rankings = [], []
+    q3_tandem_rankings, q4_tandem_rankings = [], []
+    for entry in entries:
+        junior_places = places[entry.junior_detachment_id]
+        if entry.detachment_id is None:
+            logger.info(
+                f'Для СОЛО {entry.junior_detachment} посчитали места Q3/Q4 - '
+                f'{junior_places["university"]}/{junior_places["safety"]}'
             )
-    for tandem_entry in tandem_entries:
-        q3_place_1 = get_q3_q4_place(tandem_entry.junior_detachment, 'university')
-        q3_place_2 = get_q3_q4_place(tandem_entry.detachment, 'university')
-        q4_place_1 = get_q3_q4_place(tandem_entry.junior_detachment, 'safety')
-        q4_place_2 = get_q3_q4_place(tandem_entry.detachment, 'safety')
-        if q3_place_1 and q3_place_2:
-            final_place = round_math((q3_place_1 + q3_place_2) / 2)
-            if final_place > 8:
-                continue
-            logger.info(f'Для ТАНДЕМ {tandem_entry} посчитали Q3 место - {final_place}')
-            Q3TandemRanking.objects.create(
+            q3_rankings.append(Q3Ranking(
                 competition_id=competition_id,
-                detachment=tandem_entry.detachment,
-                junior_detachment=tandem_entry.junior_detachment,
-                place=final_place
-            )
-        if q4_place_1 and q4_place_2:
-            final_place = round_math((q4_place_1 + q4_place_2) / 2)
-            if final_place > 8:
-                continue
-            logger.info(f'Для ТАНДЕМ {tandem_entry} посчитали Q4 место - {final_place}')
-            Q4TandemRanking.objects.create(
+                detachment_id=entry.junior_detachment_id,
+                place=junior_places['university'],
+            ))
+            q4_rankings.append(Q4Ranking(
                 competition_id=competition_id,
-                detachment=tandem_entry.detachment,
-                junior_detachment=tandem_entry.junior_detachment,
-                place=final_place
-            )
+                detachment_id=entry.junior_detachment_id,
+                place=junior_places['safety'],
+            ))
+            continue
+        detachment_places = places[entry.detachment_id]
+        q3_place = round_math(
+            (junior_places['university'] + detachment_places['university']) / 2
+        )
+        if q3_place > 8:
+            # Тандем без места по Q3 не получает и место по Q4.
+            continue
+        logger.info(
+            f'Для ТАНДЕМ {entry.detachment} - {entry.junior_detachment} '
+            f'посчитали Q3 место - {q3_place}'
+        )
+        q3_tandem_rankings.append(Q3TandemRanking(
+            competition_id=competition_id,
+            detachment_id=entry.detachment_id,
+            junior_detachment_id=entry.junior_detachment_id,
+            place=q3_place
+        ))
+        q4_place = round_math(
+            (junior_places['safety'] + detachment_places['safety']) / 2
+        )
+        if q4_place > 8:
+            continue
+        logger.info(
+            f'Для ТАНДЕМ {entry.detachment} - {entry.junior_detachment} '
+            f'посчитали Q4 место - {q4_place}'
+        )
+        q4_tandem_rankings.append(Q4TandemRanking(
+            competition_id=competition_id,
+            detachment_id=entry.detachment_id,
+            junior_detachment_id=entry.junior_detachment_id,
+            place=q4_place
+        ))
+    with transaction.atomic():
+        publish_rankings(
+            Q3Ranking, competition_id, q3_rankings, SOLO_KEY_FIELDS
+        )
+        publish_rankings(
+            Q4Ranking, competition_id, q4_rankings, SOLO_KEY_FIELDS
+        )
+        publish_rankings(
+            Q3TandemRanking, competition_id, q3_tandem_rankings,
+            TANDEM_KEY_FIELDS
+        )
+        publish_rankings(
+            Q4TandemRanking, competition_id, q4_tandem_rankings,
+            TANDEM_KEY_FIELDS
+        )
 
 
 def calculate_q15_place(competition_id: int):
@@ -1981,66 +1892,98 @@ def get_q5_place(participants_count: int, june_15_detachment_members: int) -> in
         return 20
 
 
-def get_q3_q4_place(detachment: Detachment, category: str):
-    commander_score = Attempt.objects.filter(
-        user=detachment.commander,
-        category=category,
-        timestamp__lt=date(2024, 5, 16),
-        is_valid=True
-    ).aggregate(Max('score'))['score__max'] or 0
-    logger.info(f'у командира {detachment} {detachment.commander} очков - {commander_score}')
-    logger.info(f'Command score for entry {CompetitionParticipants} is {commander_score}')
-
-    if category == 'university':
-        # Получаем результаты для комиссара отряда
-        commissioner_score = 0
-        commissioners = UserDetachmentPosition.objects.filter(
-            position__name=settings.COMMISSIONER_POSITION_NAME,
-            headquarter=detachment
-        )
-        for commissioner in commissioners:
-            commissioner_max_score = Attempt.objects.filter(
-                user=commissioner.user,
-                category=category,
-                timestamp__lt=date(2024, 5, 16),
-                is_valid=True
-            ).aggregate(Max('score'))['score__max']
-            if commissioner_max_score:
-                commissioner_score = max(commissioner_score,
-                                         commissioner_max_score)
-
-        # Рассчитываем средний балл
-        average_score = (
-                                commander_score + commissioner_score
-                        ) / 2 if commander_score + commissioner_score > 0 else 0
-    else:
-        # Получаем результаты для всех участников отряда
-        score = 0
-        participants = UserDetachmentPosition.objects.filter(
-            headquarter=detachment
+def get_best_attempt_scores(user_ids) -> dict:
+    """{(id пользователя, категория): лучший балл} валидных попыток
+    до Q3_Q4_ATTEMPTS_DEADLINE.
+
+    Баллы берутся из проекции лучших попыток. Только для пользователей,
+    чья лучшая попытка сделана после срока, лучший балл до срока
+    считается агрегатом по их попыткам.
+    """
+    scores = {}
+    late_user_ids = set()
+    for user_id, category, score, timestamp in (
+        UserBestAttempt.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'category', 'score', 'attempt__timestamp'
         )
-        logger.info(f'{participants.count()} участников для отряда {detachment}')
-        for participant in participants:
-            participant_max_score = Attempt.objects.filter(
-                user=participant.user,
-                category=category,
-                timestamp__lt=date(2024, 5, 16),
+    ):
+        if timezone.localtime(timestamp).date() < Q3_Q4_ATTEMPTS_DEADLINE:
+            scores[(user_id, category)] = score
+        else:
+            late_user_ids.add(user_id)
+    if late_user_ids:
+        scores.update({
+            (row['user_id'], row['category']): row['best_score']
+            for row in Attempt.objects.filter(
+                user_id__in=late_user_ids,
+                timestamp__lt=Q3_Q4_ATTEMPTS_DEADLINE,
                 is_valid=True
-            ).aggregate(Max('score'))['score__max']
-            logger.info(f'у участника {participant} очков - {participant_max_score}')
-            if participant_max_score:
-                score += participant_max_score
+            ).values('user_id', 'category').annotate(
+                best_score=Max('score')
+            )
+        })
+    return scores
+
+
+def get_q3_q4_places(detachments) -> dict:
+    """Места отрядов по тестам: {id отряда: {категория: место}}.
+
+    По 'university' - средний балл командира и лучшего из комиссаров,
+    по 'safety' - средний балл командира и всех участников отряда.
+    Для любого числа отрядов выполняется два запроса.
+    """
+    detachments = list(detachments)
+    members = {detachment.id: [] for detachment in detachments}
+    commissioners = {detachment.id: [] for detachment in detachments}
+    for detachment_id, user_id, position_name in (
+        UserDetachmentPosition.objects.filter(
+            headquarter_id__in=members
+        ).values_list('headquarter_id', 'user_id', 'position__name')
+    ):
+        members[detachment_id].append(user_id)
+        if position_name == settings.COMMISSIONER_POSITION_NAME:
+            commissioners[detachment_id].append(user_id)
+    user_ids = {
+        user_id for user_ids in members.values() for user_id in user_ids
+    }
+    user_ids.update(detachment.commander_id for detachment in detachments)
+    scores = get_best_attempt_scores(user_ids)
 
-        # Рассчитываем средний балл
-        average_score = (commander_score + score) / (len(participants)+1)
+    places = {}
+    for detachment in detachments:
+        commander_score = scores.get(
+            (detachment.commander_id, 'university'), 0
+        )
+        commissioner_score = max(
+            (
+                scores.get((user_id, 'university'), 0)
+                for user_id in commissioners[detachment.id]
+            ),
+            default=0
+        )
+        university_score = (commander_score + commissioner_score) / 2
+
+        detachment_members = members[detachment.id]
+        safety_score = (
+            scores.get((detachment.commander_id, 'safety'), 0)
+            + sum(
+                scores.get((user_id, 'safety'), 0)
+                for user_id in detachment_members
+            )
+        ) / (len(detachment_members) + 1)
         logger.info(
-            f'Средний балл отряда - {average_score}. '
-            f'Рассчитано по формуле {commander_score + score} / {len(participants)+1}'
+            f'Средние баллы отряда {detachment}: университет - '
+            f'{university_score}, безопасность - {safety_score}'
         )
+        places[detachment.id] = {
+            'university': determine_q3_q4_place(university_score),
+            'safety': determine_q3_q4_place(safety_score),
+        }
+    return places
 
-    # Определяем место
-    place = determine_q3_q4_place(average_score)
-    return place
+
+def get_q3_q4_place(detachment: Detachment, category: str):
+    return get_q3_q4_places([detachment])[detachment.id][category]
 
 
 def determine_q3_q4_place(average_score):
@@ -2070,103 +2013,82 @@ def calculate_q19_place(report: Q19Report) -> int:
     return 1
 
 
-def save_reserve_places():
-    RankingCopy.objects.all().delete()
-    TandemRankingCopy.objects.all().delete()
-    logger.info('Начинаем сохранение резервных мест по всем показателям.')
-    solo_detachments = CompetitionParticipants.objects.filter(
-        detachment__isnull=True
-    )
+def get_reserve_places(ranking_models, copy_model, competition_id,
+                       key_fields):
+    """{номер показателя: {ключ участника: место}} для полей копии."""
+    copy_fields = {field.name for field in copy_model._meta.get_fields()}
+    return {
+        q_number: load_places(q_model, competition_id, key_fields)
+        for q_number, q_model in enumerate(ranking_models, start=1)
+        if f'q{q_number}_place' in copy_fields
+    }
 
-    solo_reserve_to_create = []
-    ranking_copy_fields = [field.name for field in RankingCopy._meta.get_fields()]
 
-    for comp_participant in solo_detachments:
-        detachment = comp_participant.junior_detachment
-    
-        try:
-            overall_ranking = OverallRanking.objects.get(
-                competition_id=1,
-                detachment=detachment
-            )
-            places_sum = overall_ranking.places_sum
-            place = overall_ranking.place
-        except OverallRanking.DoesNotExist:
-            places_sum = None
-            place = None
+def save_reserve_places(competition_id=settings.COMPETITION_ID):
+    """Сохраняет резервную копию итоговых мест и мест по показателям.
 
+    Каждая таблица мест читается одним запросом, копии записываются
+    bulk_create в одной транзакции.
+    """
+    logger.info('Начинаем сохранение резервных мест по всем показателям.')
+    participants = CompetitionParticipants.objects.filter(
+        competition_id=competition_id
+    )
+    solo_overall = get_overall_places(
+        OverallRanking, competition_id, SOLO_KEY_FIELDS
+    )
+    solo_places = get_reserve_places(
+        SOLO_RANKING_MODELS, RankingCopy, competition_id, SOLO_KEY_FIELDS
+    )
+    solo_reserve_to_create = []
+    for detachment_id in participants.filter(
+        detachment__isnull=True
+    ).values_list('junior_detachment_id', flat=True):
+        place, places_sum = solo_overall.get(detachment_id, (None, None))
         ranking_copy = RankingCopy(
-            competition_id=1,
-            detachment=detachment,
+            competition_id=competition_id,
+            detachment_id=detachment_id,
             places_sum=places_sum,
             place=place
         )
-    
-        for q_number, q_model in enumerate(SOLO_RANKING_MODELS, start=1):
-            attribute_name = f'q{q_number}_place'
-
-            if attribute_name in ranking_copy_fields:
-                try:
-                    ranking_instance = q_model.objects.get(
-                        competition_id=1,
-                        detachment=detachment
-                    )
-                    setattr(ranking_copy, attribute_name, ranking_instance.place)
-                except q_model.DoesNotExist:
-                    logger.warning(f'Рейтинг не найден для отряда {detachment} по показателю {q_number}')
-
+        for q_number, places in solo_places.items():
+            if detachment_id in places:
+                setattr(
+                    ranking_copy, f'q{q_number}_place', places[detachment_id]
+                )
         solo_reserve_to_create.append(ranking_copy)
-    RankingCopy.objects.bulk_create(solo_reserve_to_create)
-    logger.info('Сохранение резервных мест для соло участников завершено.')
 
-    logger.info('Начинаем сохранение резервных мест по всем показателям для тандемов.')
-    tandem_participants = CompetitionParticipants.objects.filter(
-        detachment__isnull=False,
+    tandem_overall = get_overall_places(
+        OverallTandemRanking, competition_id, TANDEM_KEY_FIELDS
+    )
+    tandem_places = get_reserve_places(
+        TANDEM_RANKING_MODELS, TandemRankingCopy, competition_id,
+        TANDEM_KEY_FIELDS
     )
-
     tandem_reserve_to_create = []
-    tandem_ranking_copy_fields = [field.name for field in TandemRankingCopy._meta.get_fields()]
-
-    for comp_participant in tandem_participants:
-
-        try:
-            overall_ranking = OverallTandemRanking.objects.get(
-                competition_id=1,
-                detachment=comp_participant.detachment,
-                junior_detachment=comp_participant.junior_detachment
-            )
-            places_sum = overall_ranking.places_sum
-            place = overall_ranking.place
-        except OverallTandemRanking.DoesNotExist:
-            places_sum = None
-            place = None
-
+    for key in participants.filter(
+        detachment__isnull=False
+    ).values_list(*TANDEM_KEY_FIELDS):
+        place, places_sum = tandem_overall.get(key, (None, None))
         tandem_ranking_copy = TandemRankingCopy(
-            competition_id=1,
-            detachment=comp_participant.detachment,
-            junior_detachment=comp_participant.junior_detachment,
+            competition_id=competition_id,
+            detachment_id=key[0],
+            junior_detachment_id=key[1],
             places_sum=places_sum,
             place=place
         )
-
-        for q_number, q_model in enumerate(TANDEM_RANKING_MODELS, start=1):
-            attribute_name = f'q{q_number}_place'
-
-            if attribute_name in tandem_ranking_copy_fields:
-                try:
-                    ranking_instance = q_model.objects.get(
-                        competition_id=1,
-                        detachment=comp_participant.detachment,
-                        junior_detachment=comp_participant.junior_detachment,
-                    )
-                    setattr(tandem_ranking_copy, attribute_name, ranking_instance.place)
-                except q_model.DoesNotExist:
-                    logger.warning(
-                        f'Рейтинг не найден для тандем отрядов {comp_participant.detachment} и '
-                        f'{comp_participant.junior_detachment} по показателю {q_number}'
-                    )
-
+        for q_number, places in tandem_places.items():
+            if key in places:
+                setattr(
+                    tandem_ranking_copy, f'q{q_number}_place', places[key]
+                )
         tandem_reserve_to_create.append(tandem_ranking_copy)
 
-    TandemRankingCopy.objects.bulk_create(tandem_reserve_to_create)
+    with transaction.atomic():
+        RankingCopy.objects.filter(competition_id=competition_id).delete()
+        TandemRankingCopy.objects.filter(
+            competition_id=competition_id
+        ).delete()
+        RankingCopy.objects.bulk_create(solo_reserve_to_create)
+        TandemRankingCopy.objects.bulk_create(tandem_reserve_to_create)
     logger.info('Сохранение резервных мест полностью завершено.')
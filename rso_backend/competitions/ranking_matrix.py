@@ -0,0 +1,74 @@
+"""Матрица мест участников конкурса по всем показателям.
+
+Строки матрицы - участники (отряд или пара отрядов тандема),
+столбцы - модели мест по показателям. Каждая таблица мест читается
+одним запросом, пропуски заполняются худшим местом показателя.
+"""
+import numpy as np
+from django.db.models import Max
+
+
+def get_worst_place(model, competition_id):
+    """Худшее место по показателю: последнее занятое место + 1."""
+    worst_place = model.objects.filter(
+        competition_id=competition_id
+    ).aggregate(worst_place=Max('place'))['worst_place']
+    return worst_place + 1 if worst_place is not None else 1
+
+
+def load_places(model, competition_id, key_fields):
+    """Места по показателю одним запросом: {ключ участника: место}.
+
+    Ключ - значение поля, если поле одно, иначе кортеж значений.
+    """
+    places = model.objects.filter(
+        competition_id=competition_id
+    ).values_list(*key_fields, 'place')
+    return {
+        key[0] if len(key) == 1 else tuple(key): place
+        for *key, place in places
+    }
+
+
+def build_places_matrix(ranking_models, competition_id, entry_keys, key_fields):
+    """Собирает матрицу мест (участник x показатель).
+
+    entry_keys - ключи участников в порядке строк матрицы,
+    key_fields - поля модели мест, из которых состоит ключ участника.
+    """
+    rows = {key: index for index, key in enumerate(entry_keys)}
+    matrix = np.empty((len(entry_keys), len(ranking_models)), dtype=float)
+
+    for column, model in enumerate(ranking_models):
+        matrix[:, column] = get_worst_place(model, competition_id)
+        for key, place in load_places(model, competition_id, key_fields).items():
+            row = rows.get(key)
+            if row is not None:
+                matrix[row, column] = place
+
+    return matrix
+
+
+def dense_ranks(values):
+    """Плотные места по возрастанию: равные значения - одно место."""
+    _, inverse = np.unique(values, return_inverse=True)
+    return inverse + 1
+
+
+def rank_entries(ranking_models, competition_id, entry_keys, key_fields):
+    """Считает сумму мест и итоговое место каждого участника.
+
+    Возвращает список (ключ, сумма мест, место),
+    отсортированный по сумме мест.
+    """
+    if not entry_keys:
+        return []
+    places_sums = build_places_matrix(
+        ranking_models, competition_id, entry_keys, key_fields
+    ).sum(axis=1)
+    places = dense_ranks(places_sums)
+    order = np.argsort(places_sums, kind='stable')
+    return [
+        (entry_keys[index], float(places_sums[index]), int(places[index]))
+        for index in order
+    ]
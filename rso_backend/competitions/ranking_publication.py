@@ -0,0 +1,69 @@
+"""Публикация таблиц мест конкурса без промежутка с пустым рейтингом.
+
+Вместо удаления всех мест и вставки новых новая версия рейтинга
+сравнивается с текущей: строки с изменившимся местом обновляются,
+новые участники добавляются, выбывшие удаляются. Все изменения пишутся
+в одной транзакции, поэтому читатели видят либо прежний рейтинг, либо
+новый целиком, а неизменившиеся строки не переписываются.
+"""
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger('tasks')
+
+UPDATE_BATCH_SIZE = 500
+
+
+def get_value_fields(model, key_fields) -> list:
+    """Поля строки рейтинга кроме id, конкурса и ключа участника."""
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if not field.primary_key
+        and field.attname not in ('competition_id', *key_fields)
+    ]
+
+
+def publish_rankings(model, competition_id, entries, key_fields):
+    """Заменяет места конкурса в таблице model на entries.
+
+    entries - несохраненные объекты model, key_fields - поля,
+    по которым строка новой версии сопоставляется с текущей.
+    Возвращает число добавленных, обновленных и удаленных строк.
+    """
+    value_fields = get_value_fields(model, key_fields)
+    current = {
+        tuple(row[:len(key_fields)]): row[len(key_fields):]
+        for row in model.objects.filter(
+            competition_id=competition_id
+        ).values_list(*key_fields, 'id', *value_fields)
+    }
+    to_create = []
+    to_update = []
+    for entry in entries:
+        row = current.pop(
+            tuple(getattr(entry, field) for field in key_fields), None
+        )
+        if row is None:
+            to_create.append(entry)
+            continue
+        entry_id, *values = row
+        if [getattr(entry, field) for field in value_fields] != values:
+            entry.id = entry_id
+            to_update.append(entry)
+    to_delete = [row[0] for row in current.values()]
+
+    with transaction.atomic():
+        if to_delete:
+            model.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            model.objects.bulk_update(
+                to_update, value_fields, batch_size=UPDATE_BATCH_SIZE
+            )
+        if to_create:
+            model.objects.bulk_create(to_create)
+    logger.info(
+        f'{model.__name__}: добавлено {len(to_create)}, '
+        f'обновлено {len(to_update)}, удалено {len(to_delete)}'
+    )
+    return len(to_create), len(to_update), len(to_delete)
@@ -0,0 +1,129 @@
+"""Срез итоговых результатов конкурса (CompetitionResult).
+
+Собирается одним проходом по таблицам мест после пересчета рейтингов,
+отчеты читают готовые строки вместо 20 таблиц мест на каждый отряд.
+"""
+import logging
+
+from django.db import transaction
+
+from competitions.constants import SOLO_RANKING_MODELS, TANDEM_RANKING_MODELS
+from competitions.models import (CompetitionParticipants, CompetitionResult,
+                                 OverallRanking, OverallTandemRanking,
+                                 September15Participant)
+from competitions.ranking_matrix import load_places
+
+logger = logging.getLogger('tasks')
+
+SOLO_KEY_FIELDS = ('detachment_id',)
+TANDEM_KEY_FIELDS = ('detachment_id', 'junior_detachment_id')
+
+
+def get_september_15_counts():
+    """Последняя запись о численности на 15 сентября для каждого отряда."""
+    counts = {}
+    for detachment_id, participants, members in (
+        September15Participant.objects.order_by('id').values_list(
+            'detachment_id', 'participants_number', 'members_number'
+        )
+    ):
+        counts[detachment_id] = (participants, members)
+    return counts
+
+
+def get_overall_places(model, competition_id, key_fields):
+    return {
+        key[0] if len(key) == 1 else tuple(key): (place, places_sum)
+        for *key, place, places_sum in model.objects.filter(
+            competition_id=competition_id
+        ).values_list(*key_fields, 'place', 'places_sum')
+    }
+
+
+def make_result(competition_id, detachment, status, nomination,
+                overall, places, sep_15_counts, partner=None):
+    participants, members = sep_15_counts.get(detachment.id, (1, 0))
+    overall_place, places_sum = overall or (None, None)
+    return CompetitionResult(
+        competition_id=competition_id,
+        detachment=detachment,
+        partner_detachment=partner,
+        region_name=detachment.region.name if detachment.region else '',
+        detachment_name=detachment.name,
+        status=status,
+        nomination=nomination,
+        area_name=detachment.area.name if detachment.area else '',
+        participants_count=participants,
+        members_count=members,
+        overall_place=overall_place,
+        places_sum=places_sum,
+        places=places
+    )
+
+
+def rebuild_competition_results(competition_id):
+    """Пересобирает срез результатов конкурса.
+
+    Пропущенные места хранятся как None. Старый срез заменяется
+    новым в одной транзакции.
+    """
+    participants = CompetitionParticipants.objects.filter(
+        competition_id=competition_id,
+        junior_detachment__isnull=False,
+        confirmed=True
+    ).select_related(
+        'detachment__region', 'detachment__area',
+        'junior_detachment__region', 'junior_detachment__area'
+    ).order_by('id')
+    sep_15_counts = get_september_15_counts()
+
+    solo_places = [
+        load_places(model, competition_id, SOLO_KEY_FIELDS)
+        for model in SOLO_RANKING_MODELS
+    ]
+    tandem_places = [
+        load_places(model, competition_id, TANDEM_KEY_FIELDS)
+        for model in TANDEM_RANKING_MODELS
+    ]
+    solo_overall = get_overall_places(
+        OverallRanking, competition_id, SOLO_KEY_FIELDS
+    )
+    tandem_overall = get_overall_places(
+        OverallTandemRanking, competition_id, TANDEM_KEY_FIELDS
+    )
+
+    debut_results = []
+    tandem_results = []
+    for entry in participants:
+        junior = entry.junior_detachment
+        if entry.detachment is None:
+            debut_results.append(make_result(
+                competition_id, junior, 'Младший отряд', 'Дебют',
+                solo_overall.get(junior.id),
+                [places.get(junior.id) for places in solo_places],
+                sep_15_counts
+            ))
+            continue
+        mentor = entry.detachment
+        key = (mentor.id, junior.id)
+        places = [places.get(key) for places in tandem_places]
+        tandem_results.append(make_result(
+            competition_id, mentor, 'Наставник', 'Тандем',
+            tandem_overall.get(key), places, sep_15_counts, partner=junior
+        ))
+        tandem_results.append(make_result(
+            competition_id, junior, 'Младший отряд', 'Тандем',
+            tandem_overall.get(key), places, sep_15_counts, partner=mentor
+        ))
+
+    results = debut_results + tandem_results
+    for position, result in enumerate(results, start=1):
+        result.position = position
+
+    with transaction.atomic():
+        CompetitionResult.objects.filter(competition_id=competition_id).delete()
+        CompetitionResult.objects.bulk_create(results)
+    logger.info(
+        f'Срез результатов конкурса {competition_id} пересобран: '
+        f'{len(results)} строк'
+    )
@@ -2,130 +2,74 @@ from django.db.models import signals
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from competitions.models import Q7, Q8, Q9, Q10, Q11, Q12, Q16Report, Q20Report
+from competitions.change_log import (PARTICIPATION_MODELS, REPORT_MODELS,
+                                     log_participants_change,
+                                     log_participation_change,
+                                     log_report_change)
+from competitions.models import CompetitionParticipants, Q7, Q8, Q9, Q10, Q11, Q12
+from competitions.verification import schedule_rescore
 
 
 @receiver([post_save, post_delete], sender=Q7)
 def create_score_q7(sender, instance, created=False, **kwargs):
-    if created:
-        pass
-    else:
-        if instance.is_verified:
-            report = instance.detachment_report
-            events = Q7.objects.filter(
-                        detachment_report=report,
-                        is_verified=True
-            ).all()
-            report.score = (
-                report.score_calculation_sum(
-                    events, 'number_of_participants'
-                )
-            )
-            report.save()
-
-            return report
+    if not created and instance.is_verified:
+        schedule_rescore('q7', instance.detachment_report_id)
 
 
 @receiver([post_save, post_delete], sender=Q8)
 def create_score_q8(sender, instance, created=False, **kwargs):
-    if created:
-        pass
-    else:
-        if instance.is_verified:
-            report = instance.detachment_report
-            events = Q8.objects.filter(
-                        detachment_report=report,
-                        is_verified=True
-            ).all()
-            report.score = (
-                report.score_calculation_sum(
-                    events, 'number_of_participants'
-                )
-            )
-            report.save()
-
-            return report
+    if not created and instance.is_verified:
+        schedule_rescore('q8', instance.detachment_report_id)
 
 
 @receiver([post_save, post_delete], sender=Q9)
 def create_score_q9(sender, instance, created=False, **kwargs):
-    if created:
-        pass
-    else:
-        if instance.is_verified:
-            report = instance.detachment_report
-            events = Q9.objects.filter(
-                        detachment_report=report,
-                        is_verified=True
-            ).all()
-            score = 0
-            for event in events:
-                score += 4 - event.prize_place
-
-            report.score = score
-            report.save()
-
-            return report
+    if not created and instance.is_verified:
+        schedule_rescore('q9', instance.detachment_report_id)
 
 
 @receiver([post_save, post_delete], sender=Q10)
 def create_score_q10(sender, instance, created=False, **kwargs):
-    if created:
-        pass
-    else:
-        if instance.is_verified:
-            report = instance.detachment_report
-            events = Q10.objects.filter(
-                        detachment_report=report,
-                        is_verified=True
-            ).all()
-            score = 0
-            for event in events:
-                score += 4 - event.prize_place
-
-            report.score = score
-            report.save()
-
-            return report
+    if not created and instance.is_verified:
+        schedule_rescore('q10', instance.detachment_report_id)
 
 
 @receiver([post_save, post_delete], sender=Q11)
 def create_score_q11(sender, instance, created=False, **kwargs):
-    if created:
-        pass
-    else:
-        if instance.is_verified:
-            report = instance.detachment_report
-            events = Q11.objects.filter(
-                        detachment_report=report,
-                        is_verified=True
-            ).all()
-            score = 0
-            for event in events:
-                score += 4 - event.prize_place
-
-            report.score = score
-            report.save()
-
-            return report
+    if not created and instance.is_verified:
+        schedule_rescore('q11', instance.detachment_report_id)
 
 
 @receiver([post_save, post_delete], sender=Q12)
 def create_score_q12(sender, instance, created=False, **kwargs):
-    if created:
-        pass
-    else:
-        if instance.is_verified:
-            report = instance.detachment_report
-            events = Q12.objects.filter(
-                        detachment_report=report,
-                        is_verified=True
-            ).all()
-            score = 0
-            for event in events:
-                score += 4 - event.prize_place
-
-            report.score = score
-            report.save()
-
-            return report
+    if not created and instance.is_verified:
+        schedule_rescore('q12', instance.detachment_report_id)
+
+
+@receiver([post_save, post_delete], sender=CompetitionParticipants)
+def log_competition_participants_change(sender, instance, **kwargs):
+    log_participants_change(instance)
+
+
+def connect_change_log_signals():
+    """Отчеты и участия показателей пишут измененные отряды в журнал."""
+    for indicator, model in REPORT_MODELS.items():
+        def log_report(sender, instance, indicator=indicator, **kwargs):
+            log_report_change(indicator, instance)
+
+        for signal in (post_save, post_delete):
+            signal.connect(
+                log_report, sender=model, weak=False,
+                dispatch_uid=f'change_log_{indicator}_report'
+            )
+
+    for indicator, model in PARTICIPATION_MODELS.items():
+        def log_participation(sender, instance, indicator=indicator,
+                              **kwargs):
+            log_participation_change(indicator, instance)
+
+        for signal in (post_save, post_delete):
+            signal.connect(
+                log_participation, sender=model, weak=False,
+                dispatch_uid=f'change_log_{indicator}_participation'
+            )
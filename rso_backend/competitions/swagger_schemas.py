@@ -256,4 +256,25 @@ q9schema_request_update = openapi.Schema(
             maximum=3
         ),
     },
-)
\ No newline at end of file
+)
+bulk_verification_request = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    required=['ids'],
+    properties={
+        'ids': openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(type=openapi.TYPE_INTEGER),
+            title='ID участий'
+        )
+    }
+)
+
+bulk_verification_response = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'count': openapi.Schema(
+            type=openapi.TYPE_INTEGER,
+            title='Количество обработанных участий'
+        )
+    }
+)
@@ -1,9 +1,14 @@
 import logging
+import time
 from datetime import date, timedelta, datetime
+from functools import partial
 
-from celery import shared_task
+from celery import chain, chord, shared_task
 from django.conf import settings
 
+from competitions.change_log import (CHANGE_LOG_INDICATORS,
+                                     rescore_participation_reports,
+                                     take_changes)
 from competitions.constants import SOLO_RANKING_MODELS, TANDEM_RANKING_MODELS, COUNT_PLACES_DEADLINE
 from competitions.models import (Q1Ranking, Q1Report, Q1TandemRanking,
                                  Q2Ranking, Q2TandemRanking, Q3Ranking,
@@ -23,6 +28,11 @@ from competitions.models import (Q1Ranking, Q1Report, Q1TandemRanking,
                                  Q18TandemRanking, Q19Ranking,
                                  Q19TandemRanking, Q20Ranking, Q20Report,
                                  Q20TandemRanking)
+from competitions.pipeline import (COPY_STAGE, INDICATORS_STAGE,
+                                   OVERALL_STAGE, inputs_changed,
+                                   record_stage_timing,
+                                   save_inputs_fingerprint,
+                                   start_pipeline_run)
 from competitions.q_calculations import (calculate_overall_rankings,
                                          calculate_place, calculate_q1_score,
                                          calculate_q3_q4_place,
@@ -32,11 +42,34 @@ from competitions.q_calculations import (calculate_overall_rankings,
                                          calculate_q15_place,
                                          calculate_q17_place,
                                          calculate_q18_place,
-                                         calculate_score_q16)
+                                         calculate_score_q16,
+                                         save_reserve_places)
+from competitions.results_snapshot import rebuild_competition_results
 
 logger = logging.getLogger('tasks')
 
 
+def calculate_changed_places(indicator, model_report, model_ranking,
+                             model_tandem_ranking, rescore=None,
+                             force=False):
+    """Считает места по показателю, если он есть в журнале изменений.
+
+    rescore(competition_id, detachment_ids) пересчитывает очки отчетов
+    измененных отрядов (всех при force=True) перед расчетом мест.
+    """
+    competition_id = settings.COMPETITION_ID
+    with take_changes(indicator, competition_id) as detachment_ids:
+        if not detachment_ids and not force:
+            logger.info(f'Показатель {indicator}: изменений нет')
+            return
+        if rescore is not None:
+            rescore(competition_id, None if force else detachment_ids)
+        calculate_place(competition_id=competition_id,
+                        model_report=model_report,
+                        model_ranking=model_ranking,
+                        model_tandem_ranking=model_tandem_ranking)
+
+
 @shared_task
 def calculate_q1_score_task():
     """Считает очки по 1 показателю."""
@@ -86,58 +119,70 @@ def calculate_q6_places_task():
 
 
 @shared_task
-def calculate_q7_places_task():
-    """Считает места по 7 показателю."""
+def calculate_q7_places_task(force=False):
+    """Считает места по 7 показателю, если отчеты изменились."""
     logger.info('Начинаем считать места по 7 показателю')
-    calculate_place(competition_id=settings.COMPETITION_ID,
-                    model_report=Q7Report,
-                    model_ranking=Q7Ranking,
-                    model_tandem_ranking=Q7TandemRanking)
+    calculate_changed_places('q7', Q7Report, Q7Ranking,
+                             Q7TandemRanking,
+                             rescore=partial(
+                                 rescore_participation_reports, 'q7'
+                             ),
+                             force=force)
 
 
 @shared_task
-def calculate_q8_places_task():
-    """Считает места по 8 показателю."""
-    calculate_place(competition_id=settings.COMPETITION_ID,
-                    model_report=Q8Report,
-                    model_ranking=Q8Ranking,
-                    model_tandem_ranking=Q8TandemRanking)
+def calculate_q8_places_task(force=False):
+    """Считает места по 8 показателю, если отчеты изменились."""
+    calculate_changed_places('q8', Q8Report, Q8Ranking,
+                             Q8TandemRanking,
+                             rescore=partial(
+                                 rescore_participation_reports, 'q8'
+                             ),
+                             force=force)
 
 
 @shared_task
-def calculate_q9_places_task():
-    """Считает места по 9 показателю."""
-    calculate_place(competition_id=settings.COMPETITION_ID,
-                    model_report=Q9Report,
-                    model_ranking=Q9Ranking,
-                    model_tandem_ranking=Q9TandemRanking)
+def calculate_q9_places_task(force=False):
+    """Считает места по 9 показателю, если отчеты изменились."""
+    calculate_changed_places('q9', Q9Report, Q9Ranking,
+                             Q9TandemRanking,
+                             rescore=partial(
+                                 rescore_participation_reports, 'q9'
+                             ),
+                             force=force)
 
 
 @shared_task
-def calculate_q10_places_task():
-    """Считает места по 10 показателю."""
-    calculate_place(competition_id=settings.COMPETITION_ID,
-                    model_report=Q10Report,
-                    model_ranking=Q10Ranking,
-                    model_tandem_ranking=Q10TandemRanking)
+def calculate_q10_places_task(force=False):
+    """Считает места по 10 показателю, если отчеты изменились."""
+    calculate_changed_places('q10', Q10Report, Q10Ranking,
+                             Q10TandemRanking,
+                             rescore=partial(
+                                 rescore_participation_reports, 'q10'
+                             ),
+                             force=force)
 
 
 @shared_task
-def calculate_q11_places_task():
-    """Считает места по 11 показателю."""
-    calculate_place(competition_id=settings.COMPETITION_ID,
-                    model_report=Q11Report,
-                    model_ranking=Q11Ranking,
-                    model_tandem_ranking=Q11TandemRanking)
+def calculate_q11_places_task(force=False):
+    """Считает места по 11 показателю, если отчеты изменились."""
+    calculate_changed_places('q11', Q11Report, Q11Ranking,
+                             Q11TandemRanking,
+                             rescore=partial(
+                                 rescore_participation_reports, 'q11'
+                             ),
+                             force=force)
 
 
 @shared_task
-def calculate_q12_places_task():
-    """Считает места по 12 показателю."""
-    calculate_place(competition_id=settings.COMPETITION_ID,
-                    model_report=Q12Report,
-                    model_ranking=Q12Ranking,
-                    model_tandem_ranking=Q12TandemRanking)
+def calculate_q12_places_task(force=False):
+    """Считает места по 12 показателю, если отчеты изменились."""
+    calculate_changed_places('q12', Q12Report, Q12Ranking,
+                             Q12TandemRanking,
+                             rescore=partial(
+                                 rescore_participation_reports, 'q12'
+                             ),
+                             force=force)
 
 
 @shared_task
@@ -165,12 +210,12 @@ def calculate_q16_score_task():
 
 
 @shared_task
-def calculate_q16_places_task():
-    """Считает места по 16 показателю."""
-    calculate_place(competition_id=settings.COMPETITION_ID,
-                    model_report=Q16Report,
-                    model_ranking=Q16Ranking,
-                    model_tandem_ranking=Q16TandemRanking)
+def calculate_q16_places_task(force=False):
+    """Считает места по 16 показателю, если отчеты изменились."""
+    calculate_changed_places('q16', Q16Report, Q16Ranking,
+                             Q16TandemRanking,
+                             rescore=calculate_score_q16,
+                             force=force)
 
 
 
@@ -201,19 +246,113 @@ def calculate_q18_places_task():
 
 
 @shared_task
-def calculate_q20_places_task():
-    """Считает места по 20 показателю."""
-    calculate_place(competition_id=settings.COMPETITION_ID,
-                    model_report=Q20Report,
-                    model_ranking=Q20Ranking,
-                    model_tandem_ranking=Q20TandemRanking)
+def calculate_q20_places_task(force=False):
+    """Считает места по 20 показателю, если отчеты изменились."""
+    calculate_changed_places('q20', Q20Report, Q20Ranking,
+                             Q20TandemRanking,
+                             force=force)
 
 
 @shared_task
 def calculate_overall_places_task():
-    """Считает общие места для соло и тандемов."""
+    """Считает общие места для соло и тандемов.
+
+    После пересчета пересобирает срез результатов конкурса для отчетов.
+    """
     calculate_overall_rankings(
         solo_ranking_models=SOLO_RANKING_MODELS,
         tandem_ranking_models=TANDEM_RANKING_MODELS,
         competition_id=settings.COMPETITION_ID
     )
+    rebuild_competition_results(settings.COMPETITION_ID)
+
+
+# Задачи показателей для конвейера пересчета. Задачи одного показателя
+# выполняются последовательно (сначала очки, потом места).
+INDICATOR_TASKS = {
+    'q1': (calculate_q1_score_task, calculate_q1_places_task),
+    'q3_q4': (calculate_q3_q4_places_task,),
+    'q5': (calculate_q5_places_task,),
+    'q6': (calculate_q6_places_task,),
+    'q7': (calculate_q7_places_task,),
+    'q8': (calculate_q8_places_task,),
+    'q9': (calculate_q9_places_task,),
+    'q10': (calculate_q10_places_task,),
+    'q11': (calculate_q11_places_task,),
+    'q12': (calculate_q12_places_task,),
+    'q14': (calculate_q14_places_task,),
+    'q15': (calculate_q15_places_task,),
+    'q16': (calculate_q16_places_task,),
+    'q17': (calculate_q17_places_task,),
+    'q18': (calculate_q18_places_task,),
+    'q20': (calculate_q20_places_task,),
+}
+
+
+@shared_task
+def calculate_indicator_stage_task(run_id, indicator, force=False):
+    """Этап конвейера: места по одному показателю.
+
+    Задачи показателей из журнала изменений при force=True считают
+    места и очки всех отчетов, а не только измененных.
+    """
+    started = time.monotonic()
+    kwargs = {'force': force} if indicator in CHANGE_LOG_INDICATORS else {}
+    for task in INDICATOR_TASKS[indicator]:
+        task(**kwargs)
+    save_inputs_fingerprint(indicator, settings.COMPETITION_ID)
+    record_stage_timing(run_id, indicator, time.monotonic() - started)
+    return indicator
+
+
+@shared_task
+def calculate_overall_stage_task(run_id, started_at):
+    """Этап конвейера: общий зачет после мест по всем показателям."""
+    record_stage_timing(run_id, INDICATORS_STAGE, time.time() - started_at)
+    started = time.monotonic()
+    calculate_overall_places_task()
+    record_stage_timing(run_id, OVERALL_STAGE, time.monotonic() - started)
+
+
+@shared_task
+def save_reserve_places_stage_task(run_id):
+    """Этап конвейера: резервная копия мест (RankingCopy)."""
+    started = time.monotonic()
+    save_reserve_places(settings.COMPETITION_ID)
+    record_stage_timing(run_id, COPY_STAGE, time.monotonic() - started)
+    logger.info(f'Конвейер пересчета рейтингов {run_id} завершен')
+
+
+@shared_task
+def calculate_rankings_pipeline_task(force=False):
+    """Пересчитывает рейтинги конкурса с учетом зависимостей.
+
+    Показатели, входные данные которых изменились с прошлого запуска
+    (или все при force=True), считаются параллельно группой chord.
+    Общий зачет запускается только после всех показателей, резервная
+    копия мест - после общего зачета. Если ни один показатель
+    не изменился, пересчет не запускается.
+    """
+    competition_id = settings.COMPETITION_ID
+    indicators = [
+        indicator for indicator in INDICATOR_TASKS
+        if force or inputs_changed(indicator, competition_id)
+    ]
+    if not indicators:
+        logger.info('Входные данные показателей не изменились')
+        return None
+    run_id = start_pipeline_run(competition_id, indicators)
+    logger.info(
+        f'Конвейер пересчета рейтингов {run_id}: {", ".join(indicators)}'
+    )
+    chain(
+        chord(
+            [
+                calculate_indicator_stage_task.si(run_id, indicator, force)
+                for indicator in indicators
+            ],
+            calculate_overall_stage_task.si(run_id, time.time())
+        ),
+        save_reserve_places_stage_task.si(run_id)
+    ).apply_async()
+    return run_id
@@ -0,0 +1,103 @@
+"""Верификация участий Q7-Q12 и пересчет очков их отчетов.
+
+Сигналы сохранения/удаления участий не пересчитывают отчет сразу,
+а откладывают его id до коммита транзакции: сколько бы участий одного
+отчета ни изменилось в транзакции, его очки считаются один раз.
+Массовая верификация обновляет участия одним запросом и пересчитывает
+каждый затронутый отчет однократно.
+"""
+import threading
+
+from django.db import transaction
+
+from competitions.change_log import (PARTICIPATION_MODELS, REPORT_MODELS,
+                                     log_changes, rescore_reports)
+from competitions.models import QVerificationLog
+
+_pending = threading.local()
+
+
+def get_indicator(model) -> str:
+    """Показатель ('q7'...'q12') модели участия."""
+    return next(
+        indicator for indicator, participation_model
+        in PARTICIPATION_MODELS.items() if participation_model is model
+    )
+
+
+def _get_pending() -> dict:
+    if not hasattr(_pending, 'reports'):
+        _pending.reports = {}
+    return _pending.reports
+
+
+def flush_rescores():
+    """Пересчитывает очки всех отложенных отчетов."""
+    pending = _get_pending()
+    while pending:
+        indicator, report_ids = pending.popitem()
+        rescore_reports(
+            indicator,
+            REPORT_MODELS[indicator].objects.filter(id__in=report_ids)
+        )
+
+
+def schedule_rescore(indicator, report_id):
+    """Откладывает пересчет очков отчета до коммита транзакции.
+
+    Вне транзакции пересчет выполняется сразу. Каждый вызов регистрирует
+    on_commit, но отчеты пересчитывает только первый сработавший
+    обработчик, остальные находят пустую очередь.
+    """
+    _get_pending().setdefault(indicator, set()).add(report_id)
+    transaction.on_commit(flush_rescores)
+
+
+def bulk_verify(queryset, verifier_id, competition_id, accept=True):
+    """Верифицирует (accept=True) или отклоняет участия queryset.
+
+    Берутся только неверифицированные участия. Верификация - один
+    UPDATE, отклонение удаляет участия, как и одиночное отклонение.
+    Очки каждого затронутого отчета пересчитываются один раз, записи
+    журнала верификации создаются одним bulk_create.
+    Возвращает число обработанных участий.
+    """
+    indicator = get_indicator(queryset.model)
+    with transaction.atomic():
+        rows = list(queryset.filter(is_verified=False).select_for_update(
+            of=('self',)
+        ).values_list(
+            'id', 'detachment_report_id', 'detachment_report__detachment_id'
+        ))
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+        report_ids = {row[1] for row in rows}
+        if accept:
+            queryset.model.objects.filter(id__in=ids).update(
+                is_verified=True
+            )
+            rescore_reports(
+                indicator,
+                REPORT_MODELS[indicator].objects.filter(id__in=report_ids)
+            )
+        else:
+            queryset.model.objects.filter(id__in=ids).delete()
+        QVerificationLog.objects.bulk_create([
+            QVerificationLog(
+                competition_id=competition_id,
+                verifier_id=verifier_id,
+                q_number=int(indicator[1:]),
+                verified_detachment_id=detachment_id,
+                action=(
+                    QVerificationLog.Action.ACCEPTED if accept
+                    else QVerificationLog.Action.REJECTED
+                )
+            )
+            for _, _, detachment_id in rows
+        ])
+        log_changes(
+            (indicator,), competition_id,
+            *{detachment_id for _, _, detachment_id in rows}
+        )
+    return len(rows)
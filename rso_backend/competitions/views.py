@@ -112,7 +112,9 @@ from competitions.serializers import (CompetitionApplicationsObjectSerializer,
 from competitions.signal_handlers import (create_score_q7, create_score_q8,
                                           create_score_q9, create_score_q10,
                                           create_score_q11, create_score_q12)
-from competitions.swagger_schemas import (q7schema_request,
+from competitions.swagger_schemas import (bulk_verification_request,
+                                          bulk_verification_response,
+                                          q7schema_request,
                                           q7schema_request_update,
                                           q9schema_request,
                                           q9schema_request_update,
@@ -122,6 +124,7 @@ from competitions.swagger_schemas import (q7schema_request,
                                           response_create_application,
                                           response_junior_detachments)
 from competitions.utils import get_place_q2, ignore_deadline, tandem_or_start, round_math
+from competitions.verification import bulk_verify
 from headquarters.models import (Detachment, RegionalHeadquarter,
                                  UserDetachmentPosition,
                                  UserRegionalHeadquarterPosition)
@@ -1278,6 +1281,50 @@ class Q7ViewSet(ListRetrieveCreateViewSet):
         )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='bulk-accept',
+            permission_classes=(permissions.IsAuthenticated,
+                                IsRegionalCommissioner,))
+    @swagger_auto_schema(
+        request_body=bulk_verification_request,
+        responses={200: bulk_verification_response}
+    )
+    def bulk_accept(self, request, competition_pk, *args, **kwargs):
+        """
+        Action для массовой верификации мероприятий рег. комиссаром.
+
+        POST подтверждает, DELETE отклоняет (удаляет) неподтвержденные
+        мероприятия с id из 'ids' отрядов регионального штаба комиссара.
+        Очки каждого затронутого отчета пересчитываются один раз.
+        Доступ: комиссары региональных штабов до окончания подсчета мест.
+        """
+        if date.today() > COUNT_PLACES_DEADLINE:
+            return Response({'error': 'Верификация завершена.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(
+                isinstance(event_id, int) for event_id in ids
+        ):
+            return Response({'error': 'Передайте список id в поле ids.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        regional_headquarter = (
+            request.user.userregionalheadquarterposition.headquarter
+        )
+        count = bulk_verify(
+            self.serializer_class.Meta.model.objects.filter(
+                id__in=ids,
+                detachment_report__competition_id=competition_pk,
+                detachment_report__detachment__regional_headquarter=(
+                    regional_headquarter
+                )
+            ),
+            verifier_id=request.user.id,
+            competition_id=competition_pk,
+            accept=request.method == 'POST'
+        )
+        return Response({'count': count}, status=status.HTTP_200_OK)
+
     @action(detail=False,
             methods=['get'],
             url_path='me',
@@ -7,8 +7,6 @@ from django.core.cache import cache
 from django.db import IntegrityError, transaction
 from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
@@ -24,6 +22,7 @@ from api.permissions import (IsApplicantOrOrganizer,
                              IsAuthorMultiEventApplication, IsCommander, IsEventAuthor,
                              IsEventOrganizer, IsEventOrganizerOrAuthor,
                              IsVerifiedPermission)
+from api.response_cache import EVENTS_TAGS, cache_response
 from events.constants import EVENT_APPLICATIONS_MODEL
 from events.filters import EventFilter
 from events.models import (Event, EventAdditionalIssue, EventApplications,
@@ -111,11 +110,17 @@ class EventViewSet(viewsets.ModelViewSet):
         'Отрядное': IsDetachmentCommander,
     }
 
-    @method_decorator(cache_page(settings.EVENTS_CACHE_TTL))
+    @cache_response(
+        settings.EVENTS_CACHE_TTL, EVENTS_TAGS,
+        soft_timeout=settings.PUBLIC_LIST_SOFT_TTL
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
     
-    @method_decorator(cache_page(settings.EVENTS_CACHE_TTL))
+    @cache_response(
+        settings.EVENTS_CACHE_TTL, EVENTS_TAGS,
+        soft_timeout=settings.PUBLIC_LIST_SOFT_TTL
+    )
     def list_status(self, request, *args, **kwargs):
         status_param = request.query_params.get('status')
         queryset = self.filter_queryset(self.get_queryset())
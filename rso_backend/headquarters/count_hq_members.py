@@ -1,3 +1,5 @@
+from django.db.models import Count, Q
+
 from competitions.models import September15Participant
 from headquarters.models import (CentralHeadquarter, Detachment,
                                  DistrictHeadquarter, EducationalHeadquarter,
@@ -8,7 +10,7 @@ from headquarters.models import (CentralHeadquarter, Detachment,
                                  UserEducationalHeadquarterPosition,
                                  UserLocalHeadquarterPosition,
                                  UserRegionalHeadquarterPosition)
-from questions.models import Attempt
+from questions.models import Attempt, UserBestAttempt
 from events.models import Event, EventParticipants
 from headquarters.mixins import (CentralSubCommanderIdMixin, RegionalSubCommanderIdMixin,
                                  DistrictSubCommanderIdMixin, EducationalSubCommanderIdMixin,
@@ -135,7 +137,7 @@ def count_test_membership(headquarter, user_id=None):
 
     if isinstance(headquarter, CentralHeadquarter):
         members = UserCentralHeadquarterPosition.objects.filter(headquarter=headquarter)
-        test_membership_users_count = Attempt.objects.filter(
+        test_membership_users_count = UserBestAttempt.objects.filter(
             user__in=members.values_list('user', flat=True),
             category=Attempt.Category.SAFETY,
             score__gt=60
@@ -143,7 +145,7 @@ def count_test_membership(headquarter, user_id=None):
         sub_commanders = CentralSubCommanderIdMixin().get_sub_commanders(headquarter, user_id)
     elif isinstance(headquarter, DistrictHeadquarter):
         members = UserDistrictHeadquarterPosition.objects.filter(headquarter=headquarter)
-        test_membership_users_count = Attempt.objects.filter(
+        test_membership_users_count = UserBestAttempt.objects.filter(
             user__in=members.values_list('user', flat=True),
             category=Attempt.Category.SAFETY,
             score__gt=60
@@ -151,7 +153,7 @@ def count_test_membership(headquarter, user_id=None):
         sub_commanders = DistrictSubCommanderIdMixin().get_sub_commanders(headquarter, user_id)
     elif isinstance(headquarter, RegionalHeadquarter):
         members = UserRegionalHeadquarterPosition.objects.filter(headquarter=headquarter)
-        test_membership_users_count = Attempt.objects.filter(
+        test_membership_users_count = UserBestAttempt.objects.filter(
             user__in=members.values_list('user', flat=True),
             category=Attempt.Category.SAFETY,
             score__gt=60
@@ -159,7 +161,7 @@ def count_test_membership(headquarter, user_id=None):
         sub_commanders = RegionalSubCommanderIdMixin().get_sub_commanders(headquarter, user_id)
     elif isinstance(headquarter, LocalHeadquarter):
         members = UserLocalHeadquarterPosition.objects.filter(headquarter=headquarter)
-        test_membership_users_count = Attempt.objects.filter(
+        test_membership_users_count = UserBestAttempt.objects.filter(
             user__in=members.values_list('user', flat=True),
             category=Attempt.Category.SAFETY,
             score__gt=60
@@ -167,7 +169,7 @@ def count_test_membership(headquarter, user_id=None):
         sub_commanders = LocalSubCommanderIdMixin().get_sub_commanders(headquarter, user_id)
     elif isinstance(headquarter, EducationalHeadquarter):
         members = UserEducationalHeadquarterPosition.objects.filter(headquarter=headquarter)
-        test_membership_users_count = Attempt.objects.filter(
+        test_membership_users_count = UserBestAttempt.objects.filter(
             user__in=members.values_list('user', flat=True),
             category=Attempt.Category.SAFETY,
             score__gt=60
@@ -175,7 +177,7 @@ def count_test_membership(headquarter, user_id=None):
         sub_commanders = EducationalSubCommanderIdMixin().get_sub_commanders(headquarter, user_id)
     elif isinstance(headquarter, Detachment):
         members = UserDetachmentPosition.objects.filter(headquarter=headquarter)
-        test_membership_users_count = Attempt.objects.filter(
+        test_membership_users_count = UserBestAttempt.objects.filter(
             user__in=members.values_list('user', flat=True),
             category=Attempt.Category.SAFETY,
             score__gt=60
@@ -184,7 +186,7 @@ def count_test_membership(headquarter, user_id=None):
         raise ValueError('Будьте внимательны :)')
 
     commander_ids = [cmd['id'] for cmd in sub_commanders]
-    test_membership_sub_commanders_count = Attempt.objects.filter(
+    test_membership_sub_commanders_count = UserBestAttempt.objects.filter(
         user__in=commander_ids,
         category=Attempt.Category.SAFETY,
         score__gt=60
@@ -242,3 +244,145 @@ def get_hq_participants_15_september(detachment):
 def get_hq_members_15_september(detachment):
     detachment_members =  September15Participant.objects.filter(detachment=detachment).last()
     return 0 if not detachment_members else detachment_members.members_number
+
+
+# Модель звена -> членство в звене и поле организатора мероприятия
+HEADQUARTER_MEMBERSHIPS = {
+    CentralHeadquarter: (UserCentralHeadquarterPosition, 'org_central_headquarter'),
+    DistrictHeadquarter: (UserDistrictHeadquarterPosition, 'org_district_headquarter'),
+    RegionalHeadquarter: (UserRegionalHeadquarterPosition, 'org_regional_headquarter'),
+    LocalHeadquarter: (UserLocalHeadquarterPosition, 'org_local_headquarter'),
+    EducationalHeadquarter: (UserEducationalHeadquarterPosition, 'org_educational_headquarter'),
+    Detachment: (UserDetachmentPosition, 'org_detachment'),
+}
+
+# Модель звена -> подчиненные звенья (ключ колонки отчета, модель, путь
+# от подчиненного звена к штабу). Тот же состав, что у *SubCommanderIdMixin.
+SUB_UNITS = {
+    CentralHeadquarter: (
+        ('district_headquarters', DistrictHeadquarter, 'central_headquarter'),
+        ('regional_headquarters', RegionalHeadquarter, 'district_headquarter__central_headquarter'),
+        ('detachments', Detachment, 'regional_headquarter__district_headquarter__central_headquarter'),
+        ('local_headquarters', LocalHeadquarter, 'regional_headquarter__district_headquarter__central_headquarter'),
+        ('educational_headquarters', EducationalHeadquarter,
+         'regional_headquarter__district_headquarter__central_headquarter'),
+    ),
+    DistrictHeadquarter: (
+        ('regional_headquarters', RegionalHeadquarter, 'district_headquarter'),
+        ('detachments', Detachment, 'regional_headquarter__district_headquarter'),
+        ('local_headquarters', LocalHeadquarter, 'regional_headquarter__district_headquarter'),
+        ('educational_headquarters', EducationalHeadquarter, 'regional_headquarter__district_headquarter'),
+    ),
+    RegionalHeadquarter: (
+        ('detachments', Detachment, 'regional_headquarter'),
+        ('local_headquarters', LocalHeadquarter, 'regional_headquarter'),
+        ('educational_headquarters', EducationalHeadquarter, 'regional_headquarter'),
+    ),
+    LocalHeadquarter: (
+        ('detachments', Detachment, 'local_headquarter'),
+        ('educational_headquarters', EducationalHeadquarter, 'local_headquarter'),
+    ),
+    EducationalHeadquarter: (
+        ('detachments', Detachment, 'educational_headquarter'),
+    ),
+    Detachment: (),
+}
+
+PASSED_SAFETY_TEST = Q(category=Attempt.Category.SAFETY, score__gt=60)
+
+
+def _grouped(queryset, group_by, **aggregates):
+    """{значение group_by: {агрегат: значение}} одним GROUP BY запросом."""
+    return {
+        row.pop(group_by): row
+        for row in queryset.values(group_by).annotate(**aggregates).order_by()
+    }
+
+
+def count_headquarters_stats(headquarters):
+    """Считает показатели реестра сразу для всех штабов одного уровня.
+
+    Возвращает словарь {id штаба: показатели}. Участники, верифицированные,
+    оплатившие взнос и прошедшие тест считаются как в count_* функциях выше:
+    члены штаба + командиры подчиненных звеньев + командир самого штаба.
+    Число запросов зависит только от уровня штаба, но не от числа штабов.
+    """
+    headquarters = list(headquarters)
+    if not headquarters:
+        return {}
+    model = type(headquarters[0])
+    ids = [headquarter.id for headquarter in headquarters]
+    membership_model, org_field = HEADQUARTER_MEMBERSHIPS[model]
+    user_relation = membership_model._meta.get_field('user').related_query_name()
+
+    stats = {
+        headquarter_id: {
+            'participants': 1,
+            'verified': 1,
+            'membership_fee': 1,
+            'test_done': 1,
+            'events_organizations': 0,
+            'event_participants': 0,
+        }
+        for headquarter_id in ids
+    }
+
+    members = _grouped(
+        membership_model.objects.filter(headquarter_id__in=ids),
+        'headquarter_id',
+        participants=Count('id'),
+        verified=Count('id', filter=Q(user__is_verified=True)),
+        membership_fee=Count('id', filter=Q(user__membership_fee=True)),
+    )
+    members_tests = _grouped(
+        UserBestAttempt.objects.filter(
+            PASSED_SAFETY_TEST,
+            **{f'user__{user_relation}__headquarter_id__in': ids}
+        ),
+        f'user__{user_relation}__headquarter_id',
+        test_done=Count('id'),
+    )
+    counters = [members, members_tests]
+
+    for column, unit_model, path in SUB_UNITS[model]:
+        commander_relation = unit_model._meta.get_field('commander').related_query_name()
+        units = _grouped(
+            unit_model.objects.filter(**{f'{path}_id__in': ids}),
+            f'{path}_id',
+            units=Count('id'),
+            participants=Count('commander'),
+            verified=Count('id', filter=Q(commander__is_verified=True)),
+            membership_fee=Count('id', filter=Q(commander__membership_fee=True)),
+        )
+        for headquarter_id, unit_stats in units.items():
+            stats[headquarter_id][column] = unit_stats.pop('units')
+        counters.append(units)
+        counters.append(_grouped(
+            UserBestAttempt.objects.filter(
+                PASSED_SAFETY_TEST,
+                **{f'user__{commander_relation}__{path}_id__in': ids}
+            ),
+            f'user__{commander_relation}__{path}_id',
+            test_done=Count('id'),
+        ))
+
+    counters.append(_grouped(
+        Event.objects.filter(**{f'{org_field}_id__in': ids}),
+        f'{org_field}_id',
+        events_organizations=Count('id'),
+    ))
+    counters.append(_grouped(
+        EventParticipants.objects.filter(**{f'event__{org_field}_id__in': ids}),
+        f'event__{org_field}_id',
+        event_participants=Count('id'),
+    ))
+
+    for counter in counters:
+        for headquarter_id, values in counter.items():
+            for key, value in values.items():
+                stats[headquarter_id][key] += value
+
+    for headquarter_stats in stats.values():
+        for column, _, _ in SUB_UNITS[model]:
+            headquarter_stats.setdefault(column, 0)
+    return stats
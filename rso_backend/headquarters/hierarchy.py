@@ -0,0 +1,174 @@
+"""Индекс предков структурных единиц (UnitAncestor).
+
+Для каждого звена хранится по строке на каждого вышестоящего звена,
+поэтому выборки "все звенья внутри X" и "все предки Y" делаются
+одним запросом по индексу вместо цепочек JOIN вида
+regional_headquarter__district_headquarter__central_headquarter.
+"""
+from django.db import transaction
+
+from headquarters.models import (CentralHeadquarter, Detachment,
+                                 DistrictHeadquarter, EducationalHeadquarter,
+                                 LocalHeadquarter, RegionalHeadquarter,
+                                 UnitAncestor)
+
+REGIONAL_PATHS = (
+    ('RegionalHeadquarter', 'regional_headquarter', 1),
+    ('DistrictHeadquarter', 'regional_headquarter__district_headquarter', 2),
+    ('CentralHeadquarter',
+     'regional_headquarter__district_headquarter__central_headquarter', 3),
+)
+
+# Тип звена -> (тип предка, путь от звена к предку, глубина).
+# Пути совпадают с фильтрами, которыми раньше искались подчиненные звенья.
+ANCESTOR_PATHS = {
+    'CentralHeadquarter': (),
+    'DistrictHeadquarter': (
+        ('CentralHeadquarter', 'central_headquarter', 1),
+    ),
+    'RegionalHeadquarter': (
+        ('DistrictHeadquarter', 'district_headquarter', 1),
+        ('CentralHeadquarter', 'district_headquarter__central_headquarter', 2),
+    ),
+    'LocalHeadquarter': REGIONAL_PATHS,
+    'EducationalHeadquarter': (
+        ('LocalHeadquarter', 'local_headquarter', 1),
+    ) + REGIONAL_PATHS,
+    'Detachment': (
+        ('EducationalHeadquarter', 'educational_headquarter', 1),
+        ('LocalHeadquarter', 'local_headquarter', 1),
+    ) + REGIONAL_PATHS,
+}
+
+UNIT_MODELS = (
+    CentralHeadquarter,
+    DistrictHeadquarter,
+    RegionalHeadquarter,
+    LocalHeadquarter,
+    EducationalHeadquarter,
+    Detachment,
+)
+
+
+def build_ancestor_rows(unit_model, ancestor_model, unit_ids=None):
+    """Строки индекса для звеньев модели одним запросом.
+
+    ancestor_model передается явно, чтобы функцию можно было вызвать
+    из миграции с историческими моделями.
+    """
+    unit_type = unit_model.__name__
+    paths = ANCESTOR_PATHS[unit_type]
+    if not paths:
+        return []
+    units = unit_model.objects.all()
+    if unit_ids is not None:
+        units = units.filter(id__in=unit_ids)
+    rows = []
+    for unit_id, *ancestor_ids in units.values_list(
+        'id', *[f'{path}__id' for _, path, _ in paths]
+    ):
+        for (ancestor_type, _, depth), ancestor_id in zip(paths, ancestor_ids):
+            if ancestor_id is not None:
+                rows.append(ancestor_model(
+                    unit_type=unit_type,
+                    unit_id=unit_id,
+                    ancestor_type=ancestor_type,
+                    ancestor_id=ancestor_id,
+                    depth=depth
+                ))
+    return rows
+
+
+def get_row_keys(rows):
+    return {
+        (row.unit_id, row.ancestor_type, row.ancestor_id, row.depth)
+        for row in rows
+    }
+
+
+def replace_ancestor_rows(unit_model, unit_ids):
+    """Пересобирает строки индекса для звеньев модели.
+
+    Возвращает True, если строки изменились.
+    """
+    unit_type = unit_model.__name__
+    rows = build_ancestor_rows(unit_model, UnitAncestor, unit_ids)
+    current = UnitAncestor.objects.filter(
+        unit_type=unit_type, unit_id__in=unit_ids
+    )
+    if get_row_keys(rows) == get_row_keys(current):
+        return False
+    current.delete()
+    UnitAncestor.objects.bulk_create(rows)
+    return True
+
+
+def get_descendant_ids(unit_type, unit_id):
+    """{тип звена: [id]} всех звеньев внутри данного."""
+    descendants = {}
+    for descendant_type, descendant_id in UnitAncestor.objects.filter(
+        ancestor_type=unit_type, ancestor_id=unit_id
+    ).values_list('unit_type', 'unit_id'):
+        descendants.setdefault(descendant_type, []).append(descendant_id)
+    return descendants
+
+
+@transaction.atomic
+def sync_unit_ancestors(instance):
+    """Обновляет индекс после сохранения звена.
+
+    Если у звена сменились предки, пересобираются и все его
+    подчиненные звенья: их предки через это звено тоже сменились.
+    """
+    model = type(instance)
+    if not replace_ancestor_rows(model, [instance.id]):
+        return
+    descendants = get_descendant_ids(model.__name__, instance.id)
+    for unit_model in UNIT_MODELS:
+        unit_ids = descendants.get(unit_model.__name__)
+        if unit_ids:
+            replace_ancestor_rows(unit_model, unit_ids)
+
+
+def delete_unit_ancestors(instance):
+    """Удаляет звено из индекса. Подчиненных звеньев у удаляемого
+    звена нет: связи на него защищены PROTECT."""
+    unit_type = type(instance).__name__
+    UnitAncestor.objects.filter(
+        unit_type=unit_type, unit_id=instance.id
+    ).delete()
+    UnitAncestor.objects.filter(
+        ancestor_type=unit_type, ancestor_id=instance.id
+    ).delete()
+
+
+def rebuild_unit_ancestors(get_model=None, ancestor_model=UnitAncestor):
+    """Полностью пересобирает индекс, например после loaddata."""
+    ancestor_model.objects.all().delete()
+    for unit_model in UNIT_MODELS:
+        if get_model is not None:
+            unit_model = get_model('headquarters', unit_model.__name__)
+        ancestor_model.objects.bulk_create(
+            build_ancestor_rows(unit_model, ancestor_model),
+            batch_size=1000
+        )
+
+
+def get_sub_units(ancestor, model):
+    """Звенья модели model внутри звена ancestor одним запросом."""
+    return model.objects.filter(
+        id__in=UnitAncestor.objects.filter(
+            ancestor_type=type(ancestor).__name__,
+            ancestor_id=ancestor.id,
+            unit_type=model.__name__
+        ).values('unit_id')
+    )
+
+
+def get_ancestors(unit):
+    """{тип предка: id} всех вышестоящих звеньев."""
+    return dict(
+        UnitAncestor.objects.filter(
+            unit_type=type(unit).__name__, unit_id=unit.id
+        ).values_list('ancestor_type', 'ancestor_id')
+    )
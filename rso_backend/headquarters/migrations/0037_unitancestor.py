@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:52
+
+from django.db import migrations, models
+
+
+def fill_unit_ancestors(apps, schema_editor):
+    from headquarters.hierarchy import rebuild_unit_ancestors
+
+    rebuild_unit_ancestors(
+        get_model=apps.get_model,
+        ancestor_model=apps.get_model('headquarters', 'UnitAncestor')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('headquarters', '0036_regionalheadquarteremail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitAncestor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit_type', models.CharField(max_length=30, verbose_name='Тип звена')),
+                ('unit_id', models.PositiveBigIntegerField(verbose_name='ID звена')),
+                ('ancestor_type', models.CharField(max_length=30, verbose_name='Тип вышестоящего звена')),
+                ('ancestor_id', models.PositiveBigIntegerField(verbose_name='ID вышестоящего звена')),
+                ('depth', models.PositiveSmallIntegerField(verbose_name='Глубина')),
+            ],
+            options={
+                'verbose_name': 'Вышестоящее звено',
+                'verbose_name_plural': 'Вышестоящие звенья',
+                'indexes': [models.Index(fields=['ancestor_type', 'ancestor_id', 'unit_type'], name='unit_ancestor_descendants_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='unitancestor',
+            constraint=models.UniqueConstraint(fields=('unit_type', 'unit_id', 'ancestor_type'), name='unit_ancestor_unique_constraint'),
+        ),
+        migrations.RunPython(fill_unit_ancestors, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 
+from headquarters.hierarchy import get_sub_units
 from headquarters.swagger_schemas import applications_response
 from headquarters.models import (UserDetachmentApplication, CentralHeadquarter, DistrictHeadquarter,           RegionalHeadquarter, LocalHeadquarter, EducationalHeadquarter, Detachment, 
     UserCentralHeadquarterPosition, UserDistrictHeadquarterPosition, 
@@ -110,30 +111,28 @@ class SubDistrictHqsMixin(SubControlBaseMixin):
     @action(detail=True, methods=['get'], url_path='sub_regionals')
     def get_sub_regionals(self, request, pk=None):
         district_hq = self.get_object()
-        regionals = RegionalHeadquarter.objects.filter(district_headquarter=district_hq)
+        regionals = get_sub_units(district_hq, RegionalHeadquarter)
         sub_control_data = self.get_sub_controls(regionals)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='sub_locals')
     def get_sub_locals(self, request, pk=None):
         district_hq = self.get_object()
-        locals = LocalHeadquarter.objects.filter(regional_headquarter__district_headquarter=district_hq)
+        locals = get_sub_units(district_hq, LocalHeadquarter)
         sub_control_data = self.get_sub_controls(locals)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='sub_educationals')
     def get_sub_educationals(self, request, pk=None):
         district_hq = self.get_object()
-        educationals = EducationalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter=district_hq
-            )
+        educationals = get_sub_units(district_hq, EducationalHeadquarter)
         sub_control_data = self.get_sub_controls(educationals)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='sub_detachments')
     def get_sub_detachments(self, request, pk=None):
         district_hq = self.get_object()
-        detachments = Detachment.objects.filter(regional_headquarter__district_headquarter=district_hq)
+        detachments = get_sub_units(district_hq, Detachment)
         sub_control_data = self.get_sub_controls(detachments)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
@@ -143,21 +142,21 @@ class SubRegionalHqsMixin(SubControlBaseMixin):
     @action(detail=True, methods=['get'], url_path='sub_locals')
     def get_sub_locals(self, request, pk=None):
         regional_hq = self.get_object()
-        locals = LocalHeadquarter.objects.filter(regional_headquarter=regional_hq)
+        locals = get_sub_units(regional_hq, LocalHeadquarter)
         sub_control_data = self.get_sub_controls(locals)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='sub_educationals')
     def get_sub_educationals(self, request, pk=None):
         regional_hq = self.get_object()
-        educationals = EducationalHeadquarter.objects.filter(regional_headquarter=regional_hq)
+        educationals = get_sub_units(regional_hq, EducationalHeadquarter)
         sub_control_data = self.get_sub_controls(educationals)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='sub_detachments')
     def get_sub_detachments(self, request, pk=None):
         regional_hq = self.get_object()
-        detachments = Detachment.objects.filter(regional_headquarter=regional_hq)
+        detachments = get_sub_units(regional_hq, Detachment)
         sub_control_data = self.get_sub_controls(detachments)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
@@ -167,14 +166,14 @@ class SubLocalHqsMixin(SubControlBaseMixin):
     @action(detail=True, methods=['get'], url_path='sub_educationals')
     def get_sub_educationals(self, request, pk=None):
         local_hq = self.get_object()
-        educationals = EducationalHeadquarter.objects.filter(local_headquarter=local_hq)
+        educationals = get_sub_units(local_hq, EducationalHeadquarter)
         sub_control_data = self.get_sub_controls(educationals)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], url_path='sub_detachments')
     def get_sub_detachments(self, request, pk=None):
         local_hq = self.get_object()
-        detachments = Detachment.objects.filter(local_headquarter=local_hq)
+        detachments = get_sub_units(local_hq, Detachment)
         sub_control_data = self.get_sub_controls(detachments)
         return Response(sub_control_data, status=status.HTTP_200_OK)
 
@@ -184,7 +183,7 @@ class SubEducationalHqsMixin(SubControlBaseMixin):
     @action(detail=True, methods=['get'], url_path='sub_detachments')
     def get_sub_detachments(self, request, pk=None):
         educational_hq = self.get_object()
-        detachments = Detachment.objects.filter(educational_headquarter=educational_hq)
+        detachments = get_sub_units(educational_hq, Detachment)
         sub_control_data = self.get_sub_controls(detachments)
         return Response(sub_control_data, status=status.HTTP_200_OK)
     
@@ -241,7 +240,7 @@ class BaseLeadershipMixin:
         instance = self.get_object()
         leadership_data = self.get_leadership(instance)
         return Response(leadership_data, status=status.HTTP_200_OK)
-    
+
     @action(detail=True, methods=['get'], url_path='leadership/(?P<user_pk>\d+)')
     def retrieve_leadership_by_user_pk(self, request, pk=None, user_pk=None):
         instance = self.get_object()
@@ -276,6 +275,8 @@ class DetachmentLeadershipMixin(BaseLeadershipMixin):
     
 
 class BaseSubCommanderMixin:
+    sub_unit_models = ()
+
     def add_commanders(self, headquarters, user_id, commanders, hq_type):
         for hq in headquarters:
             if hq.commander and (user_id is None or hq.commander.id == int(user_id)):
@@ -287,6 +288,13 @@ class BaseSubCommanderMixin:
                 })
         return commanders
 
+    def collect_sub_commanders(self, obj, user_id):
+        commanders = []
+        for model in self.sub_unit_models:
+            units = get_sub_units(obj, model).select_related('commander')
+            self.add_commanders(units, user_id, commanders, model.__name__)
+        return commanders
+
     def append_district_hqs(self, district_headquarters, user_id, commanders):
         return self.add_commanders(district_headquarters, user_id, commanders, 'DistrictHeadquarter')
 
@@ -320,221 +328,77 @@ class BaseSubCommanderMixin:
 
 
 class CentralSubCommanderMixin(BaseSubCommanderMixin):
+    sub_unit_models = (
+        DistrictHeadquarter, RegionalHeadquarter, Detachment,
+        LocalHeadquarter, EducationalHeadquarter,
+    )
+
     def get_sub_commanders(self, obj):
         user_id = self.request.query_params.get('user_id', None)
-        commanders = []
-        central_headquarter = obj
+        return self.collect_sub_commanders(obj, user_id)
 
-        district_headquarters = DistrictHeadquarter.objects.filter(
-            central_headquarter=central_headquarter
-            )
-        self.append_district_hqs(district_headquarters, user_id, commanders)
-        regional_headquarters = RegionalHeadquarter.objects.filter(
-            district_headquarter__central_headquarter=central_headquarter
-            )
-        self.append_regional_hqs(regional_headquarters, user_id, commanders)
-        detachments = Detachment.objects.filter(
-            regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        local_headquarters = LocalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-            )
-        self.append_local_hqs(local_headquarters, user_id, commanders)
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-            )
-        self.append_educational_hqs(educational_headquarters, user_id, commanders)
 
-        return commanders
-    
-    
-class CentralSubCommanderIdMixin(BaseSubCommanderMixin):
+class CentralSubCommanderIdMixin(CentralSubCommanderMixin):
     def get_sub_commanders(self, obj, user_id=None):
-        commanders = []
-        central_headquarter = obj
-
-        district_headquarters = DistrictHeadquarter.objects.filter(
-            central_headquarter=central_headquarter
-        )
-        self.append_district_hqs(district_headquarters, user_id, commanders)
-        
-        regional_headquarters = RegionalHeadquarter.objects.filter(
-            district_headquarter__central_headquarter=central_headquarter
-        )
-        self.append_regional_hqs(regional_headquarters, user_id, commanders)
-        
-        detachments = Detachment.objects.filter(
-            regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-        )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        
-        local_headquarters = LocalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-        )
-        self.append_local_hqs(local_headquarters, user_id, commanders)
-        
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-        )
-        self.append_educational_hqs(educational_headquarters, user_id, commanders)
-
-        return commanders
+        return self.collect_sub_commanders(obj, user_id)
 
 
 class DistrictSubCommanderMixin(BaseSubCommanderMixin):
+    sub_unit_models = (
+        RegionalHeadquarter, Detachment, LocalHeadquarter,
+        EducationalHeadquarter,
+    )
+
     def get_sub_commanders(self, obj):
         user_id = self.request.query_params.get('user_id', None)
-        commanders = []
-        district_headquarter = obj
+        return self.collect_sub_commanders(obj, user_id)
 
-        regional_headquarters = RegionalHeadquarter.objects.filter(
-            district_headquarter=district_headquarter
-            )
-        self.append_regional_hqs(regional_headquarters, user_id, commanders
-            )
-        detachments = Detachment.objects.filter(
-            regional_headquarter__district_headquarter=district_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        local_headquarters = LocalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter=district_headquarter
-            )
-        self.append_local_hqs(local_headquarters, user_id, commanders)
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter=district_headquarter
-            )
-        self.append_educational_hqs(educational_headquarters, user_id, commanders)
 
-        return commanders
-    
-    
-class DistrictSubCommanderIdMixin(BaseSubCommanderMixin):
+class DistrictSubCommanderIdMixin(DistrictSubCommanderMixin):
     def get_sub_commanders(self, obj, user_id=None):
-        commanders = []
-        district_headquarter = obj
-
-        regional_headquarters = RegionalHeadquarter.objects.filter(
-            district_headquarter=district_headquarter
-            )
-        self.append_regional_hqs(regional_headquarters, user_id, commanders
-            )
-        detachments = Detachment.objects.filter(
-            regional_headquarter__district_headquarter=district_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        local_headquarters = LocalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter=district_headquarter
-            )
-        self.append_local_hqs(local_headquarters, user_id, commanders)
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            regional_headquarter__district_headquarter=district_headquarter
-            )
-        self.append_educational_hqs(educational_headquarters, user_id, commanders)
-
-        return commanders
+        return self.collect_sub_commanders(obj, user_id)
 
 
 class RegionalSubCommanderMixin(BaseSubCommanderMixin):
+    sub_unit_models = (
+        Detachment, LocalHeadquarter, EducationalHeadquarter,
+    )
+
     def get_sub_commanders(self, obj):
         user_id = self.request.query_params.get('user_id', None)
-        commanders = []
-        regional_headquarter = obj
+        return self.collect_sub_commanders(obj, user_id)
 
-        detachments = Detachment.objects.filter(
-            regional_headquarter=regional_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        local_headquarters = LocalHeadquarter.objects.filter(
-            regional_headquarter=regional_headquarter)
-        self.append_local_hqs(local_headquarters, user_id, commanders
-            )
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            regional_headquarter=regional_headquarter
-            )
-        self.append_educational_hqs(educational_headquarters, user_id, commanders)
 
-        return commanders
-    
-    
-class RegionalSubCommanderIdMixin(BaseSubCommanderMixin):
+class RegionalSubCommanderIdMixin(RegionalSubCommanderMixin):
     def get_sub_commanders(self, obj, user_id=None):
-        commanders = []
-        regional_headquarter = obj
-
-        detachments = Detachment.objects.filter(
-            regional_headquarter=regional_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        local_headquarters = LocalHeadquarter.objects.filter(
-            regional_headquarter=regional_headquarter)
-        self.append_local_hqs(local_headquarters, user_id, commanders
-            )
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            regional_headquarter=regional_headquarter
-            )
-        self.append_educational_hqs(educational_headquarters, user_id, commanders)
-
-        return commanders
+        return self.collect_sub_commanders(obj, user_id)
 
 
 class LocalSubCommanderMixin(BaseSubCommanderMixin):
+    sub_unit_models = (
+        Detachment, EducationalHeadquarter,
+    )
+
     def get_sub_commanders(self, obj):
         user_id = self.request.query_params.get('user_id', None)
-        commanders = []
-        local_headquarter = obj
+        return self.collect_sub_commanders(obj, user_id)
 
-        detachments = Detachment.objects.filter(
-            local_headquarter=local_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            local_headquarter=local_headquarter
-            )
-        self.append_educational_hqs(educational_headquarters, user_id, commanders)
-
-        return commanders
-    
 
-class LocalSubCommanderIdMixin(BaseSubCommanderMixin):
+class LocalSubCommanderIdMixin(LocalSubCommanderMixin):
     def get_sub_commanders(self, obj, user_id=None):
-        commanders = []
-        local_headquarter = obj
-
-        detachments = Detachment.objects.filter(
-            local_headquarter=local_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        educational_headquarters = EducationalHeadquarter.objects.filter(
-            local_headquarter=local_headquarter
-            )
-        self.append_educational_hqs(educational_headquarters, user_id, commanders)
-
-        return commanders
+        return self.collect_sub_commanders(obj, user_id)
 
 
 class EducationalSubCommanderMixin(BaseSubCommanderMixin):
+    sub_unit_models = (
+        Detachment,
+    )
+
     def get_sub_commanders(self, obj):
         user_id = self.request.query_params.get('user_id', None)
-        commanders = []
-        educational_headquarter = obj
+        return self.collect_sub_commanders(obj, user_id)
 
-        detachments = Detachment.objects.filter(
-            educational_headquarter=educational_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        
-        return commanders
-    
 
-class EducationalSubCommanderIdMixin(BaseSubCommanderMixin):
+class EducationalSubCommanderIdMixin(EducationalSubCommanderMixin):
     def get_sub_commanders(self, obj, user_id=None):
-        commanders = []
-        educational_headquarter = obj
-
-        detachments = Detachment.objects.filter(
-            educational_headquarter=educational_headquarter
-            )
-        self.append_detachment_hqs(detachments, user_id, commanders)
-        
-        return commanders
+        return self.collect_sub_commanders(obj, user_id)
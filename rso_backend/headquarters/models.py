@@ -1064,3 +1064,53 @@ class RegionalHeadquarterEmail(models.Model):
     class Meta:
         verbose_name = 'Email Регионального Штаба'
         verbose_name_plural = 'Email Региональных Штабов'
+
+
+class UnitAncestor(models.Model):
+    """Индекс предков структурной единицы (closure table).
+
+    Строка означает, что звено unit_type/unit_id входит в звено
+    ancestor_type/ancestor_id, depth - число связей между ними.
+    Заполняется сигналами сохранения и удаления звеньев,
+    см. headquarters.hierarchy.
+    """
+
+    unit_type = models.CharField(
+        max_length=30,
+        verbose_name='Тип звена'
+    )
+    unit_id = models.PositiveBigIntegerField(
+        verbose_name='ID звена'
+    )
+    ancestor_type = models.CharField(
+        max_length=30,
+        verbose_name='Тип вышестоящего звена'
+    )
+    ancestor_id = models.PositiveBigIntegerField(
+        verbose_name='ID вышестоящего звена'
+    )
+    depth = models.PositiveSmallIntegerField(
+        verbose_name='Глубина'
+    )
+
+    class Meta:
+        verbose_name = 'Вышестоящее звено'
+        verbose_name_plural = 'Вышестоящие звенья'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('unit_type', 'unit_id', 'ancestor_type'),
+                name='unit_ancestor_unique_constraint'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('ancestor_type', 'ancestor_id', 'unit_type'),
+                name='unit_ancestor_descendants_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.unit_type} {self.unit_id} -> '
+            f'{self.ancestor_type} {self.ancestor_id}'
+        )
@@ -1,11 +1,20 @@
 import os
 
-from django.db.models.signals import pre_delete, pre_save
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
 from django.dispatch import receiver
 
+from api.role_cache import invalidate_user_roles
+from headquarters.hierarchy import delete_unit_ancestors, sync_unit_ancestors
 from headquarters.models import (CentralHeadquarter, Detachment,
                                  DistrictHeadquarter, EducationalHeadquarter,
-                                 LocalHeadquarter, RegionalHeadquarter)
+                                 LocalHeadquarter, RegionalHeadquarter,
+                                 UserCentralHeadquarterPosition,
+                                 UserDetachmentPosition,
+                                 UserDistrictHeadquarterPosition,
+                                 UserEducationalHeadquarterPosition,
+                                 UserLocalHeadquarterPosition,
+                                 UserRegionalHeadquarterPosition)
 from headquarters.utils import (headquarter_image_delete,
                                 headquarter_media_folder_delete)
 
@@ -168,3 +177,98 @@ def delete_image_with_detachment_headquarter(sender, instance, **kwargs):
                 pass
         except Detachment.DoesNotExist:
             pass
+
+
+@receiver(post_save, sender=CentralHeadquarter)
+@receiver(post_save, sender=DistrictHeadquarter)
+@receiver(post_save, sender=RegionalHeadquarter)
+@receiver(post_save, sender=LocalHeadquarter)
+@receiver(post_save, sender=EducationalHeadquarter)
+@receiver(post_save, sender=Detachment)
+def sync_unit_ancestors_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Функция для обновления индекса предков звена при его сохранении.
+    При загрузке фикстур (raw) индекс пересобирается целиком
+    через rebuild_unit_ancestors.
+    """
+
+    if not raw:
+        sync_unit_ancestors(instance)
+
+
+@receiver(post_delete, sender=CentralHeadquarter)
+@receiver(post_delete, sender=DistrictHeadquarter)
+@receiver(post_delete, sender=RegionalHeadquarter)
+@receiver(post_delete, sender=LocalHeadquarter)
+@receiver(post_delete, sender=EducationalHeadquarter)
+@receiver(post_delete, sender=Detachment)
+def delete_unit_ancestors_on_delete(sender, instance, **kwargs):
+    """
+    Функция для удаления звена из индекса предков.
+    """
+
+    delete_unit_ancestors(instance)
+
+
+@receiver(pre_save, sender=CentralHeadquarter)
+@receiver(pre_save, sender=DistrictHeadquarter)
+@receiver(pre_save, sender=RegionalHeadquarter)
+@receiver(pre_save, sender=LocalHeadquarter)
+@receiver(pre_save, sender=EducationalHeadquarter)
+@receiver(pre_save, sender=Detachment)
+def remember_previous_commander(sender, instance, raw=False, **kwargs):
+    """
+    Функция для запоминания прежнего командира звена перед сохранением,
+    чтобы сбросить кэш ролей и у него.
+    """
+
+    instance._previous_commander_id = None
+    if instance.pk and not raw:
+        instance._previous_commander_id = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('commander_id', flat=True).first()
+
+
+@receiver(post_save, sender=CentralHeadquarter)
+@receiver(post_save, sender=DistrictHeadquarter)
+@receiver(post_save, sender=RegionalHeadquarter)
+@receiver(post_save, sender=LocalHeadquarter)
+@receiver(post_save, sender=EducationalHeadquarter)
+@receiver(post_save, sender=Detachment)
+@receiver(post_delete, sender=CentralHeadquarter)
+@receiver(post_delete, sender=DistrictHeadquarter)
+@receiver(post_delete, sender=RegionalHeadquarter)
+@receiver(post_delete, sender=LocalHeadquarter)
+@receiver(post_delete, sender=EducationalHeadquarter)
+@receiver(post_delete, sender=Detachment)
+def invalidate_commander_roles(sender, instance, **kwargs):
+    """
+    Функция для сброса кэша ролей командира (текущего и прежнего)
+    при сохранении или удалении звена.
+    """
+
+    invalidate_user_roles(
+        instance.commander_id,
+        getattr(instance, '_previous_commander_id', None)
+    )
+
+
+@receiver(post_save, sender=UserCentralHeadquarterPosition)
+@receiver(post_save, sender=UserDistrictHeadquarterPosition)
+@receiver(post_save, sender=UserRegionalHeadquarterPosition)
+@receiver(post_save, sender=UserLocalHeadquarterPosition)
+@receiver(post_save, sender=UserEducationalHeadquarterPosition)
+@receiver(post_save, sender=UserDetachmentPosition)
+@receiver(post_delete, sender=UserCentralHeadquarterPosition)
+@receiver(post_delete, sender=UserDistrictHeadquarterPosition)
+@receiver(post_delete, sender=UserRegionalHeadquarterPosition)
+@receiver(post_delete, sender=UserLocalHeadquarterPosition)
+@receiver(post_delete, sender=UserEducationalHeadquarterPosition)
+@receiver(post_delete, sender=UserDetachmentPosition)
+def invalidate_member_roles(sender, instance, **kwargs):
+    """
+    Функция для сброса кэша ролей пользователя при изменении
+    или удалении его должности в штабе/отряде.
+    """
+
+    invalidate_user_roles(instance.user_id)
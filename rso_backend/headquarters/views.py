@@ -5,8 +5,6 @@ from django.db import transaction
 from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
@@ -21,6 +19,8 @@ from api.permissions import (IsDetachmentCommander, IsDistrictCommander,
                              IsRegionalCommander, IsStuffOrCentralCommander,
                              IsStuffOrCentralCommanderOrTrusted,
                              IsUserModelPositionCommander)
+from api.response_cache import (MEMBERS_TAGS, UNITS_TAGS, USER_TAGS,
+                                cache_response)
 from api.utils import get_headquarter_users_positions_queryset
 from headquarters.filters import (DetachmentFilter,
                                   EducationalHeadquarterFilter,
@@ -90,6 +90,33 @@ from regional_competitions.utils import generate_rhq_xlsx_report
 from users.serializers import UserVerificationReadSerializer
 
 
+# Штаб по pk зависит от самой строки штаба, его участников, подчиненных
+# звеньев, мероприятий и пользователей (командир, число участников).
+SUB_UNITS_TAGS = (
+    'headquarters.localheadquarter',
+    'headquarters.educationalheadquarter',
+    'headquarters.detachment',
+)
+CENTRAL_OBJECT_TAGS = (
+    'headquarters.centralheadquarter:{pk}',
+    'headquarters.usercentralheadquarterposition',
+    'events.event',
+) + USER_TAGS
+DISTRICT_OBJECT_TAGS = (
+    'headquarters.districtheadquarter:{pk}',
+    'headquarters.userdistrictheadquarterposition',
+    'headquarters.regionalheadquarter',
+    'events.event',
+) + SUB_UNITS_TAGS + USER_TAGS
+REGIONAL_OBJECT_TAGS = (
+    'headquarters.regionalheadquarter:{pk}',
+    'headquarters.userregionalheadquarterposition',
+    'headquarters.region',
+    'events.event',
+    'users',
+) + SUB_UNITS_TAGS
+
+
 class PositionViewSet(ListRetrieveViewSet):
     """Представляет должности для юзеров.
 
@@ -102,7 +129,7 @@ class PositionViewSet(ListRetrieveViewSet):
     search_fields = ('name',)
     ordering = ('name',)
 
-    @method_decorator(cache_page(settings.POSITIONS_LIST_TTL))
+    @cache_response(settings.POSITIONS_LIST_TTL, ('headquarters.position',))
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -125,7 +152,7 @@ class CentralViewSet(ApplicationsMixin,
     permission_classes = (IsStuffOrCentralCommander,)
     ordering = ('name',)
 
-    @method_decorator(cache_page(settings.CENTRAL_OBJECT_CACHE_TTL))
+    @cache_response(settings.CENTRAL_OBJECT_CACHE_TTL, CENTRAL_OBJECT_TAGS)
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -191,7 +218,7 @@ class DistrictViewSet(ApplicationsMixin,
             permission_classes = (IsDistrictCommander,)
         return [permission() for permission in permission_classes]
 
-    @method_decorator(cache_page(settings.DISTR_OBJECT_CACHE_TTL))
+    @cache_response(settings.DISTR_OBJECT_CACHE_TTL, DISTRICT_OBJECT_TAGS)
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -243,7 +270,10 @@ class RegionalViewSet(ApplicationsMixin,
     ordering_fields = ('name', 'founding_date',)
     filterset_class = RegionalHeadquarterFilter
 
-    @method_decorator(cache_page(settings.REGIONALS_LIST_TTL))
+    @cache_response(
+        settings.REGIONALS_LIST_TTL, UNITS_TAGS,
+        soft_timeout=settings.PUBLIC_LIST_SOFT_TTL
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -264,7 +294,7 @@ class RegionalViewSet(ApplicationsMixin,
             permission_classes = (IsRegionalCommander,)
         return [permission() for permission in permission_classes]
 
-    @method_decorator(cache_page(settings.REG_OBJECT_CACHE_TTL))
+    @cache_response(settings.REG_OBJECT_CACHE_TTL, REGIONAL_OBJECT_TAGS)
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -325,7 +355,10 @@ class LocalViewSet(ApplicationsMixin,
     ordering_fields = ('name', 'founding_date',)
     filterset_class = LocalHeadquarterFilter
 
-    @method_decorator(cache_page(settings.LOCALS_LIST_TTL))
+    @cache_response(
+        settings.LOCALS_LIST_TTL, UNITS_TAGS,
+        soft_timeout=settings.PUBLIC_LIST_SOFT_TTL
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -394,7 +427,10 @@ class EducationalViewSet(ApplicationsMixin,
     filterset_class = EducationalHeadquarterFilter
     ordering_fields = ('name', 'founding_date',)
 
-    @method_decorator(cache_page(settings.EDUCATIONALS_LIST_TTL))
+    @cache_response(
+        settings.EDUCATIONALS_LIST_TTL, UNITS_TAGS,
+        soft_timeout=settings.PUBLIC_LIST_SOFT_TTL
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -470,7 +506,10 @@ class DetachmentViewSet(ApplicationsMixin,
     filterset_class = DetachmentFilter
     ordering_fields = ('name', 'founding_date',)
 
-    @method_decorator(cache_page(settings.DETACHMENT_LIST_TTL))
+    @cache_response(
+        settings.DETACHMENT_LIST_TTL, UNITS_TAGS,
+        soft_timeout=settings.PUBLIC_LIST_SOFT_TTL
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -526,7 +565,7 @@ class BasePositionViewSet(viewsets.ModelViewSet):
     permission_classes = (IsUserModelPositionCommander,)
     serializer_class = None
 
-    @method_decorator(cache_page(settings.HEADQUARTERS_MEMBERS_CACHE_TTL))
+    @cache_response(settings.HEADQUARTERS_MEMBERS_CACHE_TTL, MEMBERS_TAGS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -594,7 +633,7 @@ class CentralPositionViewSet(BasePositionViewSet):
             UserCentralHeadquarterPosition
         ))).select_related('headquarter', 'user__media', 'position')
 
-    @method_decorator(cache_page(settings.CENTRALHQ_MEMBERS_CACHE_TTL))
+    @cache_response(settings.CENTRALHQ_MEMBERS_CACHE_TTL, MEMBERS_TAGS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -621,7 +660,7 @@ class DistrictPositionViewSet(BasePositionViewSet):
             UserDistrictHeadquarterPosition
         ))).select_related('headquarter', 'user__media', 'position')
 
-    @method_decorator(cache_page(settings.DISTRCICTHQ_MEMBERS_CACHE_TTL))
+    @cache_response(settings.DISTRCICTHQ_MEMBERS_CACHE_TTL, MEMBERS_TAGS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -640,7 +679,7 @@ class RegionalPositionViewSet(BasePositionViewSet):
 
     serializer_class = RegionalPositionSerializer
 
-    @method_decorator(cache_page(settings.HEADQUARTERS_MEMBERS_CACHE_TTL))
+    @cache_response(settings.HEADQUARTERS_MEMBERS_CACHE_TTL, MEMBERS_TAGS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -666,7 +705,7 @@ class LocalPositionViewSet(BasePositionViewSet):
 
     serializer_class = LocalPositionSerializer
 
-    @method_decorator(cache_page(settings.HEADQUARTERS_MEMBERS_CACHE_TTL))
+    @cache_response(settings.HEADQUARTERS_MEMBERS_CACHE_TTL, MEMBERS_TAGS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -692,7 +731,7 @@ class EducationalPositionViewSet(BasePositionViewSet):
 
     serializer_class = EducationalPositionSerializer
 
-    @method_decorator(cache_page(settings.HEADQUARTERS_MEMBERS_CACHE_TTL))
+    @cache_response(settings.HEADQUARTERS_MEMBERS_CACHE_TTL, MEMBERS_TAGS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -718,7 +757,7 @@ class DetachmentPositionViewSet(BasePositionViewSet):
 
     serializer_class = DetachmentPositionSerializer
 
-    @method_decorator(cache_page(settings.HEADQUARTERS_MEMBERS_CACHE_TTL))
+    @cache_response(settings.HEADQUARTERS_MEMBERS_CACHE_TTL, MEMBERS_TAGS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -1201,7 +1240,10 @@ class DetachmentListViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('name',)
     ordering = ('name',)
 
-    @method_decorator(cache_page(settings.DETANCHMENT_LIST_CACHE_TTL))
+    @cache_response(
+        settings.DETANCHMENT_LIST_CACHE_TTL, UNITS_TAGS,
+        soft_timeout=settings.PUBLIC_LIST_SOFT_TTL
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
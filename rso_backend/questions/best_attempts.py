@@ -0,0 +1,71 @@
+"""Лучшие попытки пользователей (UserBestAttempt).
+
+На пользователя и категорию хранится одна строка с лучшей валидной
+попыткой, ее баллом и числом валидных попыток. Строка пересчитывается
+сигналами сохранения/удаления попыток в той же транзакции, поэтому
+вызывающие места читают ее по ключу вместо агрегата по всем попыткам.
+"""
+from questions.models import Attempt, UserBestAttempt
+
+BEST_ATTEMPTS_BATCH_SIZE = 1000
+
+
+def refresh_best_attempt(user_id, category):
+    """Пересчитывает лучшую попытку пользователя в категории.
+
+    Валидных попыток у пользователя единицы, поэтому пересчет - один
+    запрос по индексу пользователя и запись строки проекции.
+    """
+    attempts = list(Attempt.objects.filter(
+        user_id=user_id, category=category, is_valid=True
+    ).order_by('-score', 'timestamp').values_list('id', 'score'))
+    if not attempts:
+        UserBestAttempt.objects.filter(
+            user_id=user_id, category=category
+        ).delete()
+        return None
+    attempt_id, score = attempts[0]
+    best_attempt, _ = UserBestAttempt.objects.update_or_create(
+        user_id=user_id,
+        category=category,
+        defaults={
+            'attempt_id': attempt_id,
+            'score': score,
+            'attempts_count': len(attempts),
+        }
+    )
+    return best_attempt
+
+
+def get_best_attempt(user_id, category):
+    """Лучшая попытка пользователя в категории или None."""
+    return UserBestAttempt.objects.filter(
+        user_id=user_id, category=category
+    ).first()
+
+
+def rebuild_best_attempts(attempt_model=Attempt,
+                          best_attempt_model=UserBestAttempt):
+    """Заполняет проекцию заново по всем валидным попыткам.
+
+    Модели передаются параметрами, чтобы функцию можно было вызвать
+    из миграции с историческими моделями.
+    """
+    best_attempt_model.objects.all().delete()
+    best_attempts = {}
+    for attempt_id, user_id, category, score in (
+        attempt_model.objects.filter(is_valid=True).order_by(
+            'user_id', 'category', '-score', 'timestamp'
+        ).values_list('id', 'user_id', 'category', 'score').iterator()
+    ):
+        best_attempt = best_attempts.get((user_id, category))
+        if best_attempt is None:
+            best_attempts[(user_id, category)] = best_attempt_model(
+                user_id=user_id, category=category, attempt_id=attempt_id,
+                score=score, attempts_count=1
+            )
+        else:
+            best_attempt.attempts_count += 1
+    best_attempt_model.objects.bulk_create(
+        best_attempts.values(), batch_size=BEST_ATTEMPTS_BATCH_SIZE
+    )
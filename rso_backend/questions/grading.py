@@ -0,0 +1,77 @@
+"""Проверка и оценка ответов попытки тестирования.
+
+Весь набор ответов проверяется двумя запросами (вопросы попытки
+и выбранные варианты ответов) и сохраняется одним bulk_create.
+"""
+from questions.models import AnswerOption, UserAnswer
+
+SCORES_PER_ANSWER = {
+    'safety': 6.66,
+    'university': 5,
+}
+
+
+class GradingError(Exception):
+    """Ответы не прошли проверку, текст - сообщение для пользователя."""
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_answers(attempt, answers_data) -> int:
+    """Проверяет ответы попытки, сохраняет их и возвращает счет.
+
+    Все вопросы должны относиться к попытке, на каждый вопрос
+    допускается один ответ, вариант ответа должен относиться к вопросу.
+    При ошибке ничего не сохраняется и выбрасывается GradingError.
+    """
+    attempt_question_ids = set(
+        attempt.questions.values_list('id', flat=True)
+    )
+    answers = []
+    for answer in answers_data:
+        if not isinstance(answer, dict):
+            raise GradingError('Неверный формат ответа.')
+        question_id = _to_id(answer.get('question_id'))
+        if question_id not in attempt_question_ids:
+            raise GradingError('Вопрос не относится к последней попытке.')
+        answers.append(
+            (question_id, _to_id(answer.get('answer_option_id')), answer)
+        )
+    options = {
+        option_id: (question_id, is_correct)
+        for option_id, question_id, is_correct
+        in AnswerOption.objects.filter(
+            id__in={option_id for _, option_id, _ in answers
+                    if option_id is not None}
+        ).values_list('id', 'question_id', 'is_correct')
+    }
+
+    user_answers = []
+    answered_question_ids = set()
+    correct_count = 0
+    for question_id, option_id, answer in answers:
+        option = options.get(option_id)
+        if option is None or option[0] != question_id:
+            raise GradingError(
+                f'Неверная пара id вопрос-ответ: '
+                f'question_id: {answer.get("question_id")}, '
+                f'answer_id: {answer.get("answer_option_id")}.'
+            )
+        if question_id in answered_question_ids:
+            raise GradingError(
+                f'Повторный ответ на вопрос question_id: {question_id}.'
+            )
+        answered_question_ids.add(question_id)
+        correct_count += option[1]
+        user_answers.append(UserAnswer(
+            attempt=attempt,
+            question_id=question_id,
+            answer_option_id=option_id
+        ))
+    UserAnswer.objects.bulk_create(user_answers)
+    return round(correct_count * SCORES_PER_ANSWER[attempt.category])
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_best_attempts(apps, schema_editor):
+    from questions.best_attempts import rebuild_best_attempts
+    rebuild_best_attempts(
+        attempt_model=apps.get_model('questions', 'Attempt'),
+        best_attempt_model=apps.get_model('questions', 'UserBestAttempt')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('questions', '0004_attempt_is_valid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBestAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('university', 'Тест по обучению (корпоративный университет)'), ('safety', 'Тест по безопасности и охране труда')], max_length=20, verbose_name='Категория попытки')),
+                ('score', models.PositiveSmallIntegerField(default=0, verbose_name='Лучший результат')),
+                ('attempts_count', models.PositiveSmallIntegerField(default=0, verbose_name='Количество валидных попыток')),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.attempt', verbose_name='Лучшая попытка')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_attempts', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Лучшая попытка пользователя',
+                'verbose_name_plural': 'Лучшие попытки пользователей',
+                'unique_together': {('user', 'category')},
+            },
+        ),
+        migrations.RunPython(fill_best_attempts, migrations.RunPython.noop),
+    ]
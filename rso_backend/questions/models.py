@@ -87,6 +87,50 @@ class Attempt(models.Model):
         verbose_name_plural = 'Попытки пользователей'
 
 
+class UserBestAttempt(models.Model):
+    """Лучшая валидная попытка пользователя в категории.
+
+    Поддерживается сигналами сохранения/удаления попыток, чтобы
+    не пересчитывать лучший балл агрегатом по всем попыткам.
+    """
+    user = models.ForeignKey(
+        'users.RSOUser',
+        on_delete=models.CASCADE,
+        related_name='best_attempts',
+        verbose_name='Пользователь'
+    )
+    category = models.CharField(
+        max_length=20,
+        choices=Attempt.Category.choices,
+        verbose_name='Категория попытки'
+    )
+    attempt = models.ForeignKey(
+        Attempt,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Лучшая попытка'
+    )
+    score = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Лучший результат'
+    )
+    attempts_count = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Количество валидных попыток'
+    )
+
+    def __str__(self):
+        return (
+            f'Лучшая попытка пользователя id {self.user_id} '
+            f'({self.category}): {self.score}'
+        )
+
+    class Meta:
+        verbose_name = 'Лучшая попытка пользователя'
+        verbose_name_plural = 'Лучшие попытки пользователей'
+        unique_together = ('user', 'category')
+
+
 class UserAnswer(models.Model):
     attempt = models.ForeignKey(
         Attempt,
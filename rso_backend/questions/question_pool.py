@@ -0,0 +1,68 @@
+"""Пулы вопросов тестирования в Redis (кэш default).
+
+Для каждого блока в кэше лежит список id его вопросов. Попытка
+собирается случайной выборкой id из пулов и одним запросом вопросов
+с вариантами ответов вместо ORDER BY RANDOM() по таблице на каждый блок.
+Сигналы сохранения/удаления вопросов сбрасывают пулы.
+"""
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from questions.models import Question
+
+POOL_KEY = 'question_pool:{block}'
+
+
+def get_block_question_ids(block) -> list:
+    """Id всех вопросов блока, при промахе кэша - из БД."""
+    key = POOL_KEY.format(block=block)
+    question_ids = cache.get(key)
+    if question_ids is None:
+        question_ids = list(
+            Question.objects.filter(block=block).values_list('id', flat=True)
+        )
+        cache.set(key, question_ids, settings.QUESTION_POOL_CACHE_TTL)
+    return question_ids
+
+
+def sample_question_ids(blocks_counts) -> list:
+    """Случайные id вопросов: count штук из каждого блока.
+
+    blocks_counts - пары (блок, число вопросов). Если в блоке вопросов
+    меньше, берутся все.
+    """
+    question_ids = []
+    for block, count in blocks_counts:
+        pool = get_block_question_ids(block)
+        question_ids.extend(random.sample(pool, min(count, len(pool))))
+    return question_ids
+
+
+def get_questions(question_ids) -> list:
+    """Вопросы с вариантами ответов в порядке question_ids."""
+    questions = Question.objects.filter(
+        id__in=question_ids
+    ).prefetch_related('answer_options').in_bulk()
+    return [
+        questions[question_id] for question_id in question_ids
+        if question_id in questions
+    ]
+
+
+def _delete_pools():
+    cache.delete_many([
+        POOL_KEY.format(block=block) for block in Question.Block.values
+    ])
+
+
+def invalidate_question_pools():
+    """Сбрасывает пулы всех блоков.
+
+    Пулы удаляются сразу и еще раз после коммита транзакции, чтобы
+    параллельный запрос не закэшировал незакоммиченный состав блока.
+    """
+    _delete_pools()
+    transaction.on_commit(_delete_pools)
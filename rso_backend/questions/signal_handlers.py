@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from questions.best_attempts import refresh_best_attempt
+from questions.models import Attempt, Question
+from questions.question_pool import invalidate_question_pools
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def reset_question_pools(sender, instance, **kwargs):
+    """Сбрасывает пулы вопросов при изменении состава блоков."""
+    invalidate_question_pools()
+
+
+@receiver(post_save, sender=Attempt)
+def update_best_attempt(sender, instance, created, **kwargs):
+    """Пересчитывает лучшую попытку при завершении или изменении попытки.
+
+    Только что выданная попытка без ответов на лучшую не влияет.
+    """
+    if created and not instance.is_valid:
+        return
+    refresh_best_attempt(instance.user_id, instance.category)
+
+
+@receiver(post_delete, sender=Attempt)
+def remove_best_attempt(sender, instance, **kwargs):
+    """Пересчитывает лучшую попытку после удаления попытки."""
+    refresh_best_attempt(instance.user_id, instance.category)
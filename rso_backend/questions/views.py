@@ -9,7 +9,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from questions.models import AnswerOption, Attempt, Question, UserAnswer
+from questions.best_attempts import get_best_attempt
+from questions.grading import GradingError, grade_answers
+from questions.models import Attempt, UserAnswer
+from questions.question_pool import get_questions, sample_question_ids
 from questions.serializers import QuestionSerializer
 from questions.swagger_schemas import answers_request_body
 
@@ -78,9 +81,8 @@ class QuestionsView(APIView):
         university_deadline = datetime(2024, 4, 10).date()
         safety_deadline = datetime(2024, 6, 30).date()
 
-        attempts_count = Attempt.objects.filter(
-            user=user, category=category, is_valid=True
-        ).count()
+        best_attempt = get_best_attempt(user.id, category)
+        attempts_count = best_attempt.attempts_count if best_attempt else 0
 
         if attempts_count > 2 and category == 'university':
             return Response(
@@ -121,24 +123,19 @@ class QuestionsView(APIView):
 
         attempt = Attempt.objects.create(user=user, category=category)
         attempt.questions.set(questions)
-        attempt.save()
 
         serializer = QuestionSerializer(questions, many=True, context={'request': request})
         return Response(serializer.data)
 
     def get_university_questions_mix(self):
-        questions_mix = []
-        questions_mix.extend(self.get_block_questions(1, 6))
-        questions_mix.extend(self.get_block_questions(2, 8))
-        questions_mix.extend(self.get_block_questions(3, 5))
-        questions_mix.extend(self.get_block_questions(4, 1))
-        random.shuffle(questions_mix)
-        return questions_mix
+        question_ids = sample_question_ids(((1, 6), (2, 8), (3, 5), (4, 1)))
+        random.shuffle(question_ids)
+        return get_questions(question_ids)
 
     def get_block_questions(self, block_number, count):
-        questions = Question.objects.filter(block=block_number).order_by('?')[
-                    :count]
-        return list(questions)
+        return get_questions(
+            sample_question_ids(((block_number, count),))
+        )
 
 
 @swagger_auto_schema(
@@ -258,51 +255,21 @@ def submit_answers(request):
                 status=400
             )
 
-        score = 0
-        scores_per_answer = 6.66 if latest_attempt.category == 'safety' else 5
-
-        for answer in answers_data:
-            question_id = answer.get('question_id')
-            answer_option_id = answer.get('answer_option_id')
-
-            # Проверяем, принадлежит ли вопрос к последней попытке
-            if not latest_attempt.questions.filter(id=question_id).exists():
-                return Response(
-                    {'error': 'Вопрос не относится к последней попытке.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            try:
-                question = Question.objects.get(id=question_id)
-                answer_option = question.answer_options.get(id=answer_option_id)
-            except (Question.DoesNotExist, AnswerOption.DoesNotExist):
-                return Response(
-                    {
-                        'error': f'Неверная пара id вопрос-ответ: '
-                                 f'question_id: {question_id}, answer_id: {answer_option_id}.'
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            UserAnswer.objects.create(
-                attempt=latest_attempt,
-                question=question,
-                answer_option=answer_option
+        try:
+            score = grade_answers(latest_attempt, answers_data)
+        except GradingError as error:
+            return Response(
+                {'error': str(error)}, status=status.HTTP_400_BAD_REQUEST
             )
-            if answer_option.is_correct:
-                score += scores_per_answer
-
-    latest_attempt.score = round(score)
-    latest_attempt.is_valid = True
-    latest_attempt.save()
 
-    best_score = Attempt.objects.filter(
-        user=user, category=category, is_valid=True
-    ).order_by('-score').first().score
+        latest_attempt.score = score
+        latest_attempt.is_valid = True
+        latest_attempt.save()
+        best_score = get_best_attempt(user.id, category).score
 
     return Response(
         {
-            'score': round(score),
+            'score': score,
             'best_score': best_score
         },
         status=status.HTTP_200_OK
@@ -341,15 +308,12 @@ def get_attempts_status(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    attempts_count = Attempt.objects.filter(
-        user=user, category=category, is_valid=True
-    ).count()
-    best_attempt = Attempt.objects.filter(
-        user=user, category=category, is_valid=True
-    ).order_by('-score').first()
+    best_attempt = get_best_attempt(user.id, category)
     if best_attempt:
+        attempts_count = best_attempt.attempts_count
         best_score = best_attempt.score
     else:
+        attempts_count = 0
         best_score = 0
     if attempts_count < 3:
         return Response(
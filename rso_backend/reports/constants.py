@@ -2,6 +2,83 @@
 # Spread shit data
 OPENXML_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
+# Потоковая выгрузка Excel
+TEMP_REPORTS_DIR = 'to_delete_content'
+EXPORT_ROWS_CHUNK_SIZE = 2000
+EXPORT_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+STREAMING_EXPORT_DATA_FUNCS = (
+    'get_users_registry_data',
+    'get_detachment_data',
+    'regions_users_data',
+    'safety_test_results',
+    'contact_data',
+    'competition_participants',
+)
+# Готовый файл выгрузки отдается на повторные запросы с теми же
+# параметрами в течение EXPORT_ARTIFACT_TTL секунд, а удаляется
+# из хранилища спустя EXPORT_ARTIFACT_RETENTION секунд после этого.
+EXPORT_ARTIFACT_TTL = 60 * 60
+EXPORT_ARTIFACT_RETENTION = 60 * 60 * 24
+# Максимум ключей в одном запросе DeleteObjects к S3
+EXPORT_DELETE_BATCH_SIZE = 1000
+# Сколько секунд выгрузка считается выполняющейся, если воркер
+# не снял отметку сам (например, упал)
+EXPORT_INFLIGHT_TIMEOUT = 60 * 60
+# Прогресс выгрузки обновляется каждые EXPORT_PROGRESS_STEP строк
+EXPORT_PROGRESS_STEP = 1000
+
+# Результаты конкурса
+COMPETITION_LAST_PLACE = 'Последнее место'
+# Участников каждой номинации на странице предпросмотра результатов
+COMPETITION_RESULTS_SAMPLE_SIZE = 10
+
+# Поле реестра участников -> обратная связь пользователя с членством в звене
+USERS_REGISTRY_POSITION_RELATIONS = {
+    'district_headquarter': 'userdistrictheadquarterposition',
+    'regional_headquarter': 'userregionalheadquarterposition',
+    'local_headquarter': 'userlocalheadquarterposition',
+    'educational_headquarter': 'usereducationalheadquarterposition',
+    'detachment': 'userdetachmentposition',
+}
+
+# Выгрузка реестра -> роль командира -> поле, по которому выборка
+# ограничивается штабом командира. Командиру ЦШ доступна вся выборка.
+REGISTRY_ROLE_LOOKUPS = {
+    'get_central_hq_data': {},
+    'get_district_hq_data': {
+        'district': 'id',
+    },
+    'get_regional_hq_data': {
+        'district': 'district_headquarter',
+        'regional': 'id',
+    },
+    'get_local_hq_data': {
+        'district': 'regional_headquarter__district_headquarter',
+        'regional': 'regional_headquarter',
+        'local': 'id',
+    },
+    'get_educational_hq_data': {
+        'district': 'regional_headquarter__district_headquarter',
+        'regional': 'regional_headquarter',
+        'local': 'local_headquarter',
+        'educational': 'id',
+    },
+    'get_detachment_data': {
+        'district': 'regional_headquarter__district_headquarter',
+        'regional': 'regional_headquarter',
+        'local': 'local_headquarter',
+        'educational': 'educational_headquarter',
+        'detachment': 'id',
+    },
+    'get_users_registry_data': {
+        'district': 'userdistrictheadquarterposition__headquarter',
+        'regional': 'userregionalheadquarterposition__headquarter',
+        'local': 'userlocalheadquarterposition__headquarter',
+        'educational': 'usereducationalheadquarterposition__headquarter',
+        'detachment': 'userdetachmentposition__headquarter',
+    },
+}
+
 # SQL Queries
 COMPETITION_PARTICIPANTS_CONTACT_DATA_QUERY = (
     """
@@ -0,0 +1,92 @@
+"""Жизненный цикл файлов выгрузок Excel.
+
+Каждый сформированный файл регистрируется в ExportArtifact с хэшем
+параметров выгрузки. Пока файл свежий, одинаковые запросы получают
+его вместо новой генерации. Файлы с истекшим сроком хранения удаляются
+пакетами: в S3 - запросами DeleteObjects, в локальном хранилище - по одному.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from reports.constants import (EXPORT_ARTIFACT_RETENTION, EXPORT_ARTIFACT_TTL,
+                               EXPORT_DELETE_BATCH_SIZE)
+from reports.models import ExportArtifact
+
+logger = logging.getLogger('tasks')
+
+
+def get_export_params_hash(headers, worksheet_title, data_func,
+                           fields=None, scope=None) -> str:
+    """Хэш параметров, определяющих содержимое выгрузки.
+
+    Имя файла в хэш не входит: в нем обычно время запроса.
+    """
+    params = json.dumps(
+        [headers, worksheet_title, data_func, fields, scope],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(params.encode()).hexdigest()
+
+
+def get_fresh_artifact(params_hash):
+    """Последний еще не устаревший файл выгрузки с такими параметрами."""
+    return ExportArtifact.objects.filter(
+        params_hash=params_hash, expires_at__gt=timezone.now()
+    ).order_by('-expires_at').first()
+
+
+def save_artifact(params_hash, data_func, file_path, task_id=None):
+    """Регистрирует сформированный файл выгрузки."""
+    expires_at = timezone.now() + timedelta(seconds=EXPORT_ARTIFACT_TTL)
+    return ExportArtifact.objects.create(
+        params_hash=params_hash,
+        data_func=data_func,
+        task_id=task_id,
+        file_path=file_path,
+        expires_at=expires_at,
+        delete_after=expires_at + timedelta(
+            seconds=EXPORT_ARTIFACT_RETENTION
+        )
+    )
+
+
+def delete_storage_files(file_paths, storage=default_storage):
+    """Удаляет файлы из хранилища.
+
+    У S3 (S3Boto3Storage) есть bucket: файлы удаляются запросами
+    DeleteObjects до EXPORT_DELETE_BATCH_SIZE ключей за раз.
+    """
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is None:
+        for file_path in file_paths:
+            storage.delete(file_path)
+        return
+    for start in range(0, len(file_paths), EXPORT_DELETE_BATCH_SIZE):
+        bucket.delete_objects(Delete={
+            'Objects': [
+                {'Key': storage._normalize_name(file_path)}
+                for file_path in file_paths[
+                    start:start + EXPORT_DELETE_BATCH_SIZE
+                ]
+            ],
+            'Quiet': True,
+        })
+
+
+def delete_expired_artifacts() -> int:
+    """Удаляет файлы и записи выгрузок с истекшим сроком хранения."""
+    expired = ExportArtifact.objects.filter(delete_after__lte=timezone.now())
+    artifacts = list(expired.values_list('id', 'file_path'))
+    if not artifacts:
+        return 0
+    delete_storage_files([file_path for _, file_path in artifacts])
+    ExportArtifact.objects.filter(
+        id__in=[artifact_id for artifact_id, _ in artifacts]
+    ).delete()
+    logger.info(f'Удалено устаревших файлов выгрузок: {len(artifacts)}')
+    return len(artifacts)
@@ -0,0 +1,36 @@
+"""Реестр выполняющихся выгрузок в Redis (кэш default).
+
+Одинаковые выгрузки (хэш параметров из export_artifacts) не ставятся
+в очередь повторно: первый запрос занимает ключ выгрузки id своей
+задачи, остальные до ее завершения получают этот же id.
+"""
+import uuid
+
+from django.core.cache import cache
+
+from reports.constants import EXPORT_INFLIGHT_TIMEOUT
+
+INFLIGHT_KEY = 'export_inflight:{params_hash}'
+
+
+def claim_export(params_hash):
+    """Занимает выгрузку. Возвращает (id задачи, нужно ли ее запускать).
+
+    Если такая выгрузка уже выполняется, возвращается id ее задачи.
+    """
+    key = INFLIGHT_KEY.format(params_hash=params_hash)
+    task_id = str(uuid.uuid4())
+    if cache.add(key, task_id, EXPORT_INFLIGHT_TIMEOUT):
+        return task_id, True
+    running_task_id = cache.get(key)
+    if running_task_id:
+        return running_task_id, False
+    cache.set(key, task_id, EXPORT_INFLIGHT_TIMEOUT)
+    return task_id, True
+
+
+def release_export(params_hash, task_id):
+    """Снимает отметку выгрузки, если она принадлежит задаче task_id."""
+    key = INFLIGHT_KEY.format(params_hash=params_hash)
+    if cache.get(key) == task_id:
+        cache.delete(key)
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('params_hash', models.CharField(max_length=64, verbose_name='Хэш параметров выгрузки')),
+                ('data_func', models.CharField(max_length=100, verbose_name='Источник данных')),
+                ('task_id', models.CharField(blank=True, db_index=True, max_length=255, null=True, verbose_name='ID задачи')),
+                ('file_path', models.CharField(max_length=500, verbose_name='Путь к файлу')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата формирования')),
+                ('expires_at', models.DateTimeField(verbose_name='Переиспользуется до')),
+                ('delete_after', models.DateTimeField(db_index=True, verbose_name='Удаляется после')),
+            ],
+            options={
+                'verbose_name': 'Файл выгрузки',
+                'verbose_name_plural': 'Файлы выгрузок',
+                'indexes': [models.Index(fields=['params_hash', 'expires_at'], name='export_artifact_fresh_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import models
+
+
+class ExportArtifact(models.Model):
+    """Файл выгрузки Excel, сформированный задачей generate_excel_file.
+
+    Повторный запрос выгрузки с теми же параметрами до expires_at
+    получает уже готовый файл. Файлы с истекшим сроком хранения
+    удаляются задачей delete_temp_reports_task.
+    """
+    params_hash = models.CharField(
+        max_length=64, verbose_name='Хэш параметров выгрузки'
+    )
+    data_func = models.CharField(
+        max_length=100, verbose_name='Источник данных'
+    )
+    task_id = models.CharField(
+        max_length=255, blank=True, null=True, db_index=True,
+        verbose_name='ID задачи'
+    )
+    file_path = models.CharField(
+        max_length=500, verbose_name='Путь к файлу'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата формирования'
+    )
+    expires_at = models.DateTimeField(
+        verbose_name='Переиспользуется до'
+    )
+    delete_after = models.DateTimeField(
+        db_index=True, verbose_name='Удаляется после'
+    )
+
+    def __str__(self):
+        return f'{self.data_func}: {self.file_path}'
+
+    class Meta:
+        verbose_name = 'Файл выгрузки'
+        verbose_name_plural = 'Файлы выгрузок'
+        indexes = [
+            models.Index(
+                fields=['params_hash', 'expires_at'],
+                name='export_artifact_fresh_idx'
+            ),
+        ]
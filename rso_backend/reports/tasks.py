@@ -1,14 +1,29 @@
 import logging
+import tempfile
 from io import BytesIO
+from itertools import chain
 
 from celery import shared_task
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from django.conf import settings
+from django.core.files import File
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
+from django.db.models import QuerySet
 from urllib.parse import unquote
 from openpyxl.styles import Alignment
 
+from headquarters.models import (CentralHeadquarter, Detachment,
+                                 DistrictHeadquarter, EducationalHeadquarter,
+                                 LocalHeadquarter, RegionalHeadquarter)
+from reports.constants import (EXPORT_PROGRESS_STEP, EXPORT_ROWS_CHUNK_SIZE,
+                               EXPORT_UPLOAD_CHUNK_SIZE,
+                               STREAMING_EXPORT_DATA_FUNCS, TEMP_REPORTS_DIR)
+from reports.export_artifacts import (delete_expired_artifacts,
+                                      get_export_params_hash, save_artifact)
+from reports.export_registry import release_export
 from reports.utils import (
     get_attributes_of_uniform_data, get_commander_school_data, get_detachment_q_results, get_membership_fee_data, get_regional_ranking_results,
     get_regions_users_data, get_safety_results,
@@ -17,45 +32,27 @@ from reports.utils import (
     get_q5_data, get_q6_data, get_q7_data, get_q8_data, get_q9_data, get_q10_data, get_q11_data, get_q12_data, get_q13_data, get_q14_data,
     get_q15_data, get_q16_data, get_q17_data,get_q18_data, get_q19_data, get_district_hq_data,
     get_regional_hq_data, get_detachment_data, get_educational_hq_data, get_local_hq_data, get_central_hq_data,
-    get_direction_data, get_users_registry_data, get_template_data
+    get_direction_data, get_users_registry_data, get_template_data,
+    filter_registry_queryset
 )
+from users.models import RSOUser
 
 
 logger = logging.getLogger('tasks')
 
 
-@shared_task
-def generate_excel_file(headers, worksheet_title, filename, data_func, fields=None):
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = worksheet_title
-    worksheet.append(headers)
-    
-    if fields and 'section_headers' in fields:
-        print(f"Processing section_headers: {fields['section_headers']}")
-        for section in fields['section_headers']:
-            text = section['text']
-            merge_cells = section['merge_cells']
-            worksheet.cell(row=merge_cells[0], column=merge_cells[1]).value = text
-            worksheet.merge_cells(
-                start_row=merge_cells[0],
-                start_column=merge_cells[1],
-                end_row=merge_cells[2],
-                end_column=merge_cells[3]
-            )
-            worksheet.cell(row=merge_cells[0], column=merge_cells[1]).alignment = Alignment(horizontal='center')
+def get_registry_queryset(model, data_func, scope):
+    return filter_registry_queryset(model.objects.all(), data_func, scope)
 
-    headers_row = fields.get('headers_row', 1) if fields else 1
-    
-    print(f"Headers: {headers}")
-    for col_idx, header in enumerate(headers, 1):
-        worksheet.cell(row=headers_row, column=col_idx).value = header
 
-    def default_process_row(index, row):
-        return [index] + list(row)
+def get_export_data(data_func, fields=None, scope=None):
+    """Возвращает источник строк для выгрузки по ключу data_func.
 
+    Источником может быть список, генератор или QuerySet.
+    Выгрузки реестра ограничиваются штабом из scope.
+    Для неизвестного ключа возвращает None.
+    """
     data = None
-    print('зашли в таску')
     match data_func:
         case 'safety_test_results':
             data = get_safety_results()
@@ -107,50 +104,197 @@ def generate_excel_file(headers, worksheet_title, filename, data_func, fields=No
             data = get_attributes_of_uniform_data(
                 competition_id=settings.COMPETITION_ID)
         case 'get_central_hq_data':
-            data = get_central_hq_data(fields)
+            data = get_central_hq_data(
+                get_registry_queryset(CentralHeadquarter, data_func, scope),
+                fields
+            )
         case 'get_district_hq_data':
-            data = get_district_hq_data(fields)
+            data = get_district_hq_data(
+                get_registry_queryset(DistrictHeadquarter, data_func, scope),
+                fields
+            )
         case'get_regional_hq_data':
-            data = get_regional_hq_data(fields)
+            data = get_regional_hq_data(
+                get_registry_queryset(RegionalHeadquarter, data_func, scope),
+                fields
+            )
         case 'get_educational_hq_data':
-            data = get_educational_hq_data(fields)
+            data = get_educational_hq_data(
+                get_registry_queryset(EducationalHeadquarter, data_func, scope),
+                fields
+            )
         case 'get_local_hq_data':
-            data = get_local_hq_data(fields)
+            data = get_local_hq_data(
+                get_registry_queryset(LocalHeadquarter, data_func, scope),
+                fields
+            )
         case 'get_detachment_data':
-            data = get_detachment_data(fields)
+            data = get_detachment_data(
+                get_registry_queryset(Detachment, data_func, scope),
+                fields
+            )
         case 'get_direction_data':
-            data = get_direction_data(fields)
+            data = get_direction_data(None, fields)
         case 'get_users_registry_data':
-            data = get_users_registry_data(fields)
+            data = get_users_registry_data(
+                get_registry_queryset(RSOUser, data_func, scope),
+                fields
+            )
         case 'get_regional_ranking':
-            print('смэтчились')
             data = get_regional_ranking_results()
         case 'get_template_data':
             data = get_template_data()
         case _:
             logger.error(f"Неизвестное значение data_func: {data_func}")
-            return
-    if not data:
-        logger.warning(
-            'Вызов функции не соответствующей кейсу для вызова функции с data')
-        return
-    # logger.info('Формируем файл с данными')
-    for index, row in enumerate(data, start=1):
-        processed_row = default_process_row(index, row)
-        worksheet.append(processed_row)
+            return None
+    return data
+
+
+def get_export_total(data):
+    """Число строк выгрузки, если его можно узнать, не читая строки."""
+    if isinstance(data, QuerySet):
+        return data.count()
+    if hasattr(data, '__len__'):
+        return len(data)
+    return None
+
+
+def iter_export_rows(data):
+    """Итерирует строки выгрузки, не загружая QuerySet в память целиком."""
+    if isinstance(data, QuerySet):
+        return data.iterator(chunk_size=EXPORT_ROWS_CHUNK_SIZE)
+    return iter(data)
+
+
+def save_excel_file(headers, worksheet_title, file_path, rows, fields=None):
+    """Собирает книгу в памяти и сохраняет её в default_storage."""
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = worksheet_title
+    worksheet.append(headers)
+
+    if fields and 'section_headers' in fields:
+        for section in fields['section_headers']:
+            text = section['text']
+            merge_cells = section['merge_cells']
+            worksheet.cell(row=merge_cells[0], column=merge_cells[1]).value = text
+            worksheet.merge_cells(
+                start_row=merge_cells[0],
+                start_column=merge_cells[1],
+                end_row=merge_cells[2],
+                end_column=merge_cells[3]
+            )
+            worksheet.cell(row=merge_cells[0], column=merge_cells[1]).alignment = Alignment(horizontal='center')
+
+    headers_row = fields.get('headers_row', 1) if fields else 1
+
+    for col_idx, header in enumerate(headers, 1):
+        worksheet.cell(row=headers_row, column=col_idx).value = header
+
+    for index, row in enumerate(rows, start=1):
+        worksheet.append([index] + list(row))
 
     file_content = BytesIO()
     workbook.save(file_content)
     file_content.seek(0)
-    decoded_filename = unquote(filename)
 
     content = ContentFile(file_content.read())
-    file_path = default_storage.save(f'to_delete_content/{decoded_filename}', content)
-    # logger.info('Возврат эксель файла')
-    return file_path
+    return default_storage.save(file_path, content)
+
+
+def save_streaming_excel_file(headers, worksheet_title, file_path, rows, fields=None):
+    """Потоково пишет книгу во временный файл и загружает его частями.
+
+    Книга создаётся в режиме write-only: строки сразу сбрасываются на диск,
+    поэтому потребление памяти не зависит от количества строк в выгрузке.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(worksheet_title)
+
+    headers_row = fields.get('headers_row', 1) if fields else 1
+    section_cells = {}
+    if fields and 'section_headers' in fields:
+        for section in fields['section_headers']:
+            start_row, start_column, end_row, end_column = section['merge_cells']
+            section_cells[(start_row, start_column)] = section['text']
+            worksheet.merged_cells.add(
+                f'{get_column_letter(start_column)}{start_row}:'
+                f'{get_column_letter(end_column)}{end_row}'
+            )
+
+    for row_idx in range(1, headers_row):
+        header_cells = []
+        max_column = max(
+            [column for row, column in section_cells if row == row_idx],
+            default=0
+        )
+        for col_idx in range(1, max_column + 1):
+            cell = WriteOnlyCell(worksheet, value=section_cells.get((row_idx, col_idx)))
+            if (row_idx, col_idx) in section_cells:
+                cell.alignment = Alignment(horizontal='center')
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+    worksheet.append(headers)
+
+    for index, row in enumerate(rows, start=1):
+        worksheet.append([index] + list(row))
+
+    with tempfile.TemporaryFile() as tmp_file:
+        workbook.save(tmp_file)
+        tmp_file.seek(0)
+        content = File(tmp_file, name=file_path)
+        content.DEFAULT_CHUNK_SIZE = EXPORT_UPLOAD_CHUNK_SIZE
+        return default_storage.save(file_path, content)
+
+
+def iter_with_progress(task, rows, total):
+    """Отдает строки, сообщая прогресс задачи каждые EXPORT_PROGRESS_STEP."""
+    for rows_done, row in enumerate(rows, start=1):
+        if rows_done % EXPORT_PROGRESS_STEP == 0:
+            task.update_state(state='PROGRESS', meta={
+                'rows_done': rows_done, 'rows_total': total
+            })
+        yield row
+
+
+@shared_task(bind=True)
+def generate_excel_file(self, headers, worksheet_title, filename, data_func,
+                        fields=None, scope=None, params_hash=None):
+    params_hash = params_hash or get_export_params_hash(
+        headers, worksheet_title, data_func, fields, scope
+    )
+    try:
+        data = get_export_data(data_func, fields, scope)
+        if data is None:
+            return
+
+        total = get_export_total(data)
+        rows = iter_export_rows(data)
+        first_row = next(rows, None)
+        if first_row is None:
+            logger.warning(
+                'Вызов функции не соответствующей кейсу для вызова функции с data')
+            return
+        rows = chain((first_row,), rows)
+        if self.request.id:
+            rows = iter_with_progress(self, rows, total)
+
+        decoded_filename = unquote(filename)
+        file_path = f'{TEMP_REPORTS_DIR}/{decoded_filename}'
+        if data_func in STREAMING_EXPORT_DATA_FUNCS:
+            file_path = save_streaming_excel_file(headers, worksheet_title, file_path, rows, fields)
+        else:
+            file_path = save_excel_file(headers, worksheet_title, file_path, rows, fields)
+        save_artifact(
+            params_hash, data_func, file_path, task_id=self.request.id
+        )
+        return file_path
+    finally:
+        if self.request.id:
+            release_export(params_hash, self.request.id)
 
 
 @shared_task
 def delete_temp_reports_task():
-    for file_name in default_storage.listdir('to_delete_content')[1]:
-        default_storage.delete(f'to_delete_content/{file_name}')
+    """Удаляет файлы выгрузок с истекшим сроком хранения."""
+    return delete_expired_artifacts()
@@ -4,16 +4,16 @@ from urllib.parse import urljoin
 
 from datetime import datetime
 from django.db import connection, models
-from django.db.models import Count, Q, Case, When, Value, Max
+from django.db.models import Count, Exists, OuterRef, Q, Case, When, Value, Max
 from django.conf import settings
 
 from collections import defaultdict
+from itertools import chain, islice
 from typing import List, Tuple
 
 from api.utils import get_user_detachment, get_user_detachment_position
-from competitions.constants import SOLO_RANKING_MODELS, TANDEM_RANKING_MODELS
-from competitions.models import (CompetitionParticipants, OverallRanking,
-                                 OverallTandemRanking, Q5DetachmentReport, Q5EducatedParticipant, Q5TandemRanking, Q5Ranking,
+from competitions.models import (CompetitionParticipants, CompetitionResult,
+                                 Q5DetachmentReport, Q5EducatedParticipant, Q5TandemRanking, Q5Ranking,
                                  Q6DetachmentReport, Q6TandemRanking, Q6Ranking, September15Participant,
                                  SpartakiadBlock, DemonstrationBlock, PatrioticActionBlock,
                                  SafetyWorkWeekBlock, CommanderCommissionerSchoolBlock,
@@ -27,12 +27,16 @@ from competitions.models import (CompetitionParticipants, OverallRanking,
                                  Q18TandemRanking, Q18Ranking, Q18DetachmentReport,
                                  Q13TandemRanking, Q13Ranking, Q13DetachmentReport,
                                  Q13EventOrganization, Q14DetachmentReport, Q14LaborProject, Q14Ranking, Q14TandemRanking, Q19Ranking, Q19Report, Q19TandemRanking, LinksQ8)
-from headquarters.count_hq_members import count_headquarter_participants, count_verified_users, count_membership_fee,count_test_membership, count_events_organizations, count_events_participants, get_hq_participants_15_september, get_hq_members_15_september
-from headquarters.models import UserDetachmentPosition, Detachment, CentralHeadquarter, DistrictHeadquarter, RegionalHeadquarter, LocalHeadquarter, EducationalHeadquarter, Area, UserDistrictHeadquarterPosition, UserLocalHeadquarterPosition, UserEducationalHeadquarterPosition, UserRegionalHeadquarterPosition, UserUnitPosition
-from questions.models import Attempt
+from headquarters.count_hq_members import count_headquarters_stats
+from headquarters.models import UserDetachmentPosition, Detachment, CentralHeadquarter, DistrictHeadquarter, RegionalHeadquarter, LocalHeadquarter, EducationalHeadquarter, Area, UserUnitPosition
+from questions.models import Attempt, UserBestAttempt
 from regional_competitions.models import RVerificationLog, Ranking, RegionalR16
 from users.models import RSOUser, UserRegion
-from reports.constants import COMPETITION_PARTICIPANTS_CONTACT_DATA_QUERY
+from reports.constants import (COMPETITION_LAST_PLACE,
+                               COMPETITION_PARTICIPANTS_CONTACT_DATA_QUERY,
+                               COMPETITION_RESULTS_SAMPLE_SIZE,
+                               EXPORT_ROWS_CHUNK_SIZE, REGISTRY_ROLE_LOOKUPS,
+                               USERS_REGISTRY_POSITION_RELATIONS)
 from events.models import Event, EventParticipants
 
 
@@ -80,113 +84,53 @@ def get_competition_users(
     return competition_members_data
 
 
-def get_detachment_q_results(competition_id: int, is_sample=False) -> List[Detachment]:
-    competition_members_data = []
-    if is_sample:
-        junior_detachments_queryset = CompetitionParticipants.objects.filter(
-                junior_detachment__isnull=False,
-                detachment__isnull=True,
-                competition_id=competition_id,
-                confirmed=True
-        )[:10]
+def get_competition_results(competition_id, nomination, limit=None):
+    """Строки среза результатов конкурса в порядке выгрузки."""
+    queryset = CompetitionResult.objects.filter(
+        competition_id=competition_id, nomination=nomination
+    ).order_by('position')
+    return queryset[:limit] if limit else queryset
+
+
+def get_missing_overall_place(competition_id, nomination):
+    """Место для участника без итогового места: последнее занятое место."""
+    last_place = CompetitionResult.objects.filter(
+        competition_id=competition_id, nomination=nomination
+    ).aggregate(Max('overall_place'))['overall_place__max']
+    return last_place if last_place is not None else COMPETITION_LAST_PLACE
+
+
+def present_competition_result(result, missing_overall_place=COMPETITION_LAST_PLACE):
+    """Дополняет строку среза полями, которые ждет шаблон результатов."""
+    result.region = result.region_name
+    result.name = result.detachment_name
+    if result.overall_place is None:
+        result.overall_ranking = missing_overall_place
+        result.places_sum = missing_overall_place
     else:
-        junior_detachments_queryset = CompetitionParticipants.objects.filter(
-            junior_detachment__isnull=False,
-            detachment__isnull=True,
-            competition_id=competition_id,
-            confirmed=True
-        )
-    for participant_entry in junior_detachments_queryset:
-        detachment = participant_entry.junior_detachment
-        detachment.participants_count = get_hq_participants_15_september(detachment)
-        detachment.members_count = get_hq_members_15_september(detachment)
-        detachment.status = 'Младший отряд'
-        detachment.nomination = 'Дебют'
-        detachment.area_name = detachment.area.name
-        detachment.places = []
-        try:
-            detachment.overall_ranking = OverallRanking.objects.get(
-                detachment=detachment, competition_id=competition_id
-            ).place
-            detachment.places_sum = OverallRanking.objects.get(
-                detachment=detachment, competition_id=competition_id
-            ).places_sum
-        except OverallRanking.DoesNotExist:
-            detachment.overall_ranking = 'Последнее место'
-            detachment.places_sum = 'Последнее место'
-        for q_ranking in SOLO_RANKING_MODELS:
-            try:
-                detachment.places.append(q_ranking.objects.get(
-                    detachment=detachment, competition_id=competition_id
-                ).place)
-            except q_ranking.DoesNotExist:
-                detachment.places.append('Последнее место')
-        competition_members_data.append(detachment)
+        result.overall_ranking = result.overall_place
+    result.places = [
+        place if place is not None else COMPETITION_LAST_PLACE
+        for place in result.places
+    ]
+    return result
+
+
+def get_detachment_q_results(competition_id: int, is_sample=False):
     if is_sample:
-        tandem_queryset = CompetitionParticipants.objects.filter(
-            junior_detachment__isnull=False,
-            detachment__isnull=False,
-            competition_id=competition_id,
-            confirmed=True
-        )[:10]
-    else:
-        tandem_queryset = CompetitionParticipants.objects.filter(
-            junior_detachment__isnull=False,
-            detachment__isnull=False,
-            competition_id=competition_id,
-            confirmed=True
+        results = chain(
+            get_competition_results(
+                competition_id, 'Дебют', COMPETITION_RESULTS_SAMPLE_SIZE
+            ),
+            get_competition_results(
+                competition_id, 'Тандем', COMPETITION_RESULTS_SAMPLE_SIZE * 2
+            )
         )
-    for participant_entry in tandem_queryset:
-        junior_detachment = participant_entry.junior_detachment
-        junior_detachment.participants_count = get_hq_participants_15_september(junior_detachment)
-        junior_detachment.members_count = get_hq_members_15_september(junior_detachment)
-        junior_detachment.status = 'Младший отряд'
-        junior_detachment.nomination = 'Тандем'
-        junior_detachment.area_name = junior_detachment.area.name
-        junior_detachment.places = []
-        detachment = participant_entry.detachment
-        detachment.participants_count = get_hq_participants_15_september(detachment)
-        detachment.members_count = get_hq_members_15_september(detachment)
-        detachment.status = 'Наставник'
-        detachment.nomination = 'Тандем'
-        detachment.area_name = detachment.area.name
-        detachment.places = []
-        try:
-            overall_ranking = OverallTandemRanking.objects.get(
-                detachment=detachment,
-                junior_detachment=junior_detachment,
-                competition_id=competition_id
-            ).place
-            places_sum = OverallTandemRanking.objects.get(
-                detachment=detachment,
-                junior_detachment=junior_detachment,
-                competition_id=competition_id
-            ).places_sum
-        except OverallTandemRanking.DoesNotExist:
-            overall_ranking = 'Последнее место'
-            places_sum = 'Последнее место'
-        detachment.overall_ranking = overall_ranking
-        detachment.places_sum = places_sum
-        junior_detachment.overall_ranking = overall_ranking
-        junior_detachment.places_sum = places_sum
-        for q_ranking in TANDEM_RANKING_MODELS:
-            try:
-                place = q_ranking.objects.get(
-                    junior_detachment=junior_detachment,
-                    detachment=detachment,
-                    competition_id=competition_id
-                ).place
-            except q_ranking.DoesNotExist:
-                place = 'Последнее место'
-            detachment.places.append(place)
-            junior_detachment.places.append(place)
-        competition_members_data.append(detachment)
-        competition_members_data.append(junior_detachment)
-    data = []
-    for row in competition_members_data:
-        data.append((
-            row.region.name,
-            row.name,
+        return [present_competition_result(result) for result in results]
+    return (
+        (
+            row.region_name,
+            row.detachment_name,
             row.status,
             row.nomination,
             row.area_name,
@@ -195,70 +139,52 @@ def get_detachment_q_results(competition_id: int, is_sample=False) -> List[Detac
             row.overall_ranking,
             row.places_sum,
             *row.places,
-        ))
-    return competition_members_data if is_sample else data
+        )
+        for row in map(
+            present_competition_result,
+            CompetitionResult.objects.filter(
+                competition_id=competition_id
+            ).order_by('position').iterator(chunk_size=EXPORT_ROWS_CHUNK_SIZE)
+        )
+    )
 
 
-def adapt_attempts(results: List[Attempt]) -> list:
+def iter_adapted_attempts(results):
+    """Нумерует попытки пользователей и дополняет их данными об отряде."""
     user_attempts = defaultdict(int)
-    enumerated_results = []
 
     for result in results:
         user_attempts[result.user_id] += 1
         result.attempt_number = user_attempts[result.user_id]
         result.detachment = get_user_detachment(result.user)
         result.detachment_position = get_user_detachment_position(result.user)
-        enumerated_results.append(result)
+        yield result
 
-    return enumerated_results
 
+def adapt_attempts(results: List[Attempt]) -> list:
+    return list(iter_adapted_attempts(results))
 
-def get_safety_results():
 
+def get_safety_results():
+    """Построчно отдает результаты теста по безопасности для выгрузки."""
     results = Attempt.objects.filter(
         category=Attempt.Category.SAFETY, is_valid=True, score__gt=0
-    ).order_by('-timestamp', 'user')
+    ).select_related('user__region').order_by('-timestamp', 'user')
 
     sep_15_data = {item[0]: item[1] for item in September15Participant.objects.all().values_list('detachment__name', 'members_number')}
 
-    if not results:
-        return []
-
-    results = adapt_attempts(results)
-
-    prepared_data = []
-    for row in results:
+    for row in iter_adapted_attempts(
+        results.iterator(chunk_size=EXPORT_ROWS_CHUNK_SIZE)
+    ):
         timestamp = row.timestamp
-
-        if timestamp is None:
-            try:
-                prepared_data.append((
-                    row.user.region.name if row.user.region else '-',
-                    row.user.last_name,
-                    row.user.first_name,
-                    row.user.patronymic_name if hasattr(row, 'patronymic_name') and row.patronymic_name else '-',
-                    row.detachment if row.detachment else '-',
-                    row.detachment.area.name if hasattr(row.detachment, 'area') and row.detachment.area else '-',
-                    row.detachment_position if row.detachment_position else '-',
-                    row.attempt_number,
-                    row.is_valid,
-                    row.score,
-                    None,
-                    row.user.membership_fee,
-                    sep_15_data.get(row.detachment) if row.detachment else '-',
-                ))
-            except Exception:
-                pass
-            continue  # Пропустить оставшуюся часть цикла для этой строки
-
         try:
-            if timestamp.tzinfo is not None:
+            if timestamp is not None and timestamp.tzinfo is not None:
                 timestamp = timestamp.replace(tzinfo=None)
         except Exception:
             pass
 
         try:
-            prepared_data.append((
+            prepared_row = (
                 row.user.region.name if row.user.region else '-',
                 row.user.last_name,
                 row.user.first_name,
@@ -272,41 +198,47 @@ def get_safety_results():
                 timestamp,
                 row.user.membership_fee,
                 sep_15_data.get(row.detachment) if row.detachment else '-',
-            ))
+            )
         except Exception:
-            pass
-
-    return prepared_data
+            continue
+        yield prepared_row
 
 
 def get_competition_participants_data():
-    competition_participants = CompetitionParticipants.objects.all()
-    competition_members_data = get_competition_users(list(competition_participants))
+    """Построчно отдает участников конкурса, отряд за отрядом."""
+    competition_participants = CompetitionParticipants.objects.select_related(
+        'detachment__region', 'detachment__area',
+        'junior_detachment__region', 'junior_detachment__area'
+    )
 
-    rows = []
-    for detachment, users in competition_members_data:
-        for user in users:
-            row = (
-                detachment.region.name if detachment.region else '-',
-                detachment.area.name if detachment.area else '-',
-                f'{user.last_name} {user.first_name} '
-                f'{user.patronymic_name if user.patronymic_name else "(без отчества)"}',
-                detachment.name if detachment else '-',
-                detachment.status if detachment else '-',
-                detachment.nomination if detachment else '-',
-                user.position if user.position else '-',
-                'Да' if user.is_verified else 'Нет',
-                'Да' if user.membership_fee else 'Нет',
-            )
-            rows.append(row)
-    return rows
+    for participant_entry in competition_participants.iterator(
+        chunk_size=EXPORT_ROWS_CHUNK_SIZE
+    ):
+        for detachment, users in get_competition_users([participant_entry]):
+            for user in users:
+                yield (
+                    detachment.region.name if detachment.region else '-',
+                    detachment.area.name if detachment.area else '-',
+                    f'{user.last_name} {user.first_name} '
+                    f'{user.patronymic_name if user.patronymic_name else "(без отчества)"}',
+                    detachment.name if detachment else '-',
+                    detachment.status if detachment else '-',
+                    detachment.nomination if detachment else '-',
+                    user.position if user.position else '-',
+                    'Да' if user.is_verified else 'Нет',
+                    'Да' if user.membership_fee else 'Нет',
+                )
 
 
 def get_competition_participants_contact_data():
+    """Построчно отдает контакты участников, читая курсор порциями."""
     with connection.cursor() as cursor:
         cursor.execute(COMPETITION_PARTICIPANTS_CONTACT_DATA_QUERY)
-        rows = cursor.fetchall()
-        return rows
+        while True:
+            rows = cursor.fetchmany(EXPORT_ROWS_CHUNK_SIZE)
+            if not rows:
+                break
+            yield from rows
 
 
 def get_regions_users_data():
@@ -1797,6 +1729,33 @@ def get_attributes_of_uniform_data(competition_id):
     return rows
 
 
+def append_hq_stats_columns(row, stats, fields):
+    """Дописывает в строку реестра колонки численности и мероприятий."""
+    participants_count = stats['participants']
+    row.append(participants_count if 'participants_count' in fields else '-')
+    for field, key in (
+        ('verification_percent', 'verified'),
+        ('membership_fee_percent', 'membership_fee'),
+        ('test_done_percent', 'test_done'),
+    ):
+        if field in fields:
+            row.append(stats[key] / participants_count * 100)
+        else:
+            row.append('-')
+    for field in ('events_organizations', 'event_participants'):
+        row.append(stats[field] if field in fields else '-')
+    return row
+
+
+def iter_with_hq_stats(queryset):
+    """Отдает штабы вместе с показателями, считая их порциями."""
+    headquarters = queryset.iterator(chunk_size=EXPORT_ROWS_CHUNK_SIZE)
+    while chunk := list(islice(headquarters, EXPORT_ROWS_CHUNK_SIZE)):
+        stats = count_headquarters_stats(chunk)
+        for headquarter in chunk:
+            yield headquarter, stats[headquarter.id]
+
+
 def get_central_hq_data(queryset, fields):
     if not fields:
         fields = [
@@ -1809,65 +1768,29 @@ def get_central_hq_data(queryset, fields):
 
     rows = []
 
+    stats = count_headquarters_stats(queryset)
+
     try:
         for central_headquarter in queryset:
             row = [central_headquarter.name]
     
             if 'regional_headquarters' in fields:
-                row.append(RegionalHeadquarter.objects.filter(
-                    district_headquarter__central_headquarter=central_headquarter
-                ).count() or 0)
+                row.append(stats[central_headquarter.id]['regional_headquarters'])
             else:
                 row.append('-')               
             if 'local_headquarters' in fields:
-                row.append(LocalHeadquarter.objects.filter(
-                    regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-                ).count() or 0)
+                row.append(stats[central_headquarter.id]['local_headquarters'])
             else:
                 row.append('-')
             if 'educational_headquarters' in fields:
-                row.append(EducationalHeadquarter.objects.filter(
-                    regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-                ).count() or 0)
+                row.append(stats[central_headquarter.id]['educational_headquarters'])
             else:
                 row.append('-')               
             if 'detachments' in fields:
-                row.append(Detachment.objects.filter(
-                    regional_headquarter__district_headquarter__central_headquarter=central_headquarter
-                ).count() or 0)
+                row.append(stats[central_headquarter.id]['detachments'])
             else:
                 row.append('-')                
-            if 'participants_count' in fields:
-                participants_count = count_headquarter_participants(central_headquarter) or 0
-                row.append(participants_count)
-            else:
-                row.append('-')   
-            if any(f in fields for f in ['verification_percent', 'membership_fee_percent', 'test_done_percent']):
-                if participants_count > 0:
-                    if 'verification_percent' in fields:
-                        row.append(count_verified_users(central_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'membership_fee_percent' in fields:
-                        row.append(count_membership_fee(central_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'test_done_percent' in fields:
-                        row.append(count_test_membership(central_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                else:
-                    row += ['-'] * 3
-            else:
-                row += ['-'] * 3  
-            if 'events_organizations' in fields:
-                row.append(count_events_organizations(central_headquarter) or 0)
-            else:
-                row.append('-')                
-            if 'event_participants' in fields:
-                row.append(count_events_participants(central_headquarter) or 0)
-            else:
-                row.append('-')
+            append_hq_stats_columns(row, stats[central_headquarter.id], fields)
 
             rows.append(row)
 
@@ -1890,64 +1813,28 @@ def get_district_hq_data(queryset, fields):
 
     rows = []
 
+    stats = count_headquarters_stats(queryset)
+
     try:
         for district_headquarter in queryset:
             row = [district_headquarter.name]
             if 'regional_headquarters' in fields:
-                row.append(RegionalHeadquarter.objects.filter(
-                    district_headquarter=district_headquarter
-                ).count() or 0)
+                row.append(stats[district_headquarter.id]['regional_headquarters'])
             else:
                 row.append('-')
             if 'local_headquarters' in fields:
-                row.append(LocalHeadquarter.objects.filter(
-                    regional_headquarter__district_headquarter=district_headquarter
-                ).count() or 0)
+                row.append(stats[district_headquarter.id]['local_headquarters'])
             else:
                 row.append('-')
             if 'educational_headquarters' in fields:
-                row.append(EducationalHeadquarter.objects.filter(
-                    regional_headquarter__district_headquarter=district_headquarter
-                ).count() or 0)
+                row.append(stats[district_headquarter.id]['educational_headquarters'])
             else:
                 row.append('-')
             if 'detachments' in fields:
-                row.append(Detachment.objects.filter(
-                    regional_headquarter__district_headquarter=district_headquarter
-                ).count() or 0)
-            else:
-                row.append('-')
-            if 'participants_count' in fields:
-                participants_count = count_headquarter_participants(district_headquarter) or 0
-                row.append(participants_count)
-            else:
-                row.append('-')
-            if any(f in fields for f in ['verification_percent', 'membership_fee_percent', 'test_done_percent']):
-                if participants_count > 0:
-                    if 'verification_percent' in fields:
-                        row.append(count_verified_users(district_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'membership_fee_percent' in fields:
-                        row.append(count_membership_fee(district_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'test_done_percent' in fields:
-                        row.append(count_test_membership(district_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                else:
-                    row += ['-'] * 3
-            else:
-                row += ['-'] * 3
-            if 'events_organizations' in fields:
-                row.append(count_events_organizations(district_headquarter) or 0)
-            else:
-                row.append('-')
-            if 'event_participants' in fields:
-                row.append(count_events_participants(district_headquarter) or 0)
+                row.append(stats[district_headquarter.id]['detachments'])
             else:
                 row.append('-')
+            append_hq_stats_columns(row, stats[district_headquarter.id], fields)
 
             rows.append(row)
 
@@ -1969,6 +1856,8 @@ def get_regional_hq_data(queryset, fields):
         
     rows = []
 
+    stats = count_headquarters_stats(queryset)
+
     try:
         for regional_headquarter in queryset:
             row = [regional_headquarter.name]
@@ -1981,54 +1870,18 @@ def get_regional_hq_data(queryset, fields):
             else:
                 row.append('-')
             if 'local_headquarters' in fields:
-                row.append(LocalHeadquarter.objects.filter(
-                    regional_headquarter=regional_headquarter
-                ).count() or 0)
+                row.append(stats[regional_headquarter.id]['local_headquarters'])
             else:
                 row.append('-')
             if 'educational_headquarters' in fields:
-                row.append(EducationalHeadquarter.objects.filter(
-                    regional_headquarter=regional_headquarter
-                ).count() or 0)
+                row.append(stats[regional_headquarter.id]['educational_headquarters'])
             else:
                 row.append('-')
             if 'detachments' in fields:
-                row.append(Detachment.objects.filter(
-                    regional_headquarter=regional_headquarter
-                ).count() or 0)
-            else:
-                row.append('-')
-            if 'participants_count' in fields:
-                participants_count = count_headquarter_participants(regional_headquarter) or 0
-                row.append(participants_count)
-            else:
-                row.append('-')
-            if any(f in fields for f in ['verification_percent', 'membership_fee_percent', 'test_done_percent']):
-                if participants_count > 0:
-                    if 'verification_percent' in fields:
-                        row.append(count_verified_users(regional_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'membership_fee_percent' in fields:
-                        row.append(count_membership_fee(regional_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'test_done_percent' in fields:
-                        row.append(count_test_membership(regional_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                else:
-                    row += ['-'] * 3
-            else:
-                row += ['-'] * 3
-            if 'events_organizations' in fields:
-                row.append(count_events_organizations(regional_headquarter) or 0)
-            else:
-                row.append('-')
-            if 'event_participants' in fields:
-                row.append(count_events_participants(regional_headquarter) or 0)
+                row.append(stats[regional_headquarter.id]['detachments'])
             else:
                 row.append('-')
+            append_hq_stats_columns(row, stats[regional_headquarter.id], fields)
 
             rows.append(row)
 
@@ -2050,6 +1903,8 @@ def get_local_hq_data(queryset, fields):
 
     rows = []
 
+    stats = count_headquarters_stats(queryset)
+
     try:
         for local_headquarter in queryset:
             row = [local_headquarter.name]
@@ -2064,48 +1919,14 @@ def get_local_hq_data(queryset, fields):
             else:
                 row.append('-')
             if 'educational_headquarters' in fields:
-                row.append(EducationalHeadquarter.objects.filter(
-                    local_headquarter=local_headquarter
-                ).count() or 0)
+                row.append(stats[local_headquarter.id]['educational_headquarters'])
             else:
                 row.append('-')
             if 'detachments' in fields:
-                row.append(Detachment.objects.filter(
-                    local_headquarter=local_headquarter
-                ).count() or 0)
-            else:
-                row.append('-')
-            if 'participants_count' in fields:
-                participants_count = count_headquarter_participants(local_headquarter) or 0
-                row.append(participants_count)
-            else:
-                row.append('-')
-            if any(f in fields for f in ['verification_percent', 'membership_fee_percent', 'test_done_percent']):
-                if participants_count > 0:
-                    if 'verification_percent' in fields:
-                        row.append(count_verified_users(local_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'membership_fee_percent' in fields:
-                        row.append(count_membership_fee(local_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'test_done_percent' in fields:
-                        row.append(count_test_membership(local_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                else:
-                    row += ['-'] * 3
-            else:
-                row += ['-'] * 3
-            if 'events_organizations' in fields:
-                row.append(count_events_organizations(local_headquarter) or 0)
-            else:
-                row.append('-')
-            if 'event_participants' in fields:
-                row.append(count_events_participants(local_headquarter) or 0)
+                row.append(stats[local_headquarter.id]['detachments'])
             else:
                 row.append('-')
+            append_hq_stats_columns(row, stats[local_headquarter.id], fields)
 
             rows.append(row)
 
@@ -2128,6 +1949,8 @@ def get_educational_hq_data(queryset, fields):
     
     rows = []
 
+    stats = count_headquarters_stats(queryset)
+
     try:
         for educational_headquarter in queryset:
             row = [educational_headquarter.name]
@@ -2147,42 +1970,10 @@ def get_educational_hq_data(queryset, fields):
             else:
                 row.append('-')
             if 'detachments' in fields:
-                row.append(Detachment.objects.filter(
-                    educational_headquarter=educational_headquarter
-                ).count() or 0)
-            else:
-                row.append('-')
-            if 'participants_count' in fields:
-                participants_count = count_headquarter_participants(educational_headquarter) or 0
-                row.append(participants_count)
-            else:
-                row.append('-')
-            if any(f in fields for f in ['verification_percent', 'membership_fee_percent', 'test_done_percent']):
-                if participants_count > 0:
-                    if 'verification_percent' in fields:
-                        row.append(count_verified_users(educational_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'membership_fee_percent' in fields:
-                        row.append(count_membership_fee(educational_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                    if 'test_done_percent' in fields:
-                        row.append(count_test_membership(educational_headquarter) / participants_count * 100)
-                    else:
-                        row.append('-')
-                else:
-                    row += ['-'] * 3
-            else:
-                row += ['-'] * 3
-            if 'events_organizations' in fields:
-                row.append(count_events_organizations(educational_headquarter) or 0)
-            else:
-                row.append('-')
-            if 'event_participants' in fields:
-                row.append(count_events_participants(educational_headquarter) or 0)
+                row.append(stats[educational_headquarter.id]['detachments'])
             else:
                 row.append('-')
+            append_hq_stats_columns(row, stats[educational_headquarter.id], fields)
 
             rows.append(row)
 
@@ -2193,6 +1984,7 @@ def get_educational_hq_data(queryset, fields):
 
 
 def get_detachment_data(queryset, fields):
+    """Построчно отдает данные реестра ЛСО для потоковой выгрузки."""
     if not fields:
         fields = [
             'district_headquarter', 'regional_headquarter',
@@ -2203,10 +1995,15 @@ def get_detachment_data(queryset, fields):
             'events_organizations', 'event_participants'
                 ]
     
-    rows = []
+    queryset = queryset.select_related(
+        'regional_headquarter__district_headquarter',
+        'local_headquarter',
+        'educational_headquarter',
+        'area',
+    )
 
     try:
-        for detachment in queryset:
+        for detachment, stats in iter_with_hq_stats(queryset):
             row = [detachment.name]
             if 'district_headquarter' in fields:
                 if detachment.regional_headquarter:
@@ -2238,51 +2035,13 @@ def get_detachment_data(queryset, fields):
                     row.append('-')
             else:
                 row.append('-')
-            if 'participants_count' in fields:
-                participants_count = count_headquarter_participants(detachment) or 0
-                row.append(participants_count)
-            else:
-                row.append('-')
-            if any(f in fields for f in ['verification_percent', 'membership_fee_percent', 'test_done_percent']):
-                participants_count = count_headquarter_participants(detachment)
-                if participants_count > 0:
-                    if 'verification_percent' in fields:
-                        verification_percent = (count_verified_users(detachment) / participants_count * 100) or 0
-                        row.append(verification_percent)
-                    else:
-                        row.append('-')
-                    if 'membership_fee_percent' in fields:
-                        membership_fee_percent = (count_membership_fee(detachment) / participants_count * 100) or 0
-                        row.append(membership_fee_percent)
-                    else:
-                        row.append('-')
-                    if 'test_done_percent' in fields:
-                        test_done_percent = (count_test_membership(detachment) / participants_count * 100) or 0
-                        row.append(test_done_percent)
-                    else:
-                        row.append('-')
-                else:
-                    row += ['-' if f in fields else 0 for f in ['verification_percent', 'membership_fee_percent', 'test_done_percent']]
-            else:
-                row += ['-'] * 3
-            if 'events_organizations' in fields:
-                events_organizations = count_events_organizations(detachment) or 0
-                row.append(events_organizations)
-            else:
-                row.append('-')
-            if 'event_participants' in fields:
-                event_participants = count_events_participants(detachment) or 0
-                row.append(event_participants)
-            else:
-                row.append('-')
+            append_hq_stats_columns(row, stats, fields)
 
-            rows.append(row)
+            yield row
 
     except Exception as e:
         print(f"Ошибка: {e}")
 
-    return rows
-
 
 def get_direction_data(queryset, fields):
     if not fields:
@@ -2331,7 +2090,7 @@ def get_direction_data(queryset, fields):
                         row.append('-')
                     if 'test_done_percent' in fields:
                         members = UserDetachmentPosition.objects.filter(headquarter__area=direction)
-                        test_done_percent = (Attempt.objects.filter(
+                        test_done_percent = (UserBestAttempt.objects.filter(
                             user__in=members.values_list('user', flat=True),
                             category=Attempt.Category.SAFETY,
                             score__gt=60
@@ -2363,7 +2122,68 @@ def get_direction_data(queryset, fields):
     return rows
 
 
+def filter_registry_queryset(queryset, data_func, scope):
+    """Ограничивает выборку реестра штабом командира, запросившего выгрузку.
+
+    scope - словарь вида {'role': 'regional', 'headquarter_id': 1}.
+    Без scope или для роли без доступа к реестру выборка пуста.
+    """
+    if not scope:
+        return queryset.none()
+    if scope['role'] == 'central':
+        return queryset
+    lookup = REGISTRY_ROLE_LOOKUPS[data_func].get(scope['role'])
+    if lookup is None:
+        return queryset.none()
+    return queryset.filter(**{lookup: scope['headquarter_id']})
+
+
+def get_users_registry_queryset(queryset, fields):
+    """Дополняет выборку пользователей всем, что нужно для строк реестра.
+
+    Членство в штабах и отряде, а также отряд командира подтягиваются через
+    select_related, признаки теста и мероприятий считаются подзапросами Exists.
+    Порция пользователей реестра читается одним запросом.
+    """
+    related = [
+        f'{relation}__headquarter'
+        for field, relation in USERS_REGISTRY_POSITION_RELATIONS.items()
+        if field in fields
+    ]
+    if 'position' in fields or 'area' in fields:
+        related += [
+            'detachment_commander__area',
+            'userdetachmentposition__position',
+            'userdetachmentposition__headquarter__area',
+        ]
+
+    annotations = {}
+    if 'test_done' in fields:
+        annotations['registry_test_passed'] = Exists(
+            UserBestAttempt.objects.filter(
+                user=OuterRef('pk'),
+                category=Attempt.Category.SAFETY,
+                score__gt=60
+            )
+        )
+    if 'events_organizations' in fields:
+        annotations['registry_is_organizer'] = Exists(
+            Event.objects.filter(author=OuterRef('pk'))
+        )
+    if 'event_participants' in fields:
+        annotations['registry_is_participant'] = Exists(
+            EventParticipants.objects.filter(user=OuterRef('pk'))
+        )
+
+    return queryset.select_related(*related).annotate(**annotations)
+
+
 def get_users_registry_data(queryset, fields):
+    """Построчно отдает данные реестра участников для потоковой выгрузки.
+
+    Пользователи читаются порциями по EXPORT_ROWS_CHUNK_SIZE, количество
+    запросов не зависит от числа выбранных колонок.
+    """
     if fields is None:
         fields = [
             'district_headquarter', 'regional_headquarter',
@@ -2373,231 +2193,78 @@ def get_users_registry_data(queryset, fields):
             'events_organizations', 'event_participants',
             'area', 'position', 'detachment'
         ]
-        
-    rows = []
-    
+    queryset = get_users_registry_queryset(queryset, fields)
+
     try:
-        for user in queryset:
+        for user in queryset.iterator(chunk_size=EXPORT_ROWS_CHUNK_SIZE):
             row = [user.get_full_name()]
             
             row.append(user.email if user.email else '-')
             row.append(user.phone_number if user.phone_number else '-')
-            if 'district_headquarter' in fields:
-                district_hq = UserDistrictHeadquarterPosition.objects.filter(user=user).first()
-                row.append(district_hq.headquarter.name if district_hq else '-')
-            if 'regional_headquarter' in fields:
-                regional_hq = UserRegionalHeadquarterPosition.objects.filter(user=user).first()
-                row.append(regional_hq.headquarter.name if regional_hq else '-')
-            if 'local_headquarter' in fields:
-                local_hq = UserLocalHeadquarterPosition.objects.filter(user=user).first()
-                row.append(local_hq.headquarter.name if local_hq else '-')
-            if 'educational_headquarter' in fields:
-                edu_hq = UserEducationalHeadquarterPosition.objects.filter(user=user).first()
-                row.append(edu_hq.headquarter.name if edu_hq else '-')
-            if 'detachment' in fields:
-                detachment = UserDetachmentPosition.objects.filter(user=user).first()
-                row.append(detachment.headquarter.name if detachment else '-')
+            for field, relation in USERS_REGISTRY_POSITION_RELATIONS.items():
+                if field in fields:
+                    user_position = getattr(user, relation, None)
+                    row.append(user_position.headquarter.name if user_position else '-')
+            if 'position' in fields or 'area' in fields:
+                commanded_detachment = getattr(
+                    user, 'detachment_commander', None
+                )
+                user_detachment_position = getattr(
+                    user, 'userdetachmentposition', None
+                )
             if 'position' in fields:
-                if Detachment.objects.filter(commander=user).exists():
+                if commanded_detachment:
                     row.append("Командир")
+                elif user_detachment_position and user_detachment_position.position:
+                    row.append(user_detachment_position.position.name)
                 else:
-                    user_detachment_position = getattr(user, 'userdetachmentposition', None)
-                    if user_detachment_position and hasattr(user_detachment_position, 'position'):
-                        row.append(user_detachment_position.position.name)
-                    else:
-                        row.append('-')
+                    row.append('-')
             else:
                 row.append('-')
             if 'area' in fields:
                 area = None
-                if Detachment.objects.filter(commander=user).exists():
-                    area = Detachment.objects.filter(commander=user).first().area
-                else:
-                    user_detachment_position = getattr(user, 'userdetachmentposition', None)
-                    if user_detachment_position:
-                        detachment = getattr(user_detachment_position, 'detachment', None)
-                        area = detachment.area if detachment else None
+                if commanded_detachment:
+                    area = commanded_detachment.area
+                elif user_detachment_position:
+                    area = user_detachment_position.headquarter.area
                 row.append(area.name if area else '-')
             if 'verification' in fields:
                 row.append('Да' if user.is_verified else '-')
             if 'membership_fee' in fields:
                 row.append('Да' if user.membership_fee else '-')
             if 'test_done' in fields:
-                test_passed = Attempt.objects.filter(
-                    user=user,
-                    category=Attempt.Category.SAFETY,
-                    score__gt=60
-                ).exists()
-                row.append('Да' if test_passed else '-')
+                row.append('Да' if user.registry_test_passed else '-')
             if 'events_organizations' in fields:
-                is_organizer = Event.objects.filter(author=user).exists()
-                row.append('Да' if is_organizer else '-')
+                row.append('Да' if user.registry_is_organizer else '-')
             if 'event_participants' in fields:
-                is_participant = EventParticipants.objects.filter(user=user).exists()
-                row.append('Да' if is_participant else '-')
+                row.append('Да' if user.registry_is_participant else '-')
             
-            rows.append(row)
+            yield row
     
     except Exception as e:
         print(f"Ошибка: {e}")
-    
-    return rows
 
 
-def get_debut_results(competition_id: int, is_sample=False) -> List[Detachment]:
-    competition_members_data = []
-    if is_sample:
-        junior_detachments_queryset = CompetitionParticipants.objects.filter(
-            junior_detachment__isnull=False,
-            detachment__isnull=True,
-            competition_id=competition_id,
-            confirmed=True
-        )[:10]
-    else:
-        junior_detachments_queryset = CompetitionParticipants.objects.filter(
-            junior_detachment__isnull=False,
-            detachment__isnull=True,
-            competition_id=competition_id,
-            confirmed=True
+def get_debut_results(competition_id: int, is_sample=False) -> List[CompetitionResult]:
+    missing_overall_place = get_missing_overall_place(competition_id, 'Дебют')
+    return [
+        present_competition_result(result, missing_overall_place)
+        for result in get_competition_results(
+            competition_id, 'Дебют',
+            COMPETITION_RESULTS_SAMPLE_SIZE if is_sample else None
         )
-
-    for participant_entry in junior_detachments_queryset:
-        detachment = participant_entry.junior_detachment
-        detachment.participants_count = get_participants_count(detachment)
-        detachment.members_count = get_members_count(detachment)
-        detachment.status = 'Младший отряд'
-        detachment.nomination = 'Дебют'
-        detachment.area_name = detachment.area.name
-        
-        # Получаем общий рейтинг
-        detachment.overall_ranking, detachment.places_sum = get_overall_ranking(detachment, competition_id)
-        
-        # Получаем места по q_ranking
-        detachment.places = get_detachment_places(detachment, competition_id)
-        
-        competition_members_data.append(detachment)
-    
-    return competition_members_data
+    ]
 
 
-def get_tandem_results(competition_id: int, is_sample=False) -> List[Detachment]:
-    competition_members_data = []
-    if is_sample:
-        tandem_queryset = CompetitionParticipants.objects.filter(
-            junior_detachment__isnull=False,
-            detachment__isnull=False,
-            competition_id=competition_id,
-            confirmed=True
-        )[:10]
-    else:
-        tandem_queryset = CompetitionParticipants.objects.filter(
-            junior_detachment__isnull=False,
-            detachment__isnull=False,
-            competition_id=competition_id,
-            confirmed=True
+def get_tandem_results(competition_id: int, is_sample=False) -> List[CompetitionResult]:
+    missing_overall_place = get_missing_overall_place(competition_id, 'Тандем')
+    return [
+        present_competition_result(result, missing_overall_place)
+        for result in get_competition_results(
+            competition_id, 'Тандем',
+            COMPETITION_RESULTS_SAMPLE_SIZE * 2 if is_sample else None
         )
-
-    for participant_entry in tandem_queryset:
-        junior_detachment = participant_entry.junior_detachment
-        detachment = participant_entry.detachment
-        
-        junior_detachment.participants_count = get_participants_count(junior_detachment)
-        junior_detachment.members_count = get_members_count(junior_detachment)
-        junior_detachment.status = 'Младший отряд'
-        junior_detachment.nomination = 'Тандем'
-        junior_detachment.area_name = junior_detachment.area.name
-        
-        detachment.participants_count = get_participants_count(detachment)
-        detachment.members_count = get_members_count(detachment)
-        detachment.status = 'Наставник'
-        detachment.nomination = 'Тандем'
-        detachment.area_name = detachment.area.name
-
-        # Получаем общий рейтинг
-        detachment.overall_ranking, detachment.places_sum = get_overall_ranking(detachment, competition_id, is_tandem=True, junior_detachment=junior_detachment)
-        junior_detachment.overall_ranking = detachment.overall_ranking
-        junior_detachment.places_sum = detachment.places_sum
-
-        # Получаем места по q_ranking
-        detachment.places = get_detachment_places(detachment, competition_id, is_tandem=True, junior_detachment=junior_detachment)
-        junior_detachment.places = get_detachment_places(junior_detachment, competition_id, is_tandem=True, junior_detachment=detachment)
-
-        competition_members_data.append(detachment)
-        competition_members_data.append(junior_detachment)
-
-    return competition_members_data
-
-
-def get_detachment_places(detachment, competition_id, is_tandem=False, junior_detachment=None):
-    places = []
-    if is_tandem:
-        ranking_models = TANDEM_RANKING_MODELS
-    else:
-        ranking_models = SOLO_RANKING_MODELS
-    
-    for q_ranking in ranking_models:
-        try:
-            if is_tandem:
-                place = q_ranking.objects.get(
-                    junior_detachment=junior_detachment,
-                    detachment=detachment,
-                    competition_id=competition_id
-                ).place
-            else:
-                place = q_ranking.objects.get(
-                    detachment=detachment, competition_id=competition_id
-                ).place
-        except q_ranking.DoesNotExist:
-            place = 'Последнее место'
-        
-        places.append(place)
-    
-    return places
-
-
-def get_overall_ranking(detachment, competition_id, is_tandem=False, junior_detachment=None):
-    try:
-        if is_tandem and junior_detachment:
-            overall_ranking = OverallTandemRanking.objects.get(
-                detachment=detachment,
-                junior_detachment=junior_detachment,
-                competition_id=competition_id
-            ).place
-            places_sum = OverallTandemRanking.objects.get(
-                detachment=detachment,
-                junior_detachment=junior_detachment,
-                competition_id=competition_id
-            ).places_sum
-        else:
-            overall_ranking = OverallRanking.objects.get(
-                detachment=detachment, competition_id=competition_id
-            ).place
-            places_sum = OverallRanking.objects.get(
-                detachment=detachment, competition_id=competition_id
-            ).places_sum
-    except (OverallRanking.DoesNotExist, OverallTandemRanking.DoesNotExist):
-        # Если запись отсутствует, ищем последнее место
-        if is_tandem:
-            last_place = OverallTandemRanking.objects.filter(
-                competition_id=competition_id
-            ).aggregate(Max('place'))['place__max']
-        else:
-            last_place = OverallRanking.objects.filter(
-                competition_id=competition_id
-            ).aggregate(Max('place'))['place__max']
-        
-        overall_ranking = last_place if last_place is not None else 'Последнее место'
-        places_sum = last_place if last_place is not None else 'Последнее место'
-    
-    return overall_ranking, places_sum
-
-
-def get_participants_count(detachment):
-    return get_hq_participants_15_september(detachment)
-
-
-def get_members_count(detachment):
-    return get_hq_members_15_september(detachment)
+    ]
 
 
 def remove_tzinfo(dt):
@@ -12,6 +12,9 @@ from django.views import View
 from celery.result import AsyncResult
 from urllib.parse import quote
 from reports.tasks import generate_excel_file
+from reports.export_artifacts import get_export_params_hash, get_fresh_artifact
+from reports.export_registry import claim_export, release_export
+from reports.models import ExportArtifact
 from competitions.models import CompetitionParticipants
 from questions.models import Attempt
 from reports.constants import (ATTRIBUTION_DATA_HEADERS,
@@ -26,14 +29,16 @@ from reports.constants import (ATTRIBUTION_DATA_HEADERS,
                                Q13_DATA_HEADERS, Q14_DATA_HEADERS,
                                Q19_DATA_HEADERS, DISTRICT_HQ_HEADERS, REGIONAL_HQ_HEADERS,
                                LOCAL_HQ_HEADERS, EDUCATION_HQ_HEADERS, DETACHMENT_HEADERS, CENTRAL_HQ_HEADERS,
-                               DIRECTIONS_HEADERS, USERS_HEADERS, REGIONAL_COMPETITIONS_HEADERS)
+                               DIRECTIONS_HEADERS, USERS_HEADERS, REGIONAL_COMPETITIONS_HEADERS,
+                               REGISTRY_ROLE_LOOKUPS)
 
 from reports.utils import (
     get_attributes_of_uniform_data, get_commander_school_data,
     get_competition_users, get_debut_results, get_detachment_q_results,
     adapt_attempts, get_membership_fee_data, get_tandem_results, get_users_registry_data,
     get_central_hq_data, get_detachment_data, get_local_hq_data, get_regional_hq_data,
-    get_educational_hq_data, get_district_hq_data, get_direction_data
+    get_educational_hq_data, get_district_hq_data, get_direction_data,
+    filter_registry_queryset
 )
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import PermissionDenied
@@ -48,13 +53,20 @@ def has_reports_access(user):
     return user.is_authenticated and getattr(user, 'reports_access', False)
 
 
+@method_decorator(login_required, name='dispatch')
 class TaskStatusView(View):
     def get(self, request, task_id):
+        artifact = ExportArtifact.objects.filter(task_id=task_id).first()
+        if artifact:
+            download_url = default_storage.url(artifact.file_path)
+            return JsonResponse({'status': 'SUCCESS', 'download_url': download_url})
         task = AsyncResult(task_id)
         if task.state == 'SUCCESS':
             file_path = task.result
             download_url = default_storage.url(file_path)
             return JsonResponse({'status': 'SUCCESS', 'download_url': download_url})
+        elif task.state == 'PROGRESS':
+            return JsonResponse({'status': 'PROGRESS', **task.info})
         elif task.state == 'FAILURE':
             return JsonResponse({'status': 'FAILURE',
                                  'result': str(task.result),
@@ -82,6 +94,10 @@ class BaseExcelExportMixin:
     def get_fields(self):
         return None
 
+    def get_export_scope(self):
+        """Штаб, которым ограничивается выгрузка. None - без ограничений."""
+        return None
+
     def process_request(self, request):
         headers = self.get_headers()
         worksheet_title = self.get_worksheet_title()
@@ -94,14 +110,29 @@ class BaseExcelExportMixin:
 
         if hasattr(self, 'get_fields'):
             fields = self.get_fields()
-            
-        if fields:
-            task = generate_excel_file.delay(headers, worksheet_title, safe_filename, data_func, fields)
-        else:
-            print('мы заходим в таску')
-            task = generate_excel_file.delay(headers, worksheet_title, safe_filename, data_func)
 
-        return {'task_id': task.id}
+        scope = self.get_export_scope()
+        params_hash = get_export_params_hash(
+            headers, worksheet_title, data_func, fields, scope
+        )
+        artifact = get_fresh_artifact(params_hash)
+        if artifact and artifact.task_id:
+            return {'task_id': artifact.task_id}
+
+        task_id, start = claim_export(params_hash)
+        if not start:
+            return {'task_id': task_id}
+        try:
+            generate_excel_file.apply_async(
+                (headers, worksheet_title, safe_filename, data_func, fields),
+                {'scope': scope, 'params_hash': params_hash},
+                task_id=task_id
+            )
+        except Exception:
+            release_export(params_hash, task_id)
+            raise
+
+        return {'task_id': task_id}
 
 
 @method_decorator(login_required, name='dispatch')
@@ -549,6 +580,8 @@ class AttributesOfUniformDataView(View):
     
 
 class CommanerPermissionMixin:
+    registry_data_func = None
+
     def get_user_role(self):
         user = self.request.user
         
@@ -583,8 +616,19 @@ class CommanerPermissionMixin:
         user_role = self.get_user_role()
         return self.filter_fields_by_role(fields, user_role)
     
+    def check_registry_role(self, role):
+        if role != 'central' and role not in REGISTRY_ROLE_LOOKUPS[self.registry_data_func]:
+            raise PermissionDenied("У вас недостаточно прав")
+
+    def get_export_scope(self):
+        role, headquarter = self.get_user_role()
+        self.check_registry_role(role)
+        return {'role': role, 'headquarter_id': headquarter.id}
+
     def filter_queryset(self, queryset):
-        pass
+        return filter_registry_queryset(
+            queryset, self.registry_data_func, self.get_export_scope()
+        )
 
 
 class ExportCentralHqDataMixin:
@@ -612,23 +656,18 @@ class ExportCentralHqDataMixin:
     
 
 @method_decorator(csrf_exempt, name='dispatch')
-class ExportCentralDataView(ExportCentralHqDataMixin, BaseExcelExportView):
-    pass
+class ExportCentralDataView(CommanerPermissionMixin, ExportCentralHqDataMixin, BaseExcelExportView):
+    registry_data_func = 'get_central_hq_data'
 
 
 class ExportCentralDataAPIView(CommanerPermissionMixin, viewsets.ModelViewSet):
     permission_classes = [IsCentralCommanderRegistry]
+    registry_data_func = 'get_central_hq_data'
     
     def get_queryset(self):
         queryset = CentralHeadquarter.objects.all()
         return self.filter_queryset(queryset)
     
-    def filter_queryset(self, queryset):
-        role, headquarter = self.get_user_role()
-        
-        if role == 'central':
-            return queryset
-    
     def list(self, request):
         fields = request.query_params.getlist('fields')
         if not fields:
@@ -669,27 +708,18 @@ class ExportDistrictHqDataMixin:
         return 'get_district_hq_data'
     
 
-class ExportDistrictDataView(ExportDistrictHqDataMixin, BaseExcelExportView):
-    pass
+class ExportDistrictDataView(CommanerPermissionMixin, ExportDistrictHqDataMixin, BaseExcelExportView):
+    registry_data_func = 'get_district_hq_data'
 
 
 class ExportDistrictDataAPIView(CommanerPermissionMixin, viewsets.ModelViewSet):
     permission_classes = [IsDistrictCommanderRegistry]
+    registry_data_func = 'get_district_hq_data'
     
     def get_queryset(self):
         queryset = DistrictHeadquarter.objects.all()
         return self.filter_queryset(queryset)
     
-    def filter_queryset(self, queryset):
-        role, headquarter = self.get_user_role()
-        
-        if role == 'central':
-            return queryset
-        elif role == 'district':
-            return queryset.filter(id=headquarter.id)
-        else:
-            raise PermissionDenied("У вас недостаточно прав")
-    
     def list(self, request):
         fields = request.query_params.getlist('fields')
         if not fields:
@@ -730,29 +760,18 @@ class ExportRegionalHqDataMixin:
         return 'get_regional_hq_data'
     
 
-class ExportRegionalDataView(ExportRegionalHqDataMixin, BaseExcelExportView):
-    pass
+class ExportRegionalDataView(CommanerPermissionMixin, ExportRegionalHqDataMixin, BaseExcelExportView):
+    registry_data_func = 'get_regional_hq_data'
 
 
 class ExportRegionalDataAPIView(CommanerPermissionMixin, viewsets.ModelViewSet):
     permission_classes = [IsRegionalCommanderRegistry]
+    registry_data_func = 'get_regional_hq_data'
     
     def get_queryset(self):
         queryset = RegionalHeadquarter.objects.all()
         return self.filter_queryset(queryset)
     
-    def filter_queryset(self, queryset):
-        role, headquarter = self.get_user_role()
-        
-        if role == 'central':
-            return queryset
-        elif role == 'district':
-            return queryset.filter(district_headquarter=headquarter)
-        elif role =='regional':
-            return queryset.filter(id=headquarter.id)
-        else:
-            raise PermissionDenied("У вас недостаточно прав")
-    
     def list(self, request):
         fields = request.query_params.getlist('fields')
         if not fields:
@@ -793,31 +812,18 @@ class ExportLocalHqDataMixin:
         return 'get_local_hq_data'
     
 
-class ExportLocalDataView(ExportLocalHqDataMixin, BaseExcelExportView):
-    pass
+class ExportLocalDataView(CommanerPermissionMixin, ExportLocalHqDataMixin, BaseExcelExportView):
+    registry_data_func = 'get_local_hq_data'
 
 
 class ExportLocalDataAPIView(CommanerPermissionMixin, viewsets.ModelViewSet):
     permission_classes = [IsLocalCommanderRegistry]
+    registry_data_func = 'get_local_hq_data'
     
     def get_queryset(self):
         queryset = LocalHeadquarter.objects.all()
         return self.filter_queryset(queryset)
     
-    def filter_queryset(self, queryset):
-        role, headquarter = self.get_user_role()
-        
-        if role == 'central':
-            return queryset
-        elif role == 'district':
-            return queryset.filter(regional_headquarter__district_headquarter=headquarter)
-        elif role =='regional':
-            return queryset.filter(regional_headquarter=headquarter)
-        elif role == 'local':
-            return queryset.filter(id=headquarter.id)
-        else:
-            raise PermissionDenied("У вас недостаточно прав")
-    
     def list(self, request):
         fields = request.query_params.getlist('fields')
         if not fields:
@@ -858,33 +864,18 @@ class ExportEducationHqDataMixin:
         return 'get_educational_hq_data'
     
 
-class ExportEducationDataView(ExportEducationHqDataMixin, BaseExcelExportView):
-    pass
+class ExportEducationDataView(CommanerPermissionMixin, ExportEducationHqDataMixin, BaseExcelExportView):
+    registry_data_func = 'get_educational_hq_data'
 
 
 class ExportEducationDataAPIView(CommanerPermissionMixin, viewsets.ModelViewSet):
     permission_classes = [IsEducationalCommanderRegistry]
+    registry_data_func = 'get_educational_hq_data'
     
     def get_queryset(self):
         queryset = EducationalHeadquarter.objects.all()
         return self.filter_queryset(queryset)
     
-    def filter_queryset(self, queryset):
-        role, headquarter = self.get_user_role()
-        
-        if role == 'central':
-            return queryset
-        elif role == 'district':
-            return queryset.filter(regional_headquarter__district_headquarter=headquarter)
-        elif role =='regional':
-            return queryset.filter(regional_headquarter=headquarter)
-        elif role == 'local':
-            return queryset.filter(local_headquarter=headquarter)
-        elif role == 'educational':
-            return queryset.filter(id=headquarter.id)
-        else:
-            raise PermissionDenied("У вас недостаточно прав")
-    
     def list(self, request):
         fields = request.query_params.getlist('fields')
         if not fields:
@@ -926,35 +917,18 @@ class ExportDetachmentDataMixin:
         return 'get_detachment_data'
 
 
-class ExportDetachmentDataView(ExportDetachmentDataMixin, BaseExcelExportView):
-    pass
+class ExportDetachmentDataView(CommanerPermissionMixin, ExportDetachmentDataMixin, BaseExcelExportView):
+    registry_data_func = 'get_detachment_data'
 
 
 class ExportDetachmentDataAPIView(CommanerPermissionMixin, viewsets.ModelViewSet):
     permission_classes = [IsDetachmentCommanderRegistry]
+    registry_data_func = 'get_detachment_data'
     
     def get_queryset(self):
         queryset = Detachment.objects.all()
         return self.filter_queryset(queryset)
     
-    def filter_queryset(self, queryset):
-        role, headquarter = self.get_user_role()
-        
-        if role == 'central':
-            return queryset
-        elif role == 'district':
-            return queryset.filter(regional_headquarter__district_headquarter=headquarter)
-        elif role =='regional':
-            return queryset.filter(regional_headquarter=headquarter)
-        elif role == 'local':
-            return queryset.filter(local_headquarter=headquarter)
-        elif role == 'educational':
-            return queryset.filter(educational_headquarter=headquarter)
-        elif role == 'detachment':
-            return queryset.filter(id=headquarter.id)
-        else:
-            raise PermissionDenied("У вас недостаточно прав")
-    
     def list(self, request):
         fields = request.query_params.getlist('fields')
         if not fields:
@@ -1065,45 +1039,18 @@ class ExportUsersDataMixin:
         return 'get_users_registry_data'
 
 
-class ExportUsersDataView(ExportUsersDataMixin, BaseExcelExportView):
-    pass
+class ExportUsersDataView(CommanerPermissionMixin, ExportUsersDataMixin, BaseExcelExportView):
+    registry_data_func = 'get_users_registry_data'
 
 
 class ExportUsersDataAPIView(CommanerPermissionMixin, viewsets.ModelViewSet):
     permission_classes = [IsDetachmentCommanderRegistry]
+    registry_data_func = 'get_users_registry_data'
     
     def get_queryset(self):
         queryset = RSOUser.objects.all()
         return self.filter_queryset(queryset)
     
-    def filter_queryset(self, queryset):
-        role, headquarter = self.get_user_role()
-        
-        if role == 'central':
-            return queryset
-        elif role == 'district':
-            return queryset.filter(
-                userdistrictheadquarterposition__headquarter=headquarter
-            )
-        elif role == 'regional':
-            return queryset.filter(
-                userregionalheadquarterposition__headquarter=headquarter
-            )
-        elif role == 'local':
-            return queryset.filter(
-                userlocalheadquarterposition__headquarter=headquarter
-            )
-        elif role == 'educational':
-            return queryset.filter(
-                usereducationalheadquarterposition__headquarter=headquarter
-            )
-        elif role == 'detachment':
-            return queryset.filter(
-                userdetachmentposition__headquarter=headquarter
-            )
-        else:
-            raise PermissionDenied("У вас недостаточно прав")
-    
     def list(self, request):
         fields = request.query_params.getlist('fields')
         
@@ -16,26 +16,36 @@ DEFAULT_POSITION_ID = 1
 CENTRAL_HQ_ID = 1
 
 # Redis cache TTL
-DETANCHMENT_LIST_CACHE_TTL = 120
+# Ответы, закэшированные через api.response_cache.cache_response,
+# сбрасываются сигналами при изменении данных, поэтому их TTL длинные.
+DETANCHMENT_LIST_CACHE_TTL = 60 * 60
 SUB_COMMANDER_LIST_TTL = 120
-DETACHMENT_LIST_TTL = 120
-EDUCATIONALS_LIST_TTL = 120
-LOCALS_LIST_TTL = 240
-REGIONALS_LIST_TTL = 300
+DETACHMENT_LIST_TTL = 60 * 60
+EDUCATIONALS_LIST_TTL = 60 * 60
+LOCALS_LIST_TTL = 60 * 60
+REGIONALS_LIST_TTL = 60 * 60
 DISTRICTS_LIST_TTL = 300
-POSITIONS_LIST_TTL = 60
-AREAS_LIST_TTL = 60
-REGIONS_LIST_TTL = 300
-CENTRAL_OBJECT_CACHE_TTL = 30
-DISTR_OBJECT_CACHE_TTL = 30
-REG_OBJECT_CACHE_TTL = 30
-RSOUSERS_CACHE_TTL = 30
-HEADQUARTERS_MEMBERS_CACHE_TTL = 30
-DISTRCICTHQ_MEMBERS_CACHE_TTL = 40
-CENTRALHQ_MEMBERS_CACHE_TTL = 180
-EVENTS_CACHE_TTL = 45
+POSITIONS_LIST_TTL = 60 * 60 * 24
+AREAS_LIST_TTL = 60 * 60 * 24
+REGIONS_LIST_TTL = 60 * 60 * 24
+CENTRAL_OBJECT_CACHE_TTL = 60 * 60
+DISTR_OBJECT_CACHE_TTL = 60 * 60
+REG_OBJECT_CACHE_TTL = 60 * 60
+RSOUSERS_CACHE_TTL = 10 * 60
+HEADQUARTERS_MEMBERS_CACHE_TTL = 60 * 60
+DISTRCICTHQ_MEMBERS_CACHE_TTL = 60 * 60
+CENTRALHQ_MEMBERS_CACHE_TTL = 60 * 60
+EVENTS_CACHE_TTL = 30 * 60
 EDU_INST_CACHE_TTL = 180
 USER_ME_TTL = 20
+# Мягкий TTL публичных списков: после него список пересчитывает один
+# воркер, остальные до конца пересчета отдают прежний ответ.
+PUBLIC_LIST_SOFT_TTL = 5 * 60
+RESPONSE_CACHE_LOCK_TIMEOUT = 60
+RESPONSE_CACHE_LOCK_WAIT = 3
+USER_ROLES_CACHE_TTL = 300
+# Пулы id вопросов тестирования сбрасываются сигналами.
+QUESTION_POOL_CACHE_TTL = 60 * 60 * 24
 
 
 MIN_FOUNDING_DATE = 1000
@@ -124,6 +134,7 @@ INSTALLED_APPS += [
     'regional_competitions.apps.RegionalCompetitionsConfig',
     'services.apps.ServicesConfig',
     'regional_competitions_2025.apps.RegionalCompetitions2025Config',
+    'reports.apps.ReportsConfig',
 ]
 
 MIDDLEWARE = [
@@ -356,6 +367,11 @@ CELERY_RESULT_BACKEND = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# Выгрузки Excel выполняет отдельный воркер очереди reports
+# (celery worker -Q reports), чтобы они не задерживали остальные задачи.
+CELERY_TASK_ROUTES = {
+    'reports.tasks.generate_excel_file': {'queue': 'reports'},
+}
 
 
 if DEBUG:
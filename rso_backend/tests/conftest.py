@@ -2,6 +2,7 @@ import datetime
 
 import pytest
 from django.conf import settings
+from django.core.cache import cache
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
@@ -54,6 +55,17 @@ pytest_plugins = [
 ]
 
 
+@pytest.fixture(autouse=True)
+def clear_redis_cache():
+    """Кэш ролей и ответов живет в Redis, а id в тестах повторяются."""
+    cache.delete_pattern('user_roles*')
+    cache.delete_pattern('response*')
+    cache.delete_pattern('competition_pipeline*')
+    cache.delete_pattern('competition_changes*')
+    cache.delete_pattern('question_pool*')
+    cache.delete_pattern('export_inflight*')
+
+
 @pytest.fixture
 def client():
     """Неавторизованный клиент."""
@@ -0,0 +1,70 @@
+import pytest
+
+from competitions.change_log import has_changes, take_changes
+from competitions.models import Q7, Q7Ranking, Q7Report, Q9, Q9Report
+from competitions.tasks import calculate_q7_places_task
+
+
+@pytest.fixture
+def competition_settings(settings, competition):
+    settings.COMPETITION_ID = competition.id
+    return settings
+
+
+@pytest.mark.django_db
+class TestChangeLog:
+
+    def test_report_changes(self, competition, junior_detachment_3):
+        assert not has_changes('q7', competition.id)
+
+        report = Q7Report.objects.create(
+            competition=competition, detachment=junior_detachment_3
+        )
+        assert has_changes('q7', competition.id)
+        assert not has_changes('q8', competition.id)
+
+        with take_changes('q7', competition.id) as detachment_ids:
+            assert detachment_ids == {junior_detachment_3.id}
+        assert not has_changes('q7', competition.id)
+
+        Q9.objects.create(
+            detachment_report=Q9Report.objects.create(
+                competition=competition, detachment=junior_detachment_3
+            ),
+            event_name='Мероприятие', prize_place=1
+        )
+        with take_changes('q9', competition.id) as detachment_ids:
+            assert detachment_ids == {junior_detachment_3.id}
+
+        report.delete()
+        with pytest.raises(ValueError):
+            with take_changes('q7', competition.id):
+                raise ValueError
+        assert has_changes('q7', competition.id)
+
+    def test_places_recalculated_only_after_changes(
+            self, competition_settings, competition,
+            participants_competition_start, junior_detachment_3
+    ):
+        with take_changes('q7', competition.id):
+            pass
+        calculate_q7_places_task()
+        assert not Q7Ranking.objects.exists()
+
+        report = Q7Report.objects.create(
+            competition=competition, detachment=junior_detachment_3
+        )
+        Q7.objects.bulk_create([
+            Q7(detachment_report=report, event_name='Первое',
+               number_of_participants=5, is_verified=True),
+            Q7(detachment_report=report, event_name='Второе',
+               number_of_participants=7),
+        ])
+        calculate_q7_places_task()
+
+        report.refresh_from_db()
+        assert report.score == 5
+        assert list(
+            Q7Ranking.objects.values_list('detachment_id', 'place')
+        ) == [(junior_detachment_3.id, 1)]
+        assert not has_changes('q7', competition.id)
@@ -0,0 +1,77 @@
+import pytest
+
+from competitions.models import (CompetitionParticipants, OverallRanking,
+                                 OverallTandemRanking, Q7Ranking,
+                                 Q7TandemRanking, Q8Ranking, Q8TandemRanking)
+from competitions.q_calculations import calculate_overall_rankings
+
+SOLO_MODELS = [Q7Ranking, Q8Ranking]
+TANDEM_MODELS = [Q7TandemRanking, Q8TandemRanking]
+
+
+@pytest.mark.django_db
+class TestOverallRankings:
+
+    def test_solo_places(
+            self, competition, participants_competition_start,
+            participants_competition_start_2, junior_detachment_2,
+            junior_detachment_3, junior_detachment
+    ):
+        """Сумма мест с худшим местом вместо пропусков и плотные места."""
+        CompetitionParticipants.objects.create(
+            competition=competition, junior_detachment=junior_detachment
+        )
+        CompetitionParticipants.objects.update(confirmed=True)
+        Q7Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=1
+        )
+        Q7Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_2, place=2
+        )
+        Q8Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_2, place=1
+        )
+
+        calculate_overall_rankings(SOLO_MODELS, TANDEM_MODELS, competition.id)
+
+        rankings = {
+            ranking.detachment_id: (ranking.places_sum, ranking.place)
+            for ranking in OverallRanking.objects.all()
+        }
+        assert rankings == {
+            junior_detachment_2.id: (3, 1),
+            junior_detachment_3.id: (3, 1),
+            junior_detachment.id: (5, 2),
+        }
+
+    def test_tandem_places(
+            self, competition, participants_competition_tandem,
+            detachment_competition, junior_detachment
+    ):
+        """Тандем без мест получает худшие места по каждому показателю."""
+        CompetitionParticipants.objects.update(confirmed=True)
+        Q7TandemRanking.objects.create(
+            competition=competition, detachment=detachment_competition,
+            junior_detachment=junior_detachment, place=2
+        )
+
+        calculate_overall_rankings(SOLO_MODELS, TANDEM_MODELS, competition.id)
+
+        ranking = OverallTandemRanking.objects.get()
+        assert ranking.detachment_id == detachment_competition.id
+        assert ranking.junior_detachment_id == junior_detachment.id
+        assert (ranking.places_sum, ranking.place) == (3, 1)
+        assert not OverallRanking.objects.exists()
+
+    def test_queries_do_not_depend_on_participants(
+            self, competition, participants_competition_start,
+            participants_competition_start_2, django_assert_max_num_queries
+    ):
+        """Число запросов не зависит от числа участников."""
+        CompetitionParticipants.objects.update(confirmed=True)
+        models_count = len(SOLO_MODELS) + len(TANDEM_MODELS)
+
+        with django_assert_max_num_queries(2 * models_count + 8):
+            calculate_overall_rankings(
+                SOLO_MODELS, TANDEM_MODELS, competition.id
+            )
@@ -0,0 +1,55 @@
+import pytest
+
+from competitions.models import (CompetitionParticipants, Q7Ranking, Q7Report,
+                                 Q7TandemRanking)
+from competitions.pairing import TandemPairs
+from competitions.q_calculations import calculate_place
+
+
+@pytest.mark.django_db
+class TestTandemPairs:
+
+    def test_pairs(
+            self, competition, participants_competition_tandem,
+            participants_competition_start, detachment_competition,
+            junior_detachment, junior_detachment_3
+    ):
+        CompetitionParticipants.objects.update(confirmed=False)
+        assert not TandemPairs(competition.id)
+
+        pairs = TandemPairs(competition.id, confirmed_only=False)
+        assert pairs.start_ids == [junior_detachment_3.id]
+        assert pairs.tandems == [
+            (junior_detachment.id, detachment_competition.id)
+        ]
+        assert pairs.is_junior(junior_detachment.id)
+        assert pairs.is_junior(junior_detachment_3.id)
+        assert not pairs.is_junior(detachment_competition.id)
+
+    def test_calculate_place(
+            self, competition, participants_competition_tandem,
+            participants_competition_start, detachment_competition,
+            junior_detachment, junior_detachment_3,
+            django_assert_num_queries
+    ):
+        CompetitionParticipants.objects.update(confirmed=True)
+        for detachment, score in (
+            (junior_detachment_3, 5),
+            (junior_detachment, 3),
+            (detachment_competition, 4),
+        ):
+            Q7Report.objects.create(
+                competition=competition, detachment=detachment, score=score
+            )
+
+        with django_assert_num_queries(10):
+            calculate_place(
+                competition.id, Q7Report, Q7Ranking, Q7TandemRanking
+            )
+
+        assert list(
+            Q7Ranking.objects.values_list('detachment_id', 'place')
+        ) == [(junior_detachment_3.id, 1)]
+        assert list(Q7TandemRanking.objects.values_list(
+            'junior_detachment_id', 'detachment_id', 'place'
+        )) == [(junior_detachment.id, detachment_competition.id, 1)]
@@ -0,0 +1,104 @@
+from functools import partial
+
+import pytest
+from django.conf import settings
+
+from competitions import tasks
+from competitions.change_log import CHANGE_LOG_INDICATORS, take_changes
+from competitions.models import (OverallRanking, OverallTandemRanking,
+                                 Q7Ranking, Q7Report, Q7TandemRanking,
+                                 RankingCopy, TandemRankingCopy)
+from competitions.pipeline import get_last_run_timings
+from competitions.q_calculations import save_reserve_places
+from rso_backend.celery import app
+
+
+@pytest.fixture
+def eager_celery(monkeypatch):
+    monkeypatch.setattr(app.conf, 'task_always_eager', True)
+
+
+@pytest.fixture
+def indicator_calls(monkeypatch):
+    """Подменяет задачи показателей, запоминая вызванные показатели."""
+    calls = []
+
+    def calculate(indicator, **kwargs):
+        calls.append(indicator)
+        if indicator in CHANGE_LOG_INDICATORS:
+            with take_changes(indicator, settings.COMPETITION_ID):
+                pass
+
+    for indicator in tasks.INDICATOR_TASKS:
+        monkeypatch.setitem(
+            tasks.INDICATOR_TASKS, indicator,
+            (partial(calculate, indicator),)
+        )
+    return calls
+
+
+@pytest.mark.django_db
+class TestRankingsPipeline:
+
+    def test_skips_unchanged_indicators(
+            self, eager_celery, indicator_calls, competition,
+            participants_competition_start, junior_detachment_3, settings
+    ):
+        settings.COMPETITION_ID = competition.id
+
+        assert tasks.calculate_rankings_pipeline_task()
+        assert indicator_calls == list(tasks.INDICATOR_TASKS)
+        timings = get_last_run_timings()
+        assert set(timings) == {
+            *tasks.INDICATOR_TASKS, 'indicators', 'overall', 'copy'
+        }
+        assert None not in timings.values()
+
+        indicator_calls.clear()
+        assert tasks.calculate_rankings_pipeline_task() is None
+        assert indicator_calls == []
+
+        Q7Report.objects.create(
+            competition=competition, detachment=junior_detachment_3
+        )
+        assert tasks.calculate_rankings_pipeline_task()
+        assert indicator_calls == ['q7']
+
+        indicator_calls.clear()
+        tasks.calculate_rankings_pipeline_task(force=True)
+        assert indicator_calls == list(tasks.INDICATOR_TASKS)
+
+    def test_save_reserve_places(
+            self, competition, participants_competition_start,
+            participants_competition_tandem, junior_detachment_3,
+            junior_detachment, detachment_competition,
+            django_assert_max_num_queries
+    ):
+        OverallRanking.objects.create(
+            competition=competition, detachment=junior_detachment_3,
+            place=1, places_sum=20
+        )
+        OverallTandemRanking.objects.create(
+            competition=competition, detachment=detachment_competition,
+            junior_detachment=junior_detachment, place=2, places_sum=30
+        )
+        Q7Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_3, place=3
+        )
+        Q7TandemRanking.objects.create(
+            competition=competition, detachment=detachment_competition,
+            junior_detachment=junior_detachment, place=4
+        )
+
+        with django_assert_max_num_queries(50):
+            save_reserve_places(competition.id)
+
+        solo = RankingCopy.objects.get()
+        assert (solo.detachment, solo.place, solo.places_sum) == (
+            junior_detachment_3, 1, 20
+        )
+        assert solo.q7_place == 3
+        tandem = TandemRankingCopy.objects.get()
+        assert (tandem.junior_detachment, tandem.place, tandem.q7_place) == (
+            junior_detachment, 2, 4
+        )
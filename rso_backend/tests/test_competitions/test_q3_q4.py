@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+
+from competitions.models import (CompetitionParticipants, Q3Ranking,
+                                 Q3TandemRanking, Q4Ranking, Q4TandemRanking)
+from competitions.q_calculations import calculate_q3_q4_place
+from headquarters.models import UserDetachmentPosition
+from questions.models import Attempt
+
+BEFORE_DEADLINE = datetime.datetime(
+    2024, 5, 1, tzinfo=datetime.timezone.utc
+)
+
+
+def create_attempt(user, category, score, in_time=True, is_valid=True):
+    attempt = Attempt.objects.create(
+        user=user, category=category, score=score, is_valid=is_valid
+    )
+    if in_time:
+        Attempt.objects.filter(id=attempt.id).update(
+            timestamp=BEFORE_DEADLINE
+        )
+
+
+@pytest.mark.django_db
+class TestQ3Q4Places:
+
+    def test_places(
+            self, competition, participants_competition_tandem,
+            participants_competition_start, detachment_competition,
+            junior_detachment, junior_detachment_3, user, user_2, user_3,
+            user_6, position_commissar, position_jedi,
+            django_assert_max_num_queries
+    ):
+        CompetitionParticipants.objects.update(confirmed=True)
+        UserDetachmentPosition.objects.create(
+            user=user_6, headquarter=junior_detachment,
+            position=position_commissar
+        )
+        UserDetachmentPosition.objects.create(
+            user=user_2, headquarter=detachment_competition,
+            position=position_jedi
+        )
+        create_attempt(user_3, 'university', 100)
+        create_attempt(user_3, 'safety', 100)
+        create_attempt(user_6, 'university', 92)
+        create_attempt(user_6, 'university', 100, is_valid=False)
+        create_attempt(user_6, 'safety', 80)
+        create_attempt(user, 'university', 96)
+        create_attempt(user, 'safety', 90)
+        create_attempt(user_2, 'university', 99)
+        create_attempt(user_2, 'safety', 70)
+        create_attempt(user_2, 'safety', 100, in_time=False)
+
+        # Лучшая попытка user_2 сделана после срока - для него баллы
+        # до срока считаются отдельным запросом.
+        with django_assert_max_num_queries(22):
+            calculate_q3_q4_place(competition.id)
+
+        assert dict(
+            Q3Ranking.objects.values_list('detachment_id', 'place')
+        ) == {junior_detachment_3.id: 9}
+        assert dict(
+            Q4Ranking.objects.values_list('detachment_id', 'place')
+        ) == {junior_detachment_3.id: 9}
+        # Младший отряд: (100 + 92) / 2 -> 1 место, (100 + 80) / 2 -> 2.
+        # Старший: 96 / 2 -> 9 место, (90 + 70) / 2 -> 4.
+        assert list(Q3TandemRanking.objects.values_list(
+            'detachment_id', 'junior_detachment_id', 'place'
+        )) == [(detachment_competition.id, junior_detachment.id, 5)]
+        assert list(Q4TandemRanking.objects.values_list(
+            'detachment_id', 'junior_detachment_id', 'place'
+        )) == [(detachment_competition.id, junior_detachment.id, 3)]
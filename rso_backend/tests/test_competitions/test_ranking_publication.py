@@ -0,0 +1,42 @@
+import pytest
+
+from competitions.models import Q7Ranking
+from competitions.ranking_publication import publish_rankings
+from competitions.results_snapshot import SOLO_KEY_FIELDS
+
+
+@pytest.mark.django_db
+class TestPublishRankings:
+
+    def test_publish_changes_only(
+            self, competition, junior_detachment, junior_detachment_2,
+            junior_detachment_3
+    ):
+        kept = Q7Ranking.objects.create(
+            competition=competition, detachment=junior_detachment, place=1
+        )
+        moved = Q7Ranking.objects.create(
+            competition=competition, detachment=junior_detachment_2, place=2
+        )
+
+        assert publish_rankings(Q7Ranking, competition.id, [
+            Q7Ranking(competition=competition,
+                      detachment=junior_detachment, place=1),
+            Q7Ranking(competition=competition,
+                      detachment=junior_detachment_3, place=2),
+        ], SOLO_KEY_FIELDS) == (1, 0, 1)
+
+        assert publish_rankings(Q7Ranking, competition.id, [
+            Q7Ranking(competition=competition,
+                      detachment=junior_detachment, place=2),
+            Q7Ranking(competition=competition,
+                      detachment=junior_detachment_3, place=1),
+        ], SOLO_KEY_FIELDS) == (0, 2, 0)
+
+        assert not Q7Ranking.objects.filter(id=moved.id).exists()
+        assert dict(
+            Q7Ranking.objects.values_list('detachment_id', 'place')
+        ) == {junior_detachment.id: 2, junior_detachment_3.id: 1}
+        assert Q7Ranking.objects.get(detachment=junior_detachment).id == (
+            kept.id
+        )
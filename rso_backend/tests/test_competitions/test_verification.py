@@ -0,0 +1,135 @@
+import datetime
+from http import HTTPStatus
+
+import pytest
+from django.db import transaction
+
+from competitions.models import Q7, Q7Report, QVerificationLog
+
+
+@pytest.mark.django_db
+class TestBulkVerification:
+    competition_url = '/api/v1/competitions/'
+    question_url = '/reports/q7/'
+
+    @pytest.fixture(autouse=True)
+    def verification_open(self, monkeypatch):
+        monkeypatch.setattr(
+            'competitions.views.COUNT_PLACES_DEADLINE', datetime.date.max
+        )
+
+    @pytest.fixture
+    def events(self, competition, junior_detachment, junior_detachment_3):
+        reports = [
+            Q7Report.objects.create(
+                competition=competition, detachment=detachment
+            )
+            for detachment in (junior_detachment, junior_detachment_3)
+        ]
+        return [
+            Q7.objects.create(
+                detachment_report=report, event_name=f'Мероприятие {number}',
+                number_of_participants=number
+            )
+            for number, report in enumerate(reports * 2, start=1)
+        ]
+
+    def get_url(self, competition):
+        return (
+            f'{self.competition_url}{competition.id}'
+            f'{self.question_url}bulk-accept/'
+        )
+
+    def test_bulk_accept(
+            self, authenticated_client_commissar_regional_headquarter,
+            competition, events, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = (
+                authenticated_client_commissar_regional_headquarter.post(
+                    self.get_url(competition),
+                    data={'ids': [event.id for event in events[:3]]},
+                    format='json'
+                )
+            )
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'count': 3}
+        assert Q7.objects.filter(is_verified=True).count() == 3
+        assert sorted(
+            Q7Report.objects.values_list('score', flat=True)
+        ) == [2, 4]
+        assert QVerificationLog.objects.filter(
+            q_number=7, action=QVerificationLog.Action.ACCEPTED
+        ).count() == 3
+
+    def test_bulk_reject(
+            self, authenticated_client_commissar_regional_headquarter,
+            competition, events
+    ):
+        response = authenticated_client_commissar_regional_headquarter.delete(
+            self.get_url(competition),
+            data={'ids': [events[0].id]},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert not Q7.objects.filter(id=events[0].id).exists()
+
+    def test_bulk_accept_other_region(
+            self, authenticated_client_commissar_regional_headquarter_2,
+            competition, events
+    ):
+        response = (
+            authenticated_client_commissar_regional_headquarter_2.post(
+                self.get_url(competition),
+                data={'ids': [event.id for event in events]},
+                format='json'
+            )
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'count': 0}
+        assert not Q7.objects.filter(is_verified=True).exists()
+
+    def test_bulk_accept_forbidden(self, authenticated_client_3, competition):
+        response = authenticated_client_3.post(
+            self.get_url(competition), data={'ids': [1]}, format='json'
+        )
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+    def test_bulk_accept_after_deadline(
+            self, authenticated_client_commissar_regional_headquarter,
+            competition, events, monkeypatch
+    ):
+        monkeypatch.setattr(
+            'competitions.views.COUNT_PLACES_DEADLINE',
+            datetime.date(2024, 10, 16)
+        )
+        response = authenticated_client_commissar_regional_headquarter.post(
+            self.get_url(competition),
+            data={'ids': [events[0].id]},
+            format='json'
+        )
+        assert response.status_code == HTTPStatus.FORBIDDEN
+        assert not Q7.objects.filter(is_verified=True).exists()
+
+    def test_signal_rescores_once_per_transaction(
+            self, events, django_capture_on_commit_callbacks,
+            django_assert_max_num_queries
+    ):
+        Q7.objects.filter(id__in=[events[0].id, events[2].id]).update(
+            is_verified=True
+        )
+        with django_capture_on_commit_callbacks() as callbacks:
+            with transaction.atomic():
+                for event in (events[0], events[2]):
+                    event.is_verified = True
+                    event.number_of_participants = 10
+                    event.save()
+        report = events[0].detachment_report
+        report.refresh_from_db()
+        assert report.score == 0
+
+        with django_assert_max_num_queries(3):
+            for callback in callbacks:
+                callback()
+        report.refresh_from_db()
+        assert report.score == 20
@@ -0,0 +1,96 @@
+import pytest
+
+from headquarters.hierarchy import (get_ancestors, get_sub_units,
+                                    rebuild_unit_ancestors)
+from headquarters.mixins import (CentralSubCommanderIdMixin,
+                                 RegionalSubCommanderIdMixin)
+from headquarters.models import Detachment, UnitAncestor
+
+
+@pytest.mark.django_db
+class TestUnitAncestors:
+
+    def test_ancestors_on_create(
+            self, central_headquarter, district_headquarter,
+            regional_headquarter, local_headquarter, educational_headquarter,
+            detachment
+    ):
+        detachment.local_headquarter = local_headquarter
+        detachment.educational_headquarter = educational_headquarter
+        detachment.save()
+
+        assert get_ancestors(detachment) == {
+            'EducationalHeadquarter': educational_headquarter.id,
+            'LocalHeadquarter': local_headquarter.id,
+            'RegionalHeadquarter': regional_headquarter.id,
+            'DistrictHeadquarter': district_headquarter.id,
+            'CentralHeadquarter': central_headquarter.id,
+        }
+        assert get_ancestors(central_headquarter) == {}
+
+    def test_move_updates_descendants(
+            self, central_headquarter, central_headquarter_2,
+            district_headquarter_2, regional_headquarter, detachment
+    ):
+        """Перенос РШ в другой окружной штаб меняет предков его отрядов."""
+        regional_headquarter.district_headquarter = district_headquarter_2
+        regional_headquarter.save()
+
+        assert get_ancestors(detachment)['CentralHeadquarter'] == (
+            central_headquarter_2.id
+        )
+        assert not get_sub_units(central_headquarter, Detachment).exists()
+        assert list(get_sub_units(central_headquarter_2, Detachment)) == [
+            detachment
+        ]
+
+    def test_delete(self, regional_headquarter, detachment_3):
+        detachment_id = detachment_3.id
+        detachment_3.delete()
+
+        assert not UnitAncestor.objects.filter(
+            unit_type='Detachment', unit_id=detachment_id
+        ).exists()
+
+    def test_rebuild(self, detachment, educational_headquarter):
+        expected = set(UnitAncestor.objects.values_list(
+            'unit_type', 'unit_id', 'ancestor_type', 'ancestor_id', 'depth'
+        ))
+        UnitAncestor.objects.all().delete()
+
+        rebuild_unit_ancestors()
+
+        assert set(UnitAncestor.objects.values_list(
+            'unit_type', 'unit_id', 'ancestor_type', 'ancestor_id', 'depth'
+        )) == expected
+
+
+@pytest.mark.django_db
+class TestSubCommanders:
+
+    def test_sub_commanders(
+            self, central_headquarter, district_headquarter,
+            regional_headquarter, detachment, detachment_3, local_headquarter
+    ):
+        commanders = CentralSubCommanderIdMixin().get_sub_commanders(
+            central_headquarter
+        )
+
+        assert [(cmd['type'], cmd['unit']) for cmd in commanders] == [
+            ('DistrictHeadquarter', district_headquarter.name),
+            ('RegionalHeadquarter', regional_headquarter.name),
+            ('Detachment', detachment.name),
+            ('Detachment', detachment_3.name),
+            ('LocalHeadquarter', local_headquarter.name),
+        ]
+
+    def test_sub_commanders_by_user(
+            self, regional_headquarter, detachment, detachment_3,
+            django_assert_num_queries
+    ):
+        with django_assert_num_queries(3):
+            commanders = RegionalSubCommanderIdMixin().get_sub_commanders(
+                regional_headquarter, detachment_3.commander.id
+            )
+
+        assert [cmd['unit'] for cmd in commanders] == [detachment_3.name]
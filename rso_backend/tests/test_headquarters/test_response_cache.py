@@ -0,0 +1,100 @@
+import hashlib
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from api.response_cache import (LOCK_KEY, cache_response, get_metrics,
+                                get_tag_versions)
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+
+    def test_regional_cached_until_changed(
+            self, authenticated_client, regional_headquarter
+    ):
+        url = f'/api/v1/regionals/{regional_headquarter.id}/'
+        with CaptureQueriesContext(connection) as uncached_queries:
+            response = authenticated_client.get(url)
+        assert response.status_code == 200
+
+        with CaptureQueriesContext(connection) as cached_queries:
+            cached = authenticated_client.get(url)
+        assert cached.data == response.data
+        assert len(cached_queries) < len(uncached_queries)
+
+        regional_headquarter.name = 'Новое название'
+        regional_headquarter.save()
+
+        response = authenticated_client.get(url)
+        assert response.data['name'] == 'Новое название'
+
+    def test_object_tag(
+            self, regional_headquarter, regional_headquarter_2
+    ):
+        """Изменение другого штаба не сбрасывает тег этого штаба."""
+        tag = f'headquarters.regionalheadquarter:{regional_headquarter.id}'
+        version = get_tag_versions([tag])
+
+        regional_headquarter_2.name = 'Другой штаб'
+        regional_headquarter_2.save()
+        assert get_tag_versions([tag]) == version
+
+        regional_headquarter.save()
+        assert get_tag_versions([tag]) != version
+
+    def test_area_list_invalidated(self, authenticated_client, area):
+        response = authenticated_client.get('/api/v1/areas/')
+        assert response.status_code == 200
+
+        area.name = 'Новое направление'
+        area.save()
+
+        response = authenticated_client.get('/api/v1/areas/')
+        assert 'Новое направление' in str(response.data)
+
+
+class CountingView:
+    """Вьюсет-заглушка, считающий вызовы метода."""
+
+    calls = 0
+
+    @cache_response(60, ('headquarters.area',), soft_timeout=10)
+    def list(self, request):
+        CountingView.calls += 1
+        return Response({'calls': CountingView.calls})
+
+
+@pytest.mark.django_db
+class TestSoftTimeout:
+    view = 'CountingView.list'
+    lock_key = LOCK_KEY.format(
+        view=view,
+        url=hashlib.md5(b'http://testserver/api/v1/test/').hexdigest()
+    )
+
+    def get(self):
+        return CountingView().list(APIRequestFactory().get('/api/v1/test/'))
+
+    def test_stale_while_recompute(self, monkeypatch):
+        CountingView.calls = 0
+        assert self.get().data == {'calls': 1}
+        assert self.get().data == {'calls': 1}
+
+        now = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now + 11)
+        cache.add(self.lock_key, 1)
+        assert self.get().data == {'calls': 1}, (
+            'Пока пересчет держит блокировку, отдается прежний ответ'
+        )
+
+        cache.delete(self.lock_key)
+        assert self.get().data == {'calls': 2}
+        assert get_metrics(self.view) == {
+            'hit': 1, 'stale': 1, 'miss': 0, 'recompute': 2
+        }
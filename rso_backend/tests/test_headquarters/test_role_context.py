@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+
+from api.permissions import (IsCommanderOrTrustedAnywhere,
+                             IsDetachmentCommander, IsRegionalCommander)
+from api.role_context import get_role_context
+from headquarters.models import (Detachment, RegionalHeadquarter,
+                                 UserDetachmentPosition)
+
+
+def make_request(user, method='PATCH'):
+    return SimpleNamespace(user=user, method=method)
+
+
+@pytest.mark.django_db
+class TestRoleContext:
+
+    def test_roles_loaded_once(
+            self, regional_headquarter, user_commander,
+            django_assert_num_queries
+    ):
+        """Роли загружаются двумя запросами и кэшируются на запросе."""
+        request = make_request(user_commander)
+
+        with django_assert_num_queries(2):
+            role_context = get_role_context(request)
+            assert role_context.is_commander(
+                RegionalHeadquarter, regional_headquarter.id
+            )
+            assert not role_context.is_commander(Detachment)
+            assert not role_context.is_trusted(UserDetachmentPosition)
+            assert get_role_context(request) is role_context
+
+    def test_trusted_member(
+            self, detachment, user_2, position_jedi,
+            django_assert_num_queries
+    ):
+        UserDetachmentPosition.objects.create(
+            user=user_2, headquarter=detachment, position=position_jedi,
+            is_trusted=True
+        )
+        request = make_request(user_2)
+
+        with django_assert_num_queries(2):
+            assert IsDetachmentCommander().has_object_permission(
+                request, None, detachment
+            )
+            assert get_role_context(request).has_position(
+                UserDetachmentPosition, position_jedi.name
+            )
+
+    def test_permissions_share_context(
+            self, regional_headquarter, detachment, user_commander,
+            django_assert_num_queries
+    ):
+        """Проверки пермишенов в одном запросе не повторяют запросы ролей."""
+        request = make_request(user_commander)
+
+        with django_assert_num_queries(2):
+            assert IsDetachmentCommander().has_object_permission(
+                request, None, detachment
+            )
+            assert IsRegionalCommander().has_object_permission(
+                request, None, regional_headquarter
+            )
+            assert IsCommanderOrTrustedAnywhere().has_object_permission(
+                request, None, detachment
+            )
+
+    def test_foreign_detachment(self, detachment_2, user_commander):
+        request = make_request(user_commander)
+
+        assert not IsDetachmentCommander().has_object_permission(
+            request, None, detachment_2
+        )
+
+    def test_anonymous(self, django_assert_num_queries):
+        request = make_request(AnonymousUser())
+
+        with django_assert_num_queries(0):
+            role_context = get_role_context(request)
+            assert role_context.commanded == {}
+            assert not role_context.is_staff_or_central_commander
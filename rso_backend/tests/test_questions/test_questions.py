@@ -0,0 +1,187 @@
+import datetime
+from http import HTTPStatus
+
+import pytest
+
+from questions.best_attempts import get_best_attempt, rebuild_best_attempts
+from questions.models import (AnswerOption, Attempt, Question, UserAnswer,
+                              UserBestAttempt)
+from questions.question_pool import get_block_question_ids
+
+
+class FrozenDatetime(datetime.datetime):
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 4, 1)
+
+
+@pytest.fixture
+def questions_open(monkeypatch):
+    monkeypatch.setattr('questions.views.datetime', FrozenDatetime)
+
+
+@pytest.fixture
+def safety_questions():
+    questions = Question.objects.bulk_create([
+        Question(block=Question.Block.WORK_SAFETY, title=f'Вопрос {number}')
+        for number in range(20)
+    ])
+    AnswerOption.objects.bulk_create([
+        AnswerOption(question=question, text=text, is_correct=is_correct)
+        for question in questions
+        for text, is_correct in (('Верно', True), ('Неверно', False))
+    ])
+    return questions
+
+
+@pytest.mark.django_db
+class TestQuestions:
+    questions_url = '/api/v1/questions/'
+    submit_url = '/api/v1/submit_answers/'
+
+    def test_question_pool(self, safety_questions):
+        assert sorted(get_block_question_ids('5')) == sorted(
+            question.id for question in safety_questions
+        )
+        question = Question.objects.create(
+            block=Question.Block.WORK_SAFETY, title='Новый вопрос'
+        )
+        assert question.id in get_block_question_ids('5')
+        question.delete()
+        assert question.id not in get_block_question_ids('5')
+
+    def test_get_safety_questions(
+            self, authenticated_client, safety_questions, questions_open,
+            django_assert_max_num_queries
+    ):
+        get_block_question_ids('5')
+        with django_assert_max_num_queries(10):
+            response = authenticated_client.get(
+                self.questions_url, {'category': 'safety'}
+            )
+        assert response.status_code == HTTPStatus.OK
+        question_ids = [question['id'] for question in response.data]
+        assert len(set(question_ids)) == 15
+        assert all(
+            len(question['answer_options']) == 2
+            for question in response.data
+        )
+        assert set(
+            Attempt.objects.get().questions.values_list('id', flat=True)
+        ) == set(question_ids)
+
+    def submit(self, client, attempt, correct_count):
+        answers = [
+            {
+                'question_id': question.id,
+                'answer_option_id': question.answer_options.get(
+                    is_correct=number < correct_count
+                ).id,
+            }
+            for number, question in enumerate(attempt.questions.all())
+        ]
+        return client.post(
+            self.submit_url,
+            data={'answers': answers, 'category': 'safety'},
+            format='json'
+        )
+
+    def test_submit_answers(
+            self, authenticated_client, user, safety_questions
+    ):
+        attempt = Attempt.objects.create(user=user, category='safety')
+        attempt.questions.set(safety_questions[:15])
+
+        response = self.submit(authenticated_client, attempt, 12)
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'score': 80, 'best_score': 80}
+        assert UserAnswer.objects.filter(attempt=attempt).count() == 15
+        attempt.refresh_from_db()
+        assert attempt.is_valid
+
+        response = self.submit(authenticated_client, attempt, 15)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_submit_wrong_answers(
+            self, authenticated_client, user, safety_questions
+    ):
+        attempt = Attempt.objects.create(user=user, category='safety')
+        attempt.questions.set(safety_questions[:2])
+        first, second = safety_questions[:2]
+        for answers in (
+            [{'question_id': safety_questions[2].id,
+              'answer_option_id': 1}],
+            [{'question_id': first.id,
+              'answer_option_id': second.answer_options.first().id}],
+            [{'question_id': first.id,
+              'answer_option_id': first.answer_options.first().id},
+             {'question_id': first.id,
+              'answer_option_id': first.answer_options.last().id}],
+        ):
+            response = authenticated_client.post(
+                self.submit_url,
+                data={'answers': answers, 'category': 'safety'},
+                format='json'
+            )
+            assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert not UserAnswer.objects.exists()
+        attempt.refresh_from_db()
+        assert not attempt.is_valid
+
+
+@pytest.mark.django_db
+class TestBestAttempts:
+
+    def test_best_attempt_projection(self, user):
+        assert get_best_attempt(user.id, 'safety') is None
+        Attempt.objects.create(user=user, category='safety')
+        assert get_best_attempt(user.id, 'safety') is None
+
+        first = Attempt.objects.create(
+            user=user, category='safety', score=60, is_valid=True
+        )
+        second = Attempt.objects.create(user=user, category='safety')
+        second.score = 87
+        second.is_valid = True
+        second.save()
+        Attempt.objects.create(
+            user=user, category='university', score=95, is_valid=True
+        )
+
+        best_attempt = get_best_attempt(user.id, 'safety')
+        assert (best_attempt.attempt_id, best_attempt.score) == (
+            second.id, 87
+        )
+        assert best_attempt.attempts_count == 2
+
+        second.delete()
+        best_attempt = get_best_attempt(user.id, 'safety')
+        assert (best_attempt.attempt_id, best_attempt.score) == (
+            first.id, 60
+        )
+        assert best_attempt.attempts_count == 1
+        assert get_best_attempt(user.id, 'university').score == 95
+
+    def test_rebuild_best_attempts(self, user, user_2):
+        for owner, score in ((user, 40), (user, 70), (user_2, 20)):
+            Attempt.objects.create(
+                user=owner, category='safety', score=score, is_valid=True
+            )
+        UserBestAttempt.objects.all().delete()
+
+        rebuild_best_attempts()
+
+        assert sorted(UserBestAttempt.objects.values_list(
+            'user_id', 'score', 'attempts_count'
+        )) == sorted([(user.id, 70, 2), (user_2.id, 20, 1)])
+
+    def test_attempts_status(self, authenticated_client, user):
+        Attempt.objects.create(
+            user=user, category='university', score=75, is_valid=True
+        )
+        response = authenticated_client.get(
+            '/api/v1/get_attempts_status/', {'category': 'university'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.data == {'left_attempts': 2, 'best_score': 75}
@@ -0,0 +1,86 @@
+import pytest
+
+from competitions.constants import SOLO_RANKING_MODELS, TANDEM_RANKING_MODELS
+from competitions.models import (CompetitionParticipants, CompetitionResult,
+                                 OverallRanking, Q7Ranking, Q7TandemRanking,
+                                 September15Participant)
+from competitions.results_snapshot import rebuild_competition_results
+from reports.constants import COMPETITION_LAST_PLACE
+from reports.utils import (get_debut_results, get_detachment_q_results,
+                           get_tandem_results)
+
+
+@pytest.fixture
+def competition_results(
+        competition, participants_competition_start,
+        participants_competition_tandem, junior_detachment_3,
+        detachment_competition, junior_detachment
+):
+    CompetitionParticipants.objects.update(confirmed=True)
+    OverallRanking.objects.create(
+        competition=competition, detachment=junior_detachment_3,
+        places_sum=20, place=1
+    )
+    Q7Ranking.objects.create(
+        competition=competition, detachment=junior_detachment_3, place=3
+    )
+    Q7TandemRanking.objects.create(
+        competition=competition, detachment=detachment_competition,
+        junior_detachment=junior_detachment, place=2
+    )
+    September15Participant.objects.create(
+        detachment=junior_detachment_3,
+        participants_number=15,
+        members_number=12
+    )
+    rebuild_competition_results(competition.id)
+    return competition
+
+
+@pytest.mark.django_db
+class TestCompetitionResults:
+
+    def test_snapshot_rows(self, competition_results, junior_detachment_3):
+        """Срез содержит дебют и обе строки тандема в порядке выгрузки."""
+        results = list(CompetitionResult.objects.all())
+
+        assert [(row.status, row.nomination) for row in results] == [
+            ('Младший отряд', 'Дебют'),
+            ('Наставник', 'Тандем'),
+            ('Младший отряд', 'Тандем'),
+        ]
+        debut = results[0]
+        assert debut.detachment_id == junior_detachment_3.id
+        assert (debut.participants_count, debut.members_count) == (15, 12)
+        assert (debut.overall_place, debut.places_sum) == (1, 20)
+        assert len(debut.places) == len(SOLO_RANKING_MODELS)
+        assert debut.places[SOLO_RANKING_MODELS.index(Q7Ranking)] == 3
+        assert results[1].places == results[2].places
+        assert len(results[1].places) == len(TANDEM_RANKING_MODELS)
+
+    def test_export_rows(self, competition_results, junior_detachment_3):
+        """Строки выгрузки читаются из среза."""
+        rows = list(get_detachment_q_results(competition_results.id))
+
+        assert rows[0][:9] == (
+            junior_detachment_3.region.name, junior_detachment_3.name,
+            'Младший отряд', 'Дебют', junior_detachment_3.area.name,
+            15, 12, 1, 20
+        )
+        assert rows[1][7:9] == (COMPETITION_LAST_PLACE, COMPETITION_LAST_PLACE)
+        assert rows[1][9 + TANDEM_RANKING_MODELS.index(Q7TandemRanking)] == 2
+
+    def test_results_views_data(
+            self, competition_results, django_assert_num_queries
+    ):
+        """Дебют и тандем читаются фиксированным числом запросов."""
+        with django_assert_num_queries(2):
+            debut = get_debut_results(competition_results.id, is_sample=True)
+        with django_assert_num_queries(2):
+            tandem = get_tandem_results(competition_results.id)
+
+        assert [row.overall_ranking for row in debut] == [1]
+        assert [row.overall_ranking for row in tandem] == [
+            COMPETITION_LAST_PLACE, COMPETITION_LAST_PLACE
+        ]
+        assert tandem[0].places == tandem[1].places
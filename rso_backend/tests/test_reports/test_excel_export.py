@@ -0,0 +1,103 @@
+import pytest
+from django.core.files.storage import default_storage
+from openpyxl import load_workbook
+
+from reports import tasks
+from users.models import RSOUser
+
+HEADERS = ['№', 'Имя', 'Фамилия']
+STREAMING_DATA_FUNC = 'get_detachment_data'
+SECTION_FIELDS = {
+    'section_headers': [
+        {'text': 'Участник', 'merge_cells': [1, 2, 1, 3]},
+    ],
+    'headers_row': 2,
+}
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.fixture
+def export_data(monkeypatch):
+    """Подменяет источник строк выгрузки переданными данными."""
+    def set_data(data):
+        monkeypatch.setattr(
+            tasks, 'get_export_data', lambda *args, **kwargs: data
+        )
+    return set_data
+
+
+def load_sheet(file_path):
+    with default_storage.open(file_path, 'rb') as file:
+        return load_workbook(file).active
+
+
+def sheet_values(worksheet):
+    return [list(row) for row in worksheet.iter_rows(values_only=True)]
+
+
+@pytest.mark.django_db
+class TestStreamingExcelExport:
+
+    def test_generator_rows(self, media_root, export_data):
+        export_data(row for row in [('Иван', 'Иванов'), ('Петр', 'Петров')])
+
+        file_path = tasks.generate_excel_file(
+            HEADERS, 'Лист', 'export.xlsx', STREAMING_DATA_FUNC
+        )
+
+        worksheet = load_sheet(file_path)
+        assert worksheet.title == 'Лист'
+        assert sheet_values(worksheet) == [
+            HEADERS,
+            [1, 'Иван', 'Иванов'],
+            [2, 'Петр', 'Петров'],
+        ]
+
+    def test_queryset_rows(self, media_root, export_data, user, user_2):
+        export_data(
+            RSOUser.objects.order_by('id').values_list(
+                'first_name', 'last_name'
+            )
+        )
+
+        file_path = tasks.generate_excel_file(
+            HEADERS, 'Лист', 'users.xlsx', STREAMING_DATA_FUNC
+        )
+
+        values = sheet_values(load_sheet(file_path))
+        assert values[0] == HEADERS
+        assert values[1:] == [
+            [1, user.first_name, user.last_name],
+            [2, user_2.first_name, user_2.last_name],
+        ]
+
+    def test_section_headers(self, media_root, export_data):
+        export_data(iter([('Иван', 'Иванов')]))
+
+        file_path = tasks.generate_excel_file(
+            HEADERS, 'Лист', 'sections.xlsx', STREAMING_DATA_FUNC,
+            SECTION_FIELDS
+        )
+
+        worksheet = load_sheet(file_path)
+        assert [str(cells) for cells in worksheet.merged_cells.ranges] == [
+            'B1:C1'
+        ]
+        assert worksheet['B1'].value == 'Участник'
+        assert worksheet['B1'].alignment.horizontal == 'center'
+        assert sheet_values(worksheet)[1:] == [HEADERS, [1, 'Иван', 'Иванов']]
+
+    def test_empty_data(self, media_root, export_data):
+        export_data(row for row in [])
+
+        file_path = tasks.generate_excel_file(
+            HEADERS, 'Лист', 'empty.xlsx', STREAMING_DATA_FUNC
+        )
+
+        assert file_path is None
+        assert not default_storage.exists('to_delete_content/empty.xlsx')
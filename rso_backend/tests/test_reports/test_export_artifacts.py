@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from reports import tasks
+from reports.export_artifacts import (delete_expired_artifacts,
+                                      delete_storage_files,
+                                      get_export_params_hash,
+                                      get_fresh_artifact)
+from reports.export_registry import release_export
+from reports.models import ExportArtifact
+from reports.views import BaseExcelExportMixin
+
+HEADERS = ['№', 'Имя']
+DATA_FUNC = 'get_detachment_data'
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+class DetachmentsExport(BaseExcelExportMixin):
+
+    def get_headers(self):
+        return HEADERS
+
+    def get_worksheet_title(self):
+        return 'Отряды'
+
+    def get_filename(self):
+        return f'отряды_{timezone.now().timestamp()}.xlsx'
+
+    def get_data_func(self):
+        return DATA_FUNC
+
+
+class FakeBucket:
+
+    def __init__(self):
+        self.requests = []
+
+    def delete_objects(self, Delete):
+        self.requests.append([item['Key'] for item in Delete['Objects']])
+
+
+class FakeS3Storage:
+
+    def __init__(self):
+        self.bucket = FakeBucket()
+
+    def _normalize_name(self, name):
+        return f'media/{name}'
+
+
+@pytest.mark.django_db
+class TestExportArtifacts:
+
+    def test_generation_registers_artifact(self, media_root, monkeypatch):
+        monkeypatch.setattr(
+            tasks, 'get_export_data', lambda *args, **kwargs: [('Иван',)]
+        )
+
+        file_path = tasks.generate_excel_file(
+            HEADERS, 'Отряды', 'export.xlsx', DATA_FUNC
+        )
+
+        params_hash = get_export_params_hash(HEADERS, 'Отряды', DATA_FUNC)
+        artifact = get_fresh_artifact(params_hash)
+        assert artifact.file_path == file_path
+        assert artifact.delete_after > artifact.expires_at > timezone.now()
+
+    def test_fresh_artifact_reused(self, monkeypatch):
+        calls = []
+
+        def apply_async(args, kwargs, task_id):
+            calls.append(kwargs['params_hash'])
+            release_export(kwargs['params_hash'], task_id)
+
+        monkeypatch.setattr(
+            tasks.generate_excel_file, 'apply_async', apply_async
+        )
+        export = DetachmentsExport()
+
+        task_id = export.process_request(None)['task_id']
+        ExportArtifact.objects.create(
+            params_hash=calls[0], data_func=DATA_FUNC, task_id=task_id,
+            file_path='to_delete_content/отряды.xlsx',
+            expires_at=timezone.now() + timedelta(hours=1),
+            delete_after=timezone.now() + timedelta(days=1)
+        )
+        assert export.process_request(None) == {'task_id': task_id}
+        assert len(calls) == 1
+
+        ExportArtifact.objects.update(expires_at=timezone.now())
+        export.process_request(None)
+        assert len(calls) == 2
+
+    def test_delete_expired_artifacts(self, media_root):
+        now = timezone.now()
+        for name, delete_after in (
+            ('old.xlsx', now - timedelta(minutes=1)),
+            ('new.xlsx', now + timedelta(hours=1)),
+        ):
+            file_path = default_storage.save(
+                f'to_delete_content/{name}', ContentFile(b'xlsx')
+            )
+            ExportArtifact.objects.create(
+                params_hash=name, data_func=DATA_FUNC, file_path=file_path,
+                expires_at=delete_after, delete_after=delete_after
+            )
+
+        assert delete_expired_artifacts() == 1
+
+        assert not default_storage.exists('to_delete_content/old.xlsx')
+        assert default_storage.exists('to_delete_content/new.xlsx')
+        assert list(
+            ExportArtifact.objects.values_list('params_hash', flat=True)
+        ) == ['new.xlsx']
+
+    def test_s3_batch_delete(self, monkeypatch):
+        monkeypatch.setattr(
+            'reports.export_artifacts.EXPORT_DELETE_BATCH_SIZE', 2
+        )
+        storage = FakeS3Storage()
+
+        delete_storage_files(['a.xlsx', 'b.xlsx', 'c.xlsx'], storage)
+
+        assert storage.bucket.requests == [
+            ['media/a.xlsx', 'media/b.xlsx'], ['media/c.xlsx']
+        ]
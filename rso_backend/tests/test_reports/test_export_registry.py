@@ -0,0 +1,86 @@
+import pytest
+from django.core.files.storage import default_storage
+
+from reports import tasks, views
+from reports.export_registry import claim_export
+from reports.models import ExportArtifact
+from tests.test_reports.test_export_artifacts import DetachmentsExport
+
+HEADERS = ['№', 'Имя']
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.mark.django_db
+class TestExportRegistry:
+
+    def test_duplicate_exports_share_task(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(
+            tasks.generate_excel_file, 'apply_async',
+            lambda args, kwargs, task_id: calls.append(task_id)
+        )
+        export = DetachmentsExport()
+
+        first = export.process_request(None)
+        second = export.process_request(None)
+
+        assert first == second == {'task_id': calls[0]}
+        assert len(calls) == 1
+
+    def test_failed_enqueue_releases_export(self, monkeypatch):
+        def apply_async(args, kwargs, task_id):
+            raise ConnectionError
+
+        monkeypatch.setattr(
+            tasks.generate_excel_file, 'apply_async', apply_async
+        )
+        export = DetachmentsExport()
+
+        with pytest.raises(ConnectionError):
+            export.process_request(None)
+        with pytest.raises(ConnectionError):
+            export.process_request(None)
+
+    def test_progress_and_release(self, media_root, monkeypatch):
+        monkeypatch.setattr(
+            tasks, 'get_export_data',
+            lambda *args, **kwargs: [('Иван',), ('Петр',), ('Анна',)]
+        )
+        monkeypatch.setattr(tasks, 'EXPORT_PROGRESS_STEP', 2)
+        progress = []
+        monkeypatch.setattr(
+            tasks.generate_excel_file, 'update_state',
+            lambda state, meta: progress.append((state, meta))
+        )
+        task_id, _ = claim_export('hash')
+
+        result = tasks.generate_excel_file.apply(
+            (HEADERS, 'Лист', 'export.xlsx', 'get_detachment_data'),
+            {'params_hash': 'hash'}, task_id=task_id
+        )
+
+        assert default_storage.exists(result.result)
+        assert progress == [
+            ('PROGRESS', {'rows_done': 2, 'rows_total': 3})
+        ]
+        assert ExportArtifact.objects.get().task_id == task_id
+        assert claim_export('hash')[1]
+
+    def test_task_status_progress(self, client, user, monkeypatch):
+        class Result:
+            state = 'PROGRESS'
+            info = {'rows_done': 2000, 'rows_total': None}
+
+        monkeypatch.setattr(views, 'AsyncResult', lambda task_id: Result)
+        client.force_login(user)
+
+        response = client.get('/reports/task-status/some-task/')
+
+        assert response.json() == {
+            'status': 'PROGRESS', 'rows_done': 2000, 'rows_total': None
+        }
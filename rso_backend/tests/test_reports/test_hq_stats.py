@@ -0,0 +1,66 @@
+import pytest
+
+from headquarters.count_hq_members import (count_events_organizations,
+                                           count_headquarter_participants,
+                                           count_headquarters_stats,
+                                           count_membership_fee,
+                                           count_test_membership,
+                                           count_verified_users)
+from headquarters.models import UserRegionalHeadquarterPosition
+from questions.models import Attempt
+
+
+@pytest.fixture
+def regional_stats_data(regional_headquarter, detachment, detachment_3,
+                        user_2, user_3):
+    for member in (user_2, user_3):
+        UserRegionalHeadquarterPosition.objects.get_or_create(
+            headquarter=regional_headquarter, user=member
+        )
+    user_2.is_verified = True
+    user_2.membership_fee = True
+    user_2.save()
+    Attempt.objects.create(
+        user=user_2, category=Attempt.Category.SAFETY, score=80,
+        is_valid=True
+    )
+    Attempt.objects.create(
+        user=detachment.commander, category=Attempt.Category.SAFETY, score=90,
+        is_valid=True
+    )
+    Attempt.objects.create(
+        user=user_3, category=Attempt.Category.SAFETY, score=40,
+        is_valid=True
+    )
+    return regional_headquarter
+
+
+@pytest.mark.django_db
+class TestHeadquartersStats:
+
+    def test_matches_single_hq_counters(self, regional_stats_data):
+        """Групповой подсчет совпадает с поштабными count_* функциями."""
+        hq = regional_stats_data
+
+        stats = count_headquarters_stats([hq])[hq.id]
+
+        assert stats['participants'] == count_headquarter_participants(hq)
+        assert stats['verified'] == count_verified_users(hq)
+        assert stats['membership_fee'] == count_membership_fee(hq)
+        assert stats['test_done'] == count_test_membership(hq)
+        assert stats['events_organizations'] == count_events_organizations(hq)
+        assert stats['detachments'] == 2
+        assert stats['local_headquarters'] == 0
+
+    def test_queries_do_not_depend_on_headquarters(
+            self, regional_stats_data, regional_headquarter_2,
+            django_assert_num_queries
+    ):
+        """Число запросов зависит от уровня штаба, но не от их количества."""
+        with django_assert_num_queries(10):
+            stats = count_headquarters_stats(
+                [regional_stats_data, regional_headquarter_2]
+            )
+
+        assert stats[regional_headquarter_2.id]['participants'] == 1
+        assert stats[regional_headquarter_2.id]['detachments'] == 0
@@ -0,0 +1,120 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from headquarters.models import Position, UserDetachmentPosition
+from reports.utils import filter_registry_queryset, get_users_registry_data
+from users.models import RSOUser
+
+MINIMAL_FIELDS = ['verification']
+ALL_FIELDS = None
+
+
+def create_detachment_members(detachment, count, prefix='registry'):
+    position, _ = Position.objects.get_or_create(name='Боец')
+    for number in range(count):
+        member = RSOUser.objects.create_user(
+            first_name=f'Боец{number}',
+            last_name='Реестра',
+            username=f'{prefix}_member_{number}',
+            password='RegistryPass123'
+        )
+        UserDetachmentPosition.objects.update_or_create(
+            user=member,
+            defaults={'headquarter': detachment, 'position': position}
+        )
+
+
+def count_registry_queries(fields):
+    with CaptureQueriesContext(connection) as context:
+        rows = list(get_users_registry_data(RSOUser.objects.all(), fields))
+    return len(context.captured_queries), rows
+
+
+@pytest.mark.django_db
+class TestUsersRegistryData:
+
+    def test_queries_do_not_depend_on_users_count(self, detachment):
+        """Число запросов не растет вместе с числом пользователей."""
+        create_detachment_members(detachment, 2)
+        few_queries, few_rows = count_registry_queries(ALL_FIELDS)
+        create_detachment_members(detachment, 8, prefix='more')
+        many_queries, many_rows = count_registry_queries(ALL_FIELDS)
+
+        assert len(many_rows) > len(few_rows)
+        assert many_queries == few_queries
+
+    def test_queries_do_not_depend_on_fields(self, detachment):
+        """Набор колонок не добавляет запросов на каждого пользователя."""
+        create_detachment_members(detachment, 5)
+        minimal_queries, _ = count_registry_queries(MINIMAL_FIELDS)
+        all_queries, _ = count_registry_queries(ALL_FIELDS)
+
+        assert minimal_queries == all_queries
+
+    def test_commander_row(self, detachment, area):
+        """Командир отряда получает должность и направление своего отряда."""
+        rows = list(get_users_registry_data(
+            RSOUser.objects.filter(pk=detachment.commander_id),
+            ['detachment', 'position', 'area']
+        ))
+
+        assert rows[0][-2:] == ['Командир', area.name]
+
+    def test_member_row(self, detachment, area):
+        """Боец отряда получает должность и направление из членства."""
+        create_detachment_members(detachment, 1)
+        rows = list(get_users_registry_data(
+            RSOUser.objects.filter(username='registry_member_0'),
+            ['detachment', 'position', 'area']
+        ))
+
+        assert rows[0][3:] == [detachment.name, 'Боец', area.name]
+
+
+@pytest.mark.django_db
+class TestRegistryScope:
+    data_func = 'get_users_registry_data'
+
+    def test_unscoped_registry_is_empty(self, detachment):
+        """Выгрузка реестра без штаба командира ничего не отдает."""
+        create_detachment_members(detachment, 2)
+
+        queryset = filter_registry_queryset(
+            RSOUser.objects.all(), self.data_func, None
+        )
+
+        assert not queryset.exists()
+
+    def test_detachment_commander_scope(self, detachment, user_2):
+        """Командир отряда выгружает только членов своего отряда."""
+        create_detachment_members(detachment, 2)
+
+        queryset = filter_registry_queryset(
+            RSOUser.objects.all(), self.data_func,
+            {'role': 'detachment', 'headquarter_id': detachment.id}
+        )
+
+        assert set(queryset.values_list('username', flat=True)) == {
+            'registry_member_0', 'registry_member_1'
+        }
+
+    def test_export_requires_commander(self, user_2):
+        """Выгрузка реестра недоступна без роли командира."""
+        user_2.reports_access = True
+        user_2.save()
+        client = Client()
+        client.force_login(user_2)
+
+        response = client.get('/reports/get_users_registry_data/export/')
+
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+    def test_task_status_requires_login(self):
+        """Статус задачи выгрузки недоступен анонимному пользователю."""
+        response = Client().get('/reports/task-status/some-task-id/')
+
+        assert response.status_code == HTTPStatus.FOUND
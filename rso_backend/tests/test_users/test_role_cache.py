@@ -0,0 +1,51 @@
+import pytest
+
+from api.role_cache import get_commanded_unit_ids
+from api.utils import get_detachment_commander_num
+from headquarters.models import UserDetachmentPosition
+
+
+@pytest.mark.django_db
+class TestRoleCache:
+
+    def test_me_commander_cached(
+            self, authenticated_client, detachment,
+            django_assert_max_num_queries
+    ):
+        url = '/api/v1/rsousers/me_commander/'
+        response = authenticated_client.get(url)
+        assert response.status_code == 200
+        assert response.data['detachment_commander']['id'] == detachment.id
+
+        with django_assert_max_num_queries(1):
+            cached = authenticated_client.get(url)
+        assert cached.data == response.data
+
+    def test_commander_change_invalidates(
+            self, user, user_2, detachment, django_assert_num_queries
+    ):
+        assert get_detachment_commander_num(user) == detachment.id
+        with django_assert_num_queries(0):
+            assert get_commanded_unit_ids(user) == {
+                'Detachment': detachment.id
+            }
+
+        detachment.commander = user_2
+        detachment.save()
+
+        assert get_detachment_commander_num(user) is None
+        assert get_detachment_commander_num(user_2) == detachment.id
+
+    def test_position_invalidates(
+            self, authenticated_client_2, user_2, detachment, position_jedi
+    ):
+        url = '/api/v1/rsousers/me_positions/'
+        response = authenticated_client_2.get(url)
+        assert response.data['userdetachmentposition'] is None
+
+        UserDetachmentPosition.objects.create(
+            user=user_2, headquarter=detachment, position=position_jedi
+        )
+
+        response = authenticated_client_2.get(url)
+        assert response.data['userdetachmentposition'] is not None
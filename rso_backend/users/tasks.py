@@ -2,6 +2,7 @@ import logging
 
 from celery import shared_task
 
+from api.response_cache import invalidate_tags
 from users.models import RSOUser
 
 logger = logging.getLogger('tasks')
@@ -10,6 +11,7 @@ logger = logging.getLogger('tasks')
 @shared_task
 def reset_membership_fee():
     RSOUser.objects.update(membership_fee=False)
+    invalidate_tags('users', 'users.rsouser')
     logger.info(
         'Успешно сброшен статус оплаты для всех пользователей.'
     )
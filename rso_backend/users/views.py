@@ -8,8 +8,6 @@ from django.db import transaction
 from django.db.models import Q
 from django.http.response import HttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from drf_yasg import openapi
@@ -25,6 +23,8 @@ from api.permissions import (IsCommanderOrTrustedAnywhere,
                              OnlyStuffOrCentralCommander,
                              PersonalDataPermission,
                              PersonalDataPermissionForGET)
+from api.response_cache import USERS_TAGS, cache_response
+from api.role_cache import get_cached_roles
 from api.tasks import send_reset_password_email_without_user
 from api.utils import download_file, get_user
 from users.filters import RSOUserFilter
@@ -52,6 +52,13 @@ from users.serializers import (AdditionalForeignDocsSerializer,
                                UserTrustedSerializer)
 
 
+def get_roles_data(user, kind, serializer_class):
+    """Сериализованные роли пользователя из кэша ролей."""
+    return get_cached_roles(
+        user.id, kind, lambda: serializer_class(user).data
+    )
+
+
 class CustomUserViewSet(UserViewSet):
     """Кастомный вьюсет юзера.
     Доступно изменение метода сброса пароля reset_password
@@ -82,7 +89,7 @@ class CustomUserViewSet(UserViewSet):
     filterset_class = RSOUserFilter
     ordering_fields = ('last_name', 'date_of_birth')
 
-    @method_decorator(cache_page(settings.RSOUSERS_CACHE_TTL))
+    @cache_response(settings.RSOUSERS_CACHE_TTL, USERS_TAGS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -208,8 +215,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
         является командиром.
         """
         if request.method == 'GET':
-            serializer = UserCommanderSerializer(request.user)
-            return Response(serializer.data)
+            return Response(get_roles_data(
+                request.user, 'commander', UserCommanderSerializer
+            ))
 
     @action(
         detail=False,
@@ -223,8 +231,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
         является доверенным.
         """
         if request.method == 'GET':
-            serializer = UserTrustedSerializer(request.user)
-            return Response(serializer.data)
+            return Response(get_roles_data(
+                request.user, 'trusted', UserTrustedSerializer
+            ))
 
     @action(
         detail=False,
@@ -237,8 +246,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
         Представляет должности текущего юзера на каждом структурном уровне.
         """
         if request.method == 'GET':
-            serializer = UserHeadquarterPositionSerializer(request.user)
-            return Response(serializer.data)
+            return Response(get_roles_data(
+                request.user, 'positions', UserHeadquarterPositionSerializer
+            ))
 
     @action(
         detail=True,
@@ -254,8 +264,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
             if not pk.isdigit():
                 return Response(status=status.HTTP_400_BAD_REQUEST)
             user = get_object_or_404(RSOUser, id=pk)
-            serializer = UserHeadquarterPositionSerializer(user)
-            return Response(serializer.data)
+            return Response(get_roles_data(
+                user, 'positions', UserHeadquarterPositionSerializer
+            ))
 
     @action(
         detail=True,
@@ -272,8 +283,9 @@ class RSOUserViewSet(RetrieveUpdateViewSet):
             if not pk.isdigit():
                 return Response(status=status.HTTP_400_BAD_REQUEST)
             user = get_object_or_404(RSOUser, id=pk)
-            serializer = UserCommanderSerializer(user)
-            return Response(serializer.data)
+            return Response(get_roles_data(
+                user, 'commander', UserCommanderSerializer
+            ))
 
 
 class SafeUserViewSet(RetrieveViewSet):
@@ -688,7 +700,7 @@ class UserRegionViewSet(BaseUserViewSet):
             )
         return permission_classes
 
-    @method_decorator(cache_page(settings.RSOUSERS_CACHE_TTL))
+    @cache_response(settings.RSOUSERS_CACHE_TTL, USERS_TAGS)
     def list(self, request, *args, **kwargs):
 
         queryset = self.filter_queryset(self.get_queryset())